@@ -0,0 +1,24 @@
+"""camera hls mode
+
+Revision ID: 5c1e8a7d2f40
+Revises: 937f3b08a086
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e8a7d2f40'
+down_revision = '937f3b08a086'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('cameras', sa.Column('hls_mode', sa.String(), server_default='hls', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('cameras', 'hls_mode')
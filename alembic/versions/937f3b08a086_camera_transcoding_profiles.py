@@ -0,0 +1,26 @@
+"""camera transcoding profiles
+
+Revision ID: 937f3b08a086
+Revises: 27407647e886
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '937f3b08a086'
+down_revision = '27407647e886'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('cameras', sa.Column('transcode_mode', sa.String(), server_default='transcode', nullable=False))
+    op.add_column('cameras', sa.Column('transcode_profile', sa.String(), server_default='360p', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('cameras', 'transcode_profile')
+    op.drop_column('cameras', 'transcode_mode')
@@ -0,0 +1,39 @@
+"""camera health
+
+Revision ID: a3d91f6b2c17
+Revises: 5c1e8a7d2f40
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d91f6b2c17'
+down_revision = '5c1e8a7d2f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('camera_health',
+    sa.Column('camera_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('latency_ms', sa.Float(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('codec', sa.String(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('checked_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['camera_id'], ['cameras.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('camera_id')
+    )
+    op.create_index(op.f('ix_camera_health_checked_at'), 'camera_health', ['checked_at'], unique=False)
+    op.create_index('ix_camera_health_status_camera_id', 'camera_health', ['status', 'camera_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_camera_health_status_camera_id', table_name='camera_health')
+    op.drop_index(op.f('ix_camera_health_checked_at'), table_name='camera_health')
+    op.drop_table('camera_health')
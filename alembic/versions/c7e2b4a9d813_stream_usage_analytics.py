@@ -0,0 +1,45 @@
+"""stream usage analytics
+
+Revision ID: c7e2b4a9d813
+Revises: a3d91f6b2c17
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2b4a9d813'
+down_revision = 'a3d91f6b2c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stream_events',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('camera_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('event', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stream_events_camera_id'), 'stream_events', ['camera_id'], unique=False)
+    op.create_index(op.f('ix_stream_events_created_at'), 'stream_events', ['created_at'], unique=False)
+    op.create_table('stream_usage_rollups',
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('camera_id', sa.Integer(), nullable=False),
+    sa.Column('starts', sa.Integer(), nullable=False),
+    sa.Column('stops', sa.Integer(), nullable=False),
+    sa.Column('peak_viewers', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket', 'camera_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stream_usage_rollups')
+    op.drop_index(op.f('ix_stream_events_created_at'), table_name='stream_events')
+    op.drop_index(op.f('ix_stream_events_camera_id'), table_name='stream_events')
+    op.drop_table('stream_events')
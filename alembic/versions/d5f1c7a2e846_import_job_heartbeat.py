@@ -0,0 +1,24 @@
+"""import job heartbeat
+
+Revision ID: d5f1c7a2e846
+Revises: 8b4d2e6f1a93
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1c7a2e846'
+down_revision = '8b4d2e6f1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('import_jobs', sa.Column('heartbeat_at', sa.DateTime(), server_default=sa.text("(now() AT TIME ZONE 'utc')"), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('import_jobs', 'heartbeat_at')
@@ -0,0 +1,28 @@
+"""association camera indexes
+
+Revision ID: e19b6c0d4a52
+Revises: c7e2b4a9d813
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e19b6c0d4a52'
+down_revision = 'c7e2b4a9d813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в таблицы, но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_user_cameras_camera_id'), 'user_cameras', ['camera_id'], unique=False, postgresql_concurrently=True)
+        op.create_index(op.f('ix_favorite_cameras_camera_id'), 'favorite_cameras', ['camera_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_favorite_cameras_camera_id'), table_name='favorite_cameras', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_user_cameras_camera_id'), table_name='user_cameras', postgresql_concurrently=True)
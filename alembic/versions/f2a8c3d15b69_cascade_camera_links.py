@@ -0,0 +1,36 @@
+"""cascade camera links on delete
+
+Revision ID: f2a8c3d15b69
+Revises: e19b6c0d4a52
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c3d15b69'
+down_revision = 'e19b6c0d4a52'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('user_cameras', 'favorite_cameras')
+
+
+def upgrade() -> None:
+    # Ключ пересоздаётся как NOT VALID (без проверки существующих строк под блокировкой).
+    # Проверка выполняется после фиксации транзакции миграций, когда блокировка ACCESS EXCLUSIVE
+    # уже снята: VALIDATE CONSTRAINT берёт SHARE UPDATE EXCLUSIVE и не блокирует запись в таблицы
+    for table in TABLES:
+        op.drop_constraint(f'{table}_camera_id_fkey', table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_camera_id_fkey', table, 'cameras', ['camera_id'], ['id'], ondelete='CASCADE', postgresql_not_valid=True)
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_camera_id_fkey')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_constraint(f'{table}_camera_id_fkey', table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_camera_id_fkey', table, 'cameras', ['camera_id'], ['id'])
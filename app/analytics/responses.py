@@ -0,0 +1,13 @@
+from typing import List
+from pydantic import BaseModel
+
+from app.analytics.schemas import TopCamera, UsageBucket
+
+
+class TopCamerasResponse(BaseModel):
+    cameras: List[TopCamera]
+
+
+class ConcurrencyResponse(BaseModel):
+    peak_viewers: int
+    buckets: List[UsageBucket]
@@ -0,0 +1,60 @@
+from typing import Optional
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Query, status
+
+from app.models import RollupGranularity
+from app.analytics.services import ALL_CAMERAS, StreamUsageRollupService
+from app.users.schemas import User as UserSchema
+from app.authorization.dependencies import check_is_current_user_admin
+from app.analytics.responses import TopCamerasResponse, ConcurrencyResponse
+
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Статистика просмотров"],
+)
+
+GRANULARITY_PATTERN = f"^({RollupGranularity.MINUTE}|{RollupGranularity.HOUR}|{RollupGranularity.DAY})$"
+
+
+def period(since: Optional[datetime], until: Optional[datetime]) -> tuple[datetime, datetime]:
+    until = until or datetime.utcnow()
+    return since or until - timedelta(days=1), until
+
+
+@router.get("/top_cameras", response_model=TopCamerasResponse, status_code=status.HTTP_200_OK)
+async def get_top_cameras(
+    granularity: str = Query(RollupGranularity.HOUR, regex=GRANULARITY_PATTERN),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: UserSchema = Depends(check_is_current_user_admin),
+):
+    """
+    Самые популярные камеры по количеству запусков просмотра за период (по умолчанию - последние сутки).
+    Считается по агрегатам выбранной детализации, журнал событий не сканируется.
+    peak_viewers при нескольких воркерах занижено так же, как в /analytics/concurrency
+    """
+    since, until = period(since, until)
+    cameras = await StreamUsageRollupService.find_top_cameras(granularity, since, until, limit)
+
+    return {"cameras": cameras}
+
+
+@router.get("/concurrency", response_model=ConcurrencyResponse, status_code=status.HTTP_200_OK)
+async def get_concurrency(
+    granularity: str = Query(RollupGranularity.MINUTE, regex=GRANULARITY_PATTERN),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    camera_id: Optional[int] = None,
+    current_user: UserSchema = Depends(check_is_current_user_admin),
+):
+    """
+    Пиковое число одновременных зрителей камеры (или всех камер) по интервалам за период.
+    Зрители считаются в каждом процессе приложения отдельно, а агрегаты объединяются максимумом,
+    поэтому при нескольких воркерах uvicorn значение занижено (это пик одного воркера, а не сумма)
+    """
+    since, until = period(since, until)
+    buckets = await StreamUsageRollupService.find_series(granularity, since, until, camera_id or ALL_CAMERAS)
+
+    return {"peak_viewers": max((bucket.peak_viewers for bucket in buckets), default=0), "buckets": buckets}
@@ -0,0 +1,21 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class TopCamera(BaseModel):
+    camera_id: int
+    starts: int
+    peak_viewers: int
+
+    class Config:
+        orm_mode = True
+
+
+class UsageBucket(BaseModel):
+    bucket: datetime
+    starts: int
+    stops: int
+    peak_viewers: int
+
+    class Config:
+        orm_mode = True
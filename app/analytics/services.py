@@ -0,0 +1,85 @@
+from datetime import datetime
+from sqlalchemy import insert, select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.services import BaseRequests
+from app.database import async_session_maker
+from app.models import StreamEvent, StreamUsageRollup
+
+
+ALL_CAMERAS = 0
+
+# asyncpg принимает не больше 32767 параметров на запрос, у строки агрегата по параметру на колонку
+ROLLUP_CHUNK_SIZE = 32767 // len(StreamUsageRollup.__table__.columns)
+
+
+class StreamEventService(BaseRequests):
+    """Запросы к журналу событий просмотра"""
+
+    model = StreamEvent
+
+    @classmethod
+    async def write_batch(cls, events: list[dict], rollups: list[dict]) -> None:
+        """Запись пачки событий (может быть пустой) и приращений агрегатов в одной транзакции.
+        Агрегаты пишутся частями по ROLLUP_CHUNK_SIZE строк (перенос зрителей после простоя даёт тысячи строк)"""
+        async with async_session_maker() as session:
+            async with session.begin():
+                if events:
+                    await session.execute(insert(StreamEvent), events)
+                for start in range(0, len(rollups), ROLLUP_CHUNK_SIZE):
+                    query = pg_insert(StreamUsageRollup).values(rollups[start:start + ROLLUP_CHUNK_SIZE])
+                    query = query.on_conflict_do_update(
+                        index_elements=[StreamUsageRollup.granularity, StreamUsageRollup.bucket, StreamUsageRollup.camera_id],
+                        set_={
+                            "starts": StreamUsageRollup.starts + query.excluded.starts,
+                            "stops": StreamUsageRollup.stops + query.excluded.stops,
+                            "peak_viewers": func.greatest(StreamUsageRollup.peak_viewers, query.excluded.peak_viewers),
+                        },
+                    )
+                    await session.execute(query)
+
+
+class StreamUsageRollupService(BaseRequests):
+    """Запросы к агрегатам просмотров по минутам, часам и дням"""
+
+    model = StreamUsageRollup
+
+    @classmethod
+    async def find_top_cameras(cls, granularity: str, since: datetime, until: datetime, limit: int):
+        """Камеры с наибольшим количеством запусков просмотра за период. Возвращает строки (camera_id, starts, peak_viewers)"""
+        async with async_session_maker() as session:
+            query = (
+                select(
+                    StreamUsageRollup.camera_id,
+                    func.sum(StreamUsageRollup.starts).label("starts"),
+                    func.max(StreamUsageRollup.peak_viewers).label("peak_viewers"),
+                )
+                .where(
+                    StreamUsageRollup.granularity == granularity,
+                    StreamUsageRollup.bucket >= since,
+                    StreamUsageRollup.bucket < until,
+                    StreamUsageRollup.camera_id != ALL_CAMERAS,
+                )
+                .group_by(StreamUsageRollup.camera_id)
+                .order_by(func.sum(StreamUsageRollup.starts).desc())
+                .limit(limit)
+            )
+            result = await session.execute(query)
+            return result.all()
+
+    @classmethod
+    async def find_series(cls, granularity: str, since: datetime, until: datetime, camera_id: int = ALL_CAMERAS):
+        """Агрегаты камеры (или всех камер) за период по возрастанию времени"""
+        async with async_session_maker() as session:
+            query = (
+                select(StreamUsageRollup)
+                .where(
+                    StreamUsageRollup.granularity == granularity,
+                    StreamUsageRollup.bucket >= since,
+                    StreamUsageRollup.bucket < until,
+                    StreamUsageRollup.camera_id == camera_id,
+                )
+                .order_by(StreamUsageRollup.bucket)
+            )
+            result = await session.execute(query)
+            return result.scalars().all()
@@ -0,0 +1,216 @@
+import asyncio
+
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.logger import logger
+from app.models import StreamEventType, RollupGranularity
+from app.analytics.services import ALL_CAMERAS, StreamEventService
+
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    """
+    Начало интервала агрегата, в который попадает момент времени
+    """
+    if granularity == RollupGranularity.MINUTE:
+        return moment.replace(second=0, microsecond=0)
+    if granularity == RollupGranularity.HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+GRANULARITIES = (RollupGranularity.MINUTE, RollupGranularity.HOUR, RollupGranularity.DAY)
+
+MINUTE = timedelta(minutes=1)
+
+# Больше суток пропущенных минут не заполняется (например, после долгой остановки записи)
+MAX_CARRY_MINUTES = 24 * 60
+
+
+class StreamEventWriter:
+    """
+    Журнал событий просмотра с отложенной записью. emit не ждёт БД: событие кладётся в очередь
+    (при переполнении отбрасывается), фоновая задача пишет события пачками и в той же транзакции
+    увеличивает агрегаты по минутам, часам и дням, поэтому для статистики не нужно сканировать журнал.
+    Число одновременных зрителей считается по событиям, прошедшим через этот процесс. В каждую новую
+    минуту (и её час и день) переносится текущее число зрителей, даже если событий в ней не было.
+    Зритель без событий и запросов потока дольше viewer_ttl считается ушедшим (потерянный stop)
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float, viewer_ttl: float):
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.viewer_ttl = timedelta(seconds=viewer_ttl)
+        self.viewers: dict[int, dict[str, datetime]] = {}
+        self.total_viewers = 0
+        self.carried_until: datetime | None = None
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.expired = 0
+
+    def emit(self, camera_id: int, user_id, event: str) -> None:
+        """
+        Добавление события в очередь без ожидания
+        """
+        try:
+            self.queue.put_nowait({"camera_id": camera_id, "user_id": user_id, "event": event, "created_at": datetime.utcnow()})
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def touch(self, camera_id: int, user_id) -> None:
+        """
+        Отметка активности зрителя (запрос плейлиста или сегмента), продлевает его до viewer_ttl
+        """
+        viewers = self.viewers.get(camera_id)
+        if viewers is not None and str(user_id) in viewers:
+            viewers[str(user_id)] = datetime.utcnow()
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Остановка с записью оставшихся в очереди событий
+        """
+        self.stopping = True
+        if self.task is not None:
+            await self.task
+            self.task = None
+
+    def _take(self, limit: int, batch: list[dict]) -> list[dict]:
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._take(self.batch_size, [])
+            if not batch:
+                if self.stopping:
+                    return
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=self.flush_interval))
+                except asyncio.TimeoutError:
+                    await self._flush([])
+                    continue
+
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and not self.stopping:
+                self._take(self.batch_size, batch)
+                timeout = deadline - loop.time()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    def _expire(self, now: datetime) -> None:
+        """
+        Удаление зрителей без активности дольше viewer_ttl
+        """
+        stale_before = now - self.viewer_ttl
+        for camera_id, viewers in list(self.viewers.items()):
+            for user_id, last_seen in list(viewers.items()):
+                if last_seen < stale_before:
+                    del viewers[user_id]
+                    self.total_viewers -= 1
+                    self.expired += 1
+            if not viewers:
+                del self.viewers[camera_id]
+
+    @staticmethod
+    def _add(rollups: dict, granularity: str, bucket: datetime, camera_id: int, current: int, event: str | None = None) -> None:
+        row = rollups.setdefault(
+            (granularity, bucket, camera_id),
+            {"granularity": granularity, "bucket": bucket, "camera_id": camera_id, "starts": 0, "stops": 0, "peak_viewers": 0},
+        )
+        if event is not None:
+            row["starts" if event == StreamEventType.START else "stops"] += 1
+        row["peak_viewers"] = max(row["peak_viewers"], current)
+
+    def _carry(self, rollups: dict, now: datetime) -> None:
+        """
+        Перенос текущего числа зрителей во все минуты (с их часами и днями), начавшиеся с прошлого переноса:
+        зрители, подключённые без новых событий, учитываются в пиковой нагрузке каждого интервала
+        """
+        minute = truncate(now, RollupGranularity.MINUTE)
+        if self.carried_until is None:
+            bucket = minute
+        else:
+            bucket = max(self.carried_until + MINUTE, minute - MINUTE * MAX_CARRY_MINUTES)
+        self.carried_until = minute
+        if not self.total_viewers:
+            return
+
+        while bucket <= minute:
+            for granularity in GRANULARITIES:
+                granularity_bucket = truncate(bucket, granularity)
+                for camera_id, viewers in self.viewers.items():
+                    self._add(rollups, granularity, granularity_bucket, camera_id, len(viewers))
+                self._add(rollups, granularity, granularity_bucket, ALL_CAMERAS, self.total_viewers)
+            bucket += MINUTE
+
+    def _rollups(self, events: list[dict], now: datetime) -> list[dict]:
+        """
+        Приращения агрегатов пачки: перенос текущих зрителей в новые интервалы, затем запуски,
+        остановки и пиковое число зрителей по камере и по всем камерам
+        """
+        self._expire(now)
+        rollups: dict[tuple[str, datetime, int], dict] = {}
+        self._carry(rollups, now)
+        for event in events:
+            viewers = self.viewers.setdefault(event["camera_id"], {})
+            user_id = str(event["user_id"])
+            if event["event"] == StreamEventType.START:
+                if user_id not in viewers:
+                    self.total_viewers += 1
+                viewers[user_id] = event["created_at"]
+            elif user_id in viewers:
+                del viewers[user_id]
+                self.total_viewers -= 1
+
+            concurrency = {event["camera_id"]: len(viewers), ALL_CAMERAS: self.total_viewers}
+            if not viewers:
+                del self.viewers[event["camera_id"]]
+            for granularity in GRANULARITIES:
+                bucket = truncate(event["created_at"], granularity)
+                for camera_id, current in concurrency.items():
+                    self._add(rollups, granularity, bucket, camera_id, current, event["event"])
+        return list(rollups.values())
+
+    async def _flush(self, events: list[dict]) -> None:
+        rollups = self._rollups(events, datetime.utcnow())
+        if not events and not rollups:
+            return
+        try:
+            await StreamEventService.write_batch(events, rollups)
+            self.written += len(events)
+        except Exception as e:
+            self.failed += len(events)
+            logger.error(f"Не удалось записать {len(events)} событий просмотра: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "viewers": self.total_viewers,
+            "expired": self.expired,
+        }
+
+
+stream_events = StreamEventWriter(
+    settings.ANALYTICS_QUEUE_SIZE,
+    settings.ANALYTICS_BATCH_SIZE,
+    settings.ANALYTICS_FLUSH_INTERVAL,
+    settings.ANALYTICS_VIEWER_TTL,
+)
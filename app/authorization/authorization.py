@@ -1,11 +1,17 @@
-from jose import jwt
+import time, asyncio, hashlib
+
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from jose import jwt, JWTError
 from pydantic import EmailStr
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 
 from app.models import User
 from app.config import settings
+from app.cache import TTLCache
 from app.users.services import UserService
+from app.exceptions import IncorrectFormatTokenException
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -24,6 +30,92 @@ def verify_password(plain_password, hashed_password) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordWorkerPool:
+    """
+    Ограниченный пул потоков для хэширования и проверки паролей (bcrypt),
+    чтобы не блокировать event loop. Ведёт счётчики очереди для метрик.
+    """
+
+    def __init__(self, workers: int, login_concurrency: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self.workers = workers
+        self.login_concurrency = login_concurrency
+        self.login_semaphore = asyncio.Semaphore(login_concurrency)
+        self.waiting = 0
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self._lock = Lock()
+
+    async def run(self, func, *args):
+        """
+        Выполнение функции в пуле потоков
+        """
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, func, *args)
+
+    async def run_login(self, func, *args):
+        """
+        Выполнение функции в пуле с ограничением числа одновременных входов
+        """
+        self.waiting += 1
+        try:
+            await self.login_semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await self.run(func, *args)
+        finally:
+            self.login_semaphore.release()
+
+    def _call(self, func, *args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        """
+        Состояние пула: ожидающие вход, очередь пула, выполняющиеся и завершённые задачи
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "login_concurrency": self.login_concurrency,
+                "login_waiting": self.waiting,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+            }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_pool = PasswordWorkerPool(settings.PASSWORD_HASH_WORKERS, settings.LOGIN_CONCURRENCY)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Хэширование пароля в пуле потоков
+    """
+    return await password_pool.run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """
+    Проверка пароля в пуле потоков с ограничением числа одновременных входов
+    """
+    return await password_pool.run_login(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)) -> str:
     """
     Создание JWT токена с указанными данными и временем жизни.
@@ -35,12 +127,66 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes
     return encoded_jwt
 
 
+def _jose_backend():
+    """
+    Проверка подписи через python-jose
+    """
+    def decode(token: str) -> dict:
+        return jwt.decode(token, settings.SECRET_KEY, settings.ALGORITHM)
+    return decode, JWTError
+
+
+def _pyjwt_backend():
+    """
+    Проверка подписи через PyJWT (быстрее python-jose для HS256)
+    """
+    import jwt as pyjwt
+
+    def decode(token: str) -> dict:
+        return pyjwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    return decode, pyjwt.PyJWTError
+
+
+JWT_BACKENDS = {
+    "jose": _jose_backend,
+    "pyjwt": _pyjwt_backend,
+}
+
+_jwt_decode, _jwt_error = JWT_BACKENDS[settings.JWT_BACKEND]()
+
+claims_cache = TTLCache(maxsize=settings.JWT_CACHE_MAXSIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Проверка подписи и декодирование JWT токена.
+    Проверенные данные кэшируются по хэшу токена до истечения его срока действия.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = claims_cache.get(key)
+    if payload is not None:
+        return payload
+
+    try:
+        payload = _jwt_decode(token)
+    except _jwt_error:
+        raise IncorrectFormatTokenException
+
+    expire = payload.get("exp")
+    if expire:
+        ttl = expire - time.time()
+        if ttl > 0:
+            claims_cache.set(key, payload, ttl=ttl)
+
+    return payload
+
+
 async def authenticate_user(email: EmailStr, password: str) -> User | None:
     """
     Аутентификация пользователя по email и паролю.
     Возвращает пользователя, если аутентификация успешна, иначе None.
     """
     user = await UserService.find_one_or_none(email=email)
-    if user and verify_password(password, user.password):
+    if user and await verify_password_async(password, user.password):
         return user
     return None
@@ -1,13 +1,11 @@
 from datetime import datetime
-from jose import jwt, JWTError
 from fastapi import Request, Depends
 
 from app.models import User
-from app.config import settings
 from app.users.services import UserService
+from app.authorization.authorization import decode_access_token
 from app.exceptions import (
     TokenAbsentException, 
-    IncorrectFormatTokenException, 
     TokenExpiredException, 
     UserIsNotPresentException, 
     NotEnoughAuthorityException
@@ -40,10 +38,7 @@ async def get_current_user(token: str = Depends(get_token)) -> User:
     """
     Получение текущего пользователя по токену.
     """
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, settings.ALGORITHM)
-    except JWTError:
-        raise IncorrectFormatTokenException
+    payload = decode_access_token(token)
 
     expire: str = payload.get("exp")
     if not expire or datetime.utcnow().timestamp() > expire:
@@ -53,7 +48,7 @@ async def get_current_user(token: str = Depends(get_token)) -> User:
     if not user_id:
         raise UserIsNotPresentException 
 
-    user = await UserService.find_by_id(user_id)
+    user = await UserService.find_by_id_cached(user_id)
     if not user:
         raise UserIsNotPresentException  
 
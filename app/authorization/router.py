@@ -1,19 +1,17 @@
 from sqlalchemy.exc import IntegrityError
 from fastapi import APIRouter, Depends, Response, status
-from jose import jwt, JWTError
 from datetime import datetime
 
 from app.users.services import UserService
-from app.config import settings
 from app.users.schemas import UserCreate, UserLogin, User as UserSchema
 from app.authorization.dependencies import check_is_current_user_root, get_token
 from app.authorization.authorization import (
-    get_password_hash,
+    get_password_hash_async,
     authenticate_user,
     create_access_token,
+    decode_access_token,
 )
 from app.exceptions import (
-    IncorrectFormatTokenException,
     TokenExpiredException,
     UserAlreadyExistsException,
     IncorrectEmailOrPasswordException,
@@ -38,7 +36,7 @@ async def register_user(user_data: UserCreate, current_user: UserSchema = Depend
     if existing_user:
         raise UserAlreadyExistsException
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     try:
         await UserService.add(
             email=user_data.email,
@@ -81,10 +79,7 @@ async def logout_user(response: Response) -> dict:
 @router.post("/valid_check", status_code=status.HTTP_200_OK)
 async def access_token_valid_check(token = Depends(get_token)):
     if token:
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, settings.ALGORITHM)
-        except JWTError:
-            raise IncorrectFormatTokenException
+        payload = decode_access_token(token)
 
         expire: str = payload.get("exp")
         if not expire or datetime.utcnow().timestamp() > expire:
@@ -94,7 +89,7 @@ async def access_token_valid_check(token = Depends(get_token)):
         if not user_id:
             raise UserIsNotPresentException 
 
-        user = await UserService.find_by_id(user_id)
+        user = await UserService.find_by_id_cached(user_id)
         if not user:
             raise UserIsNotPresentException  
         
@@ -0,0 +1,146 @@
+import time, asyncpg
+
+from threading import Lock
+from collections import OrderedDict
+from sqlalchemy import text
+
+from app.config import settings
+from app.logger import logger
+from app.database import async_session_maker
+
+
+class TTLCache:
+    """
+    LRU кэш с ограничением по количеству записей и временем жизни каждой записи.
+    Потокобезопасен, считает попадания и промахи.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Получение значения по ключу. Просроченные записи удаляются
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expire_at = item
+            if expire_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """
+        Получение значения без учёта в статистике и без изменения порядка вытеснения
+        """
+        with self._lock:
+            item = self._data.get(key)
+        if item is None or item[1] <= time.monotonic():
+            return default
+        return item[0]
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        """
+        Сохранение значения. Время жизни можно задать для отдельной записи
+        """
+        expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expire_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """
+        Удаление записи из кэша
+        """
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[0] if item else default
+
+    def values(self) -> list:
+        """
+        Снимок актуальных значений кэша
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [value for value, expire_at in self._data.values() if expire_at > now]
+
+    def clear(self) -> None:
+        """
+        Очистка кэша
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Статистика работы кэша
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class CacheInvalidationChannel:
+    """
+    Канал сброса кэша между воркерами через LISTEN/NOTIFY PostgreSQL.
+    Каждый воркер слушает канал и вызывает handler с ключом из уведомления.
+    """
+
+    def __init__(self, channel: str, handler):
+        self.channel = channel
+        self.handler = handler
+        self.connection: asyncpg.Connection | None = None
+
+    async def start(self) -> None:
+        """
+        Подключение к БД и подписка на канал
+        """
+        dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        self.connection = await asyncpg.connect(dsn)
+        await self.connection.add_listener(self.channel, self._on_notify)
+        logger.info(f"Подписка на канал сброса кэша {self.channel}")
+
+    async def stop(self) -> None:
+        """
+        Отписка от канала и закрытие соединения
+        """
+        if self.connection is not None:
+            await self.connection.remove_listener(self.channel, self._on_notify)
+            await self.connection.close()
+            self.connection = None
+
+    async def publish(self, key: str) -> None:
+        """
+        Отправка уведомления о сбросе ключа всем воркерам
+        """
+        async with async_session_maker() as session:
+            await session.execute(text("SELECT pg_notify(:channel, :key)"), {"channel": self.channel, "key": key})
+            await session.commit()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.handler(payload)
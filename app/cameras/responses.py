@@ -1,7 +1,7 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
-from app.cameras.schemas import CameraPublic, UserCameraBase, FavoriteCameraBase, CameraAdmin
+from app.cameras.schemas import CameraPublic, UserCameraBase, FavoriteCameraBase, CameraAdmin, CameraSnapshot, BulkAccessItem
 
 
 class CameraResponse(BaseModel):
@@ -10,6 +10,8 @@ class CameraResponse(BaseModel):
 
 class CamerasResponse(BaseModel):
     cameras: List[CameraPublic]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
 
 
 class AdminCameraResponse(BaseModel):
@@ -18,12 +20,30 @@ class AdminCameraResponse(BaseModel):
 
 class AdminCamerasResponse(BaseModel):
     cameras: List[CameraAdmin]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
 
 
 class UserCamerasResponse(BaseModel):
     cameras: List[UserCameraBase]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
 
 
 class UserFavoritesCamerasResponse(BaseModel):
     cameras: List[FavoriteCameraBase]
-    
\ No newline at end of file
+    
+
+
+class CameraSnapshotsResponse(BaseModel):
+    snapshots: List[CameraSnapshot]
+
+
+class BulkAccessResponse(BaseModel):
+    results: List[BulkAccessItem]
+    summary: dict[str, int]
+
+
+class CamerasDeletedResponse(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
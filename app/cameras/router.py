@@ -1,15 +1,27 @@
+import base64
+
 from uuid import UUID
+from typing import List
 from datetime import datetime
-from fastapi import APIRouter, Depends, status
-
-from app.users.services import UserService
-from app.cameras.utils import cameras_list_formatter, handle_stream_url, format_camera
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_session
+from app.models import Camera, UserRole
+from app.pagination import Pagination
+from app.services import violated_foreign_key
+from app.cameras.snapshots import Snapshot, snapshot_service, snapshot_cache
+from app.cameras.utils import cameras_list_formatter_async, handle_stream_url, format_camera, invalidate_stream_url
 from app.users.schemas import User as UserSchema
 from app.stream.url_encryption import encrypt_stream_url
+from app.stream.acl import camera_acl, acl_changed
 from app.authorization.dependencies import get_current_user, check_is_current_user_admin
 from app.cameras.services import CameraService, UserCameraService, UserFavoriteCameraService
-from app.cameras.schemas import CameraCreate, CameraUpdate, UserCameraBase
-from app.cameras.responses import AdminCameraResponse, CamerasResponse, CameraResponse, UserCamerasResponse, AdminCamerasResponse
+from app.cameras.schemas import CameraCreate, CameraUpdate, UserCameraBase, CameraPublic, CameraAdmin, BulkAccessRequest, BulkAccessItem, BulkAccessStatus, CameraIdsBase
+from app.cameras.responses import AdminCameraResponse, CamerasResponse, CameraResponse, UserCamerasResponse, AdminCamerasResponse, CameraSnapshotsResponse, BulkAccessResponse, CamerasDeletedResponse
 from app.exceptions import (
     UserAlreadyHasAccessToThisCameraException,
     UserCamerasNotFoundException, 
@@ -17,7 +29,12 @@ from app.exceptions import (
     UserFavoriteCamerasNotFoundException, 
     UserAlreadyHasThisFavoriteCameraException,
     UserNotFoundException,
-    CameraHasForeignKeysException
+    CameraHasForeignKeysException,
+    CameraNotFoundException,
+    SnapshotUnavailableException,
+    TooManySnapshotsRequestedException,
+    TooManyBulkAccessItemsException,
+    TooManyCamerasToDeleteException,
     )
 
 
@@ -28,35 +45,82 @@ router = APIRouter(
 
 
 @router.post("/", response_model=CamerasResponse, status_code=status.HTTP_201_CREATED)
-async def add_camera(camera_data: CameraCreate, current_user: UserSchema = Depends(check_is_current_user_admin)):
+async def add_camera(camera_data: CameraCreate, current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
     """
-    Добавление камеры (у пользователя должна быть роль администратора и выше)
+    Добавление камеры (у пользователя должна быть роль администратора и выше). Возвращает добавленную камеру
     """
     encrypted_stream_url = encrypt_stream_url(camera_data.stream_url)
     
-    await CameraService.add(name=camera_data.name, stream_url=encrypted_stream_url, location=camera_data.location)
-    cameras = await CameraService.find_all()
+    camera = await CameraService.add(
+        name=camera_data.name,
+        stream_url=encrypted_stream_url,
+        location=camera_data.location,
+        transcode_mode=camera_data.transcode_mode,
+        transcode_profile=camera_data.transcode_profile,
+        hls_mode=camera_data.hls_mode,
+        session=session,
+    )
+    await session.commit()
 
-    return {"cameras": cameras}
+    return {"cameras": [camera]}
 
 
 @router.get("/all", response_model=AdminCamerasResponse, status_code=status.HTTP_200_OK)
-async def get_all_cameras(current_user: UserSchema = Depends(check_is_current_user_admin)):
+async def get_all_cameras(pagination: Pagination = Depends(), current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
     """
-    Получение всех камер (у пользователя должна быть роль администратора и выше)
+    Получение всех камер постранично (у пользователя должна быть роль администратора и выше)
     """
-    cameras = await CameraService.find_all()
-    cameras_list = cameras_list_formatter(cameras)
+    page = await CameraService.find_page(columns=list(CameraAdmin.__fields__), session=session, **pagination.as_dict())
+    cameras_list = await cameras_list_formatter_async(page["items"])
+
+    return {"cameras": cameras_list, "next_cursor": page["next_cursor"], "total": page["total"]}
 
-    return {"cameras": cameras_list}
+
+def snapshot_response(request: Request, snapshot: Snapshot) -> Response:
+    headers = {
+        "Cache-Control": f"private, max-age={int(settings.SNAPSHOT_MAX_AGE)}",
+        "ETag": snapshot.etag,
+        "Last-Modified": datetime.utcfromtimestamp(snapshot.captured_at).strftime("%a, %d %b %Y %H:%M:%S GMT"),
+    }
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.data, media_type="image/jpeg", headers=headers)
+
+
+@router.get("/snapshots", response_model=CameraSnapshotsResponse, status_code=status.HTTP_200_OK)
+async def get_camera_snapshots(ids: List[int] = Query(...), current_user: UserSchema = Depends(get_current_user)):
+    """
+    Миниатюры нескольких камер (JPEG в base64). Камеры, к которым у пользователя нет доступа, пропускаются.
+    Отдаются только миниатюры из кэша: для камер без миниатюры image равен null, кадр снимается в фоне
+    и будет доступен при следующем запросе
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.SNAPSHOT_BATCH_MAX:
+        raise TooManySnapshotsRequestedException
+
+    if current_user.role not in (UserRole.ADMIN, UserRole.ROOT):
+        allowed = await camera_acl.allowed_cameras(current_user.id)
+        ids = [camera_id for camera_id in ids if camera_id in allowed]
+
+    cameras = await CameraService.select_all_filter(Camera.id.in_(ids)) if ids else []
+    snapshots = await snapshot_service.get_many(cameras)
+
+    return {"snapshots": [
+        {
+            "camera_id": camera.id,
+            "image": base64.b64encode(snapshot.data).decode() if snapshot else None,
+            "captured_at": datetime.utcfromtimestamp(snapshot.captured_at) if snapshot else None,
+        }
+        for camera, snapshot in zip(cameras, snapshots)
+    ]}
 
 
 @router.get("/{camera_id}", response_model=CameraResponse, status_code=status.HTTP_200_OK)
-async def get_camera_by_id(camera_id: int, current_user: UserSchema = Depends(check_is_current_user_admin)):
+async def get_camera_by_id(camera_id: int, current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
     """
     Получение камеры по её ID (у пользователя должна быть роль администратора и выше)
     """
-    camera = await CameraService.find_one_or_none(id=camera_id)
+    camera = await CameraService.find_one_or_none(id=camera_id, session=session)
     if not camera:
         raise UserCameraNotFoundException
 
@@ -64,48 +128,78 @@ async def get_camera_by_id(camera_id: int, current_user: UserSchema = Depends(ch
 
 
 @router.get("/users/{user_id}", response_model=UserCamerasResponse, status_code=status.HTTP_200_OK)
-async def get_all_cameras_by_user(user_id: UUID, current_user: UserSchema = Depends(check_is_current_user_admin)):  
+async def get_all_cameras_by_user(user_id: UUID, pagination: Pagination = Depends(), current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
     """
-    Получение камер, закрепленных за пользователем (должна быть роль администратора и выше)
+    Получение камер, закрепленных за пользователем, постранично (должна быть роль администратора и выше)
     """ 
-    cameras = await UserCameraService.find_all(user_id=user_id)
-    if not cameras:
+    page = await UserCameraService.find_page(order_by="camera_id", user_id=user_id, session=session, **pagination.as_dict())
+    if not page["items"] and not pagination.cursor:
         raise UserCamerasNotFoundException
     
-    return {"cameras": cameras}
+    return {"cameras": page["items"], "next_cursor": page["next_cursor"], "total": page["total"]}
+
+
+async def forget_cameras(deleted) -> None:
+    """
+    Очистка кэшей удалённых камер: разобранных ссылок, списков доступа и миниатюр
+    """
+    for camera_id, stream_url in deleted:
+        invalidate_stream_url(stream_url)
+        camera_acl.revoke_camera(camera_id)
+    await run_in_threadpool(snapshot_cache.drop_many, [camera_id for camera_id, _ in deleted])
+
+
+@router.post("/bulk_delete", response_model=CamerasDeletedResponse, status_code=status.HTTP_200_OK)
+async def delete_cameras(camera_data: CameraIdsBase, confirm: bool = False, current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
+    """
+    Удаление нескольких камер (у пользователя должна быть роль администратора и выше).
+    Как и при удалении одной камеры, при наличии связанных записей нужно подтверждение confirm=true.
+    Все камеры удаляются одним запросом в одной транзакции. Возвращает id удалённых и не найденных камер
+    """
+    camera_ids = list(dict.fromkeys(camera_data.camera_ids))
+    if len(camera_ids) > settings.BULK_DELETE_MAX_CAMERAS:
+        raise TooManyCamerasToDeleteException
+
+    if await CameraService.has_links(camera_ids, session=session) and not confirm:
+        raise CameraHasForeignKeysException
+
+    deleted = await CameraService.delete_many(camera_ids, session=session)
+    await session.commit()
+    await forget_cameras(deleted)
+
+    deleted_ids = {camera_id for camera_id, _ in deleted}
+    return {
+        "deleted": [camera_id for camera_id in camera_ids if camera_id in deleted_ids],
+        "not_found": [camera_id for camera_id in camera_ids if camera_id not in deleted_ids],
+    }
 
 
 @router.delete("/{camera_id}", response_model=dict, status_code=status.HTTP_200_OK)
-async def delete_camera(camera_id: int, confirm: bool = False, current_user: UserSchema = Depends(check_is_current_user_admin)) -> dict:
+async def delete_camera(camera_id: int, confirm: bool = False, current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)) -> dict:
     """
     Удаление камеры (у пользователя должна быть роль администратора и выше).
     Если камера связана с другими записями, будет предложено подтверждение на удаление всех связанных записей.
+    Проверка связей (EXISTS) и удаление выполняются в одной транзакции, связанные записи удаляются каскадно в БД
     """
-    camera = await CameraService.find_one_or_none(id=camera_id)
-    if not camera:
-        raise UserCameraNotFoundException
+    if await CameraService.has_links([camera_id], session=session) and not confirm:
+        raise CameraHasForeignKeysException
 
-    user_cameras = await UserCameraService.find_all(camera_id=camera_id)
-    favorite_cameras = await UserFavoriteCameraService.find_all(camera_id=camera_id)
-
-    if user_cameras or favorite_cameras:
-        if not confirm:
-            raise CameraHasForeignKeysException
-        
-        await UserCameraService.delete_all(camera_id=camera_id)
-        await UserFavoriteCameraService.delete_all(camera_id=camera_id)
+    deleted = await CameraService.delete_many([camera_id], session=session)
+    if not deleted:
+        raise UserCameraNotFoundException
 
-    await CameraService.delete(id=camera_id)
+    await session.commit()
+    await forget_cameras(deleted)
 
     return {"success": True}
 
 
 @router.patch("/{camera_id}", response_model=dict|AdminCameraResponse, status_code=status.HTTP_200_OK)
-async def edit_camera(camera_id: int, camera_data: CameraUpdate, current_user: UserSchema = Depends(check_is_current_user_admin)):
+async def edit_camera(camera_id: int, camera_data: CameraUpdate, current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
     """
     Редактирование камеры (у пользователя должна быть роль администратора и выше)
     """
-    camera = await CameraService.find_one_or_none(id=camera_id)
+    camera = await CameraService.find_one_or_none(id=camera_id, session=session)
     if not camera:
         raise UserCameraNotFoundException
     
@@ -119,132 +213,233 @@ async def edit_camera(camera_id: int, camera_data: CameraUpdate, current_user: U
     if 'stream_url' in update_data:
         update_data['stream_url'] = await handle_stream_url(update_data['stream_url'], camera.stream_url)
 
-    updated_camera = await CameraService.update(id=camera_id, **update_data)
+    updated_camera = await CameraService.update(id=camera_id, session=session, **update_data)
+    await session.commit()
+    if 'stream_url' in update_data:
+        invalidate_stream_url(camera.stream_url)
+        await run_in_threadpool(snapshot_cache.drop, camera_id)
     if updated_camera:
-        camera = await CameraService.find_by_id(camera_id)
-        return format_camera(camera)
+        return format_camera(updated_camera)
     
     return {"success": False}
 
 
 @router.post("/user/add_camera", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def add_camera_to_user(camera_data: UserCameraBase, current_user: UserSchema = Depends(check_is_current_user_admin)):
+async def add_camera_to_user(camera_data: UserCameraBase, current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
     """
-    Открытие доступа к камере пользователю
+    Открытие доступа к камере пользователю. Одним запросом INSERT ... ON CONFLICT DO NOTHING:
+    отсутствие пользователя или камеры определяется по нарушению внешнего ключа
     """
-    user_camera = await UserCameraService.find_one_or_none(camera_id=camera_data.camera_id, user_id=camera_data.user_id)
-    if user_camera:
+    try:
+        granted = await UserCameraService.add_if_absent(camera_id=camera_data.camera_id, user_id=camera_data.user_id, session=session)
+    except IntegrityError as e:
+        column = violated_foreign_key(e)
+        if column == "user_id":
+            raise UserNotFoundException
+        if column == "camera_id":
+            raise UserCameraNotFoundException
+        raise
+
+    if not granted:
         raise UserAlreadyHasAccessToThisCameraException
 
-    user = await UserService.find_one_or_none(id=camera_data.user_id)
-    if not user:
-        raise UserNotFoundException
-    
-    camera = await CameraService.find_one_or_none(id=camera_data.camera_id)
-    if not camera:
-        raise UserCameraNotFoundException
-    
-    await UserCameraService.add(camera_id=camera_data.camera_id, user_id=camera_data.user_id)
+    await session.commit()
+    camera_acl.grant(camera_data.user_id, camera_data.camera_id)
+    await acl_changed(camera_data.user_id)
     return {"success": True}
 
 
 @router.post("/user/delete_camera", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def delete_camera_from_user(camera_data: UserCameraBase, current_user: UserSchema = Depends(check_is_current_user_admin)):
+async def delete_camera_from_user(camera_data: UserCameraBase, current_user: UserSchema = Depends(check_is_current_user_admin), session: AsyncSession = Depends(get_session)):
     """
     Открытие доступа к камере пользователю
     """
-    user_camera = await UserCameraService.find_one_or_none(camera_id=camera_data.camera_id, user_id=camera_data.user_id)
-    if not user_camera:
+    deleted = await UserCameraService.delete(camera_id=camera_data.camera_id, user_id=camera_data.user_id, session=session)
+    if not deleted:
         raise UserCameraNotFoundException
-    
-    await UserCameraService.delete(camera_id=camera_data.camera_id, user_id=camera_data.user_id)
+
+    await session.commit()
+    camera_acl.revoke(camera_data.user_id, camera_data.camera_id)
+    await acl_changed(camera_data.user_id)
     return {"success": True}
 
 
+async def bulk_access_pairs(data: BulkAccessRequest) -> list[tuple[UUID, int]]:
+    """
+    Пары (user_id, camera_id) запроса без повторов: явный список и все камеры места установки для user_ids
+    """
+    pairs = [(pair.user_id, pair.camera_id) for pair in data.pairs]
+    if data.location is not None:
+        camera_ids = await CameraService.find_ids_by_location(data.location)
+        if len(camera_ids) * len(data.user_ids) + len(pairs) > settings.BULK_ACCESS_MAX_ITEMS:
+            raise TooManyBulkAccessItemsException
+        pairs += [(user_id, camera_id) for user_id in data.user_ids for camera_id in camera_ids]
+    pairs = list(dict.fromkeys(pairs))
+    if len(pairs) > settings.BULK_ACCESS_MAX_ITEMS:
+        raise TooManyBulkAccessItemsException
+    return pairs
+
+
+def bulk_access_response(results: list[BulkAccessItem]) -> dict:
+    summary = {}
+    for item in results:
+        summary[item.status] = summary.get(item.status, 0) + 1
+    return {"results": results, "summary": summary}
+
+
+@router.post("/user/bulk_add_cameras", response_model=BulkAccessResponse, status_code=status.HTTP_200_OK)
+async def bulk_add_cameras_to_users(data: BulkAccessRequest, current_user: UserSchema = Depends(check_is_current_user_admin)):
+    """
+    Массовое открытие доступа: список пар pairs и/или все камеры места установки location для пользователей user_ids.
+    Пары обрабатываются частями по BULK_ACCESS_CHUNK_SIZE, каждая часть - один INSERT ... SELECT в своей транзакции,
+    поэтому ошибка в одной части не откатывает уже выданный доступ. Результат возвращается по каждой паре
+    """
+    pairs = await bulk_access_pairs(data)
+    results = []
+    changed_users = set()
+    for start in range(0, len(pairs), settings.BULK_ACCESS_CHUNK_SIZE):
+        chunk = pairs[start:start + settings.BULK_ACCESS_CHUNK_SIZE]
+        checked = {(row.user_id, row.camera_id): row for row in await UserCameraService.bulk_grant(chunk)}
+        for user_id, camera_id in chunk:
+            row = checked[(user_id, camera_id)]
+            if row.granted:
+                item_status = BulkAccessStatus.GRANTED
+                camera_acl.grant(user_id, camera_id)
+                changed_users.add(user_id)
+            elif not row.user_exists:
+                item_status = BulkAccessStatus.USER_NOT_FOUND
+            elif not row.camera_exists:
+                item_status = BulkAccessStatus.CAMERA_NOT_FOUND
+            else:
+                item_status = BulkAccessStatus.ALREADY_GRANTED
+            results.append(BulkAccessItem(user_id=user_id, camera_id=camera_id, status=item_status))
+
+    for user_id in changed_users:
+        await acl_changed(user_id)
+    return bulk_access_response(results)
+
+
+@router.post("/user/bulk_delete_cameras", response_model=BulkAccessResponse, status_code=status.HTTP_200_OK)
+async def bulk_delete_cameras_from_users(data: BulkAccessRequest, current_user: UserSchema = Depends(check_is_current_user_admin)):
+    """
+    Массовое закрытие доступа (те же варианты запроса, что и для открытия).
+    Каждая часть пар - один DELETE ... RETURNING в своей транзакции
+    """
+    pairs = await bulk_access_pairs(data)
+    results = []
+    changed_users = set()
+    for start in range(0, len(pairs), settings.BULK_ACCESS_CHUNK_SIZE):
+        chunk = pairs[start:start + settings.BULK_ACCESS_CHUNK_SIZE]
+        revoked = await UserCameraService.bulk_revoke(chunk)
+        for user_id, camera_id in chunk:
+            if (user_id, camera_id) in revoked:
+                item_status = BulkAccessStatus.REVOKED
+                camera_acl.revoke(user_id, camera_id)
+                changed_users.add(user_id)
+            else:
+                item_status = BulkAccessStatus.NOT_GRANTED
+            results.append(BulkAccessItem(user_id=user_id, camera_id=camera_id, status=item_status))
+
+    for user_id in changed_users:
+        await acl_changed(user_id)
+    return bulk_access_response(results)
+
+
 @router.get("/user/all", response_model=CamerasResponse, status_code=status.HTTP_200_OK)
-async def get_all_user_cameras(current_user: UserSchema = Depends(get_current_user)):
+async def get_all_user_cameras(pagination: Pagination = Depends(), current_user: UserSchema = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
-    Все камеры, закрепленные за пользователем
+    Все камеры, закрепленные за пользователем (постранично)
     """
-    user_cameras = await UserCameraService.find_all(user_id=current_user.id)
-    if not user_cameras:
+    page = await CameraService.find_page_by_user(current_user.id, columns=list(CameraPublic.__fields__), session=session, **pagination.as_dict())
+    if not page["items"] and not pagination.cursor:
         raise UserCamerasNotFoundException
 
-    cameras = []
-    for camera in user_cameras:
-        cameras.append(await CameraService.find_by_id(int(camera.camera_id)))
-        
-    return {"cameras": cameras}
+    return {"cameras": page["items"], "next_cursor": page["next_cursor"], "total": page["total"]}
 
 
 @router.get("/user/{camera_id}", response_model=CameraResponse, status_code=status.HTTP_200_OK)
-async def get_user_camera_by_id(camera_id: int, current_user: UserSchema = Depends(get_current_user)):
+async def get_user_camera_by_id(camera_id: int, current_user: UserSchema = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
     Получение камеры, закрепленной за пользователем по её ID
     """
-    user_camera = await UserCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id)
+    user_camera = await UserCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id, session=session)
     if not user_camera:
         raise UserCameraNotFoundException
     
-    camera = await CameraService.find_one_or_none(id=user_camera.camera_id)
+    camera = await CameraService.find_one_or_none(id=user_camera.camera_id, session=session)
     return {"camera": camera}
 
 
 @router.post("/favorite", response_model= dict, status_code=status.HTTP_201_CREATED)
-async def add_camera_to_favorite(camera_id: int, current_user: UserSchema = Depends(get_current_user)) -> dict:
+async def add_camera_to_favorite(camera_id: int, current_user: UserSchema = Depends(get_current_user), session: AsyncSession = Depends(get_session)) -> dict:
     """
     Добавление пользователем камеры в избранное (добавиться могут только те, которые закреплены за пользователем)
     """
-    camera = await UserCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id)
-    if not camera:
+    added = await UserFavoriteCameraService.add_if_allowed(user_id=current_user.id, camera_id=camera_id, session=session)
+    if not added:
+        favorite_camera = await UserFavoriteCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id, session=session)
+        if favorite_camera:
+            raise UserAlreadyHasThisFavoriteCameraException
         raise UserCameraNotFoundException
-    
-    favorite_camera = await UserFavoriteCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id)
-    if favorite_camera:
-        raise UserAlreadyHasThisFavoriteCameraException
 
-    await UserFavoriteCameraService.add(user_id=current_user.id, camera_id=camera_id)
+    await session.commit()
     return {"success": True}
 
 
 @router.get("/favorite/all", response_model=CamerasResponse, status_code=status.HTTP_200_OK)
-async def get_all_favorite_user_cameras(current_user: UserSchema = Depends(get_current_user)):
+async def get_all_favorite_user_cameras(pagination: Pagination = Depends(), current_user: UserSchema = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
-    Все избранные камеры пользователя (выводятся только те, которые закреплены за пользователем и были добавлены им в избранное)
+    Все избранные камеры пользователя постранично (выводятся только те, которые закреплены за пользователем и были добавлены им в избранное)
     """
-    user_favorite_cameras = await UserFavoriteCameraService.find_all(user_id=current_user.id)
-    if not user_favorite_cameras:
+    page = await CameraService.find_page_favorites_by_user(current_user.id, columns=list(CameraPublic.__fields__), session=session, **pagination.as_dict())
+    if not page["items"] and not pagination.cursor:
         raise UserFavoriteCamerasNotFoundException
-    
-    cameras = []
-    for camera in user_favorite_cameras:
-        cameras.append(await CameraService.find_by_id(int(camera.camera_id)))
 
-    return {"cameras": cameras}
+    return {"cameras": page["items"], "next_cursor": page["next_cursor"], "total": page["total"]}
 
 
 @router.get("/favorite/{camera_id}", response_model=CameraResponse, status_code=status.HTTP_200_OK)
-async def get_favorite_user_camera_by_id(camera_id: int, current_user: UserSchema = Depends(get_current_user)):
+async def get_favorite_user_camera_by_id(camera_id: int, current_user: UserSchema = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
     Получение избранной камеры пользователя по её ID (если пользователь введёт камеру, которая не закреплена за ним, то ничего не выведется в ответ)
     """
-    user_favorite_camera = await UserFavoriteCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id)
+    user_favorite_camera = await UserFavoriteCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id, session=session)
     if not user_favorite_camera:
         raise UserCameraNotFoundException
     
-    camera = await CameraService.find_one_or_none(id=user_favorite_camera.camera_id)
+    camera = await CameraService.find_one_or_none(id=user_favorite_camera.camera_id, session=session)
 
     return {"camera": camera}
 
 
 @router.post("/favorite/delete", response_model= dict, status_code=status.HTTP_200_OK)
-async def delete_camera_from_favorite(camera_id: int, current_user: UserSchema = Depends(get_current_user)) -> dict:
+async def delete_camera_from_favorite(camera_id: int, current_user: UserSchema = Depends(get_current_user), session: AsyncSession = Depends(get_session)) -> dict:
     """
     Удаление пользователем камеры из избранного
     """
-    favorite_camera = await UserFavoriteCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id)
-    if not favorite_camera:
+    deleted = await UserFavoriteCameraService.delete(user_id=current_user.id, camera_id=camera_id, session=session)
+    if not deleted:
         raise UserCameraNotFoundException
 
-    await UserFavoriteCameraService.delete(user_id=current_user.id, camera_id=camera_id)
+    await session.commit()
     return {"success": True}
+
+
+@router.get("/{camera_id}/snapshot", status_code=status.HTTP_200_OK, response_class=Response)
+async def get_camera_snapshot(request: Request, camera_id: int, current_user: UserSchema = Depends(get_current_user)):
+    """
+    Миниатюра камеры в JPEG. Берётся из кэша, устаревшая обновляется в фоне.
+    Если камера уже транслируется, кадр берётся из последнего сегмента вместо нового подключения к камере
+    """
+    if current_user.role not in (UserRole.ADMIN, UserRole.ROOT) and not await camera_acl.has_access(current_user.id, camera_id):
+        raise UserCameraNotFoundException
+
+    camera = await CameraService.find_one_or_none(id=camera_id)
+    if not camera:
+        raise CameraNotFoundException
+
+    snapshot = await snapshot_service.get(camera)
+    if snapshot is None:
+        raise SnapshotUnavailableException
+
+    return snapshot_response(request, snapshot)
@@ -1,13 +1,45 @@
 from uuid import UUID
 from typing import Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, validator, root_validator
+
+from app.models import TranscodeMode, HLSMode
+from app.stream.profiles import TRANSCODE_PROFILES, DEFAULT_PROFILE
+
+
+TRANSCODE_MODES = (TranscodeMode.AUTO, TranscodeMode.COPY, TranscodeMode.TRANSCODE)
+HLS_MODES = (HLSMode.STANDARD, HLSMode.LOW_LATENCY)
+
+
+def check_transcode_mode(value):
+    if value not in (None, "") and value not in TRANSCODE_MODES:
+        raise ValueError(f"Допустимые режимы: {', '.join(TRANSCODE_MODES)}")
+    return value
+
+
+def check_transcode_profile(value):
+    if value not in (None, "") and value not in TRANSCODE_PROFILES:
+        raise ValueError(f"Допустимые профили: {', '.join(TRANSCODE_PROFILES)}")
+    return value
+
+
+def check_hls_mode(value):
+    if value not in (None, "") and value not in HLS_MODES:
+        raise ValueError(f"Допустимые режимы HLS: {', '.join(HLS_MODES)}")
+    return value
 
 
 class CameraCreate(BaseModel):
     name: str
     stream_url: str
     location: str
+    transcode_mode: str = TranscodeMode.TRANSCODE
+    transcode_profile: str = DEFAULT_PROFILE
+    hls_mode: str = HLSMode.STANDARD
+
+    _check_transcode_mode = validator('transcode_mode', allow_reuse=True)(check_transcode_mode)
+    _check_transcode_profile = validator('transcode_profile', allow_reuse=True)(check_transcode_profile)
+    _check_hls_mode = validator('hls_mode', allow_reuse=True)(check_hls_mode)
 
 
 class CameraPublic(BaseModel):
@@ -33,6 +65,9 @@ class CameraAdmin(BaseModel):
     name: str
     stream_url: str|list[URLStreamDetails]
     location: str
+    transcode_mode: str
+    transcode_profile: str
+    hls_mode: str
 
     class Config:
         orm_mode = True
@@ -42,11 +77,22 @@ class CameraUpdate(BaseModel):
     name: Optional[str] = None
     stream_url: Optional[list[URLStreamDetails]|str] = None
     location: Optional[str] = None
+    transcode_mode: Optional[str] = None
+    transcode_profile: Optional[str] = None
+    hls_mode: Optional[str] = None
+
+    _check_transcode_mode = validator('transcode_mode', allow_reuse=True)(check_transcode_mode)
+    _check_transcode_profile = validator('transcode_profile', allow_reuse=True)(check_transcode_profile)
+    _check_hls_mode = validator('hls_mode', allow_reuse=True)(check_hls_mode)
 
     class Config:
         orm_mode = True
 
 
+class CameraIdsBase(BaseModel):
+    camera_ids: list[int]
+
+
 class UserCameraBase(BaseModel):
     user_id: UUID
     camera_id: int
@@ -55,8 +101,45 @@ class UserCameraBase(BaseModel):
         orm_mode = True
 
 
+class BulkAccessStatus:
+    GRANTED = "granted"
+    REVOKED = "revoked"
+    ALREADY_GRANTED = "already_granted"
+    NOT_GRANTED = "not_granted"
+    USER_NOT_FOUND = "user_not_found"
+    CAMERA_NOT_FOUND = "camera_not_found"
+
+
+class BulkAccessRequest(BaseModel):
+    pairs: list[UserCameraBase] = []
+    location: Optional[str] = None
+    user_ids: list[UUID] = []
+
+    @root_validator(skip_on_failure=True)
+    def check_target(cls, values):
+        if values["location"] is None and values["user_ids"]:
+            raise ValueError("Список user_ids указывается вместе с location")
+        if values["location"] is not None and not values["user_ids"]:
+            raise ValueError("Для location нужен список user_ids")
+        if not values["pairs"] and values["location"] is None:
+            raise ValueError("Нужен список pairs или location с user_ids")
+        return values
+
+
+class BulkAccessItem(BaseModel):
+    user_id: UUID
+    camera_id: int
+    status: str
+
+
 class FavoriteCameraBase(BaseModel):
     camera_id: int
 
     class Config:
         orm_mode = True
+
+
+class CameraSnapshot(BaseModel):
+    camera_id: int
+    image: Optional[str] = None
+    captured_at: Optional[datetime] = None
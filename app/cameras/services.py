@@ -1,63 +1,203 @@
-from sqlalchemy import delete
+from sqlalchemy import delete, select, text, func, literal, exists, and_, or_, tuple_, values, column, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
 
 from app.services import BaseRequests
-from app.database import async_session_maker
-from app.models import Camera, UserCamera, FavoriteCamera
+from app.database import async_session_maker, use_session
+from app.models import User, Camera, UserCamera, FavoriteCamera
 
 
 class CameraService(BaseRequests):
     model = Camera
 
     @classmethod
-    async def import_cameras(cls, objects):
-        """Добавление камер из списка"""
-        async with async_session_maker() as session:
-            async with session.begin():
-                session.add_all(objects)
+    async def find_ids_by_location(cls, location: str, session: AsyncSession | None = None) -> list[int]:
+        """Поиск id всех камер по месту установки"""
+        async with use_session(session) as session:
+            query = select(cls.model.id).where(cls.model.location == location).order_by(cls.model.id)
+            result = await session.execute(query)
+            return result.scalars().all()
+
+    @classmethod
+    async def has_links(cls, camera_ids: list[int], session: AsyncSession | None = None) -> bool:
+        """Проверка через EXISTS, есть ли у камер доступы пользователей или записи в избранном"""
+        async with use_session(session) as session:
+            query = select(or_(
+                exists().where(UserCamera.camera_id.in_(camera_ids)),
+                exists().where(FavoriteCamera.camera_id.in_(camera_ids)),
+            ))
+            result = await session.execute(query)
+            return result.scalar()
+
+    @classmethod
+    async def delete_many(cls, camera_ids: list[int], session: AsyncSession | None = None) -> list:
+        """Удаление камер одним DELETE ... RETURNING (доступы и избранное удаляются каскадно в БД).
+        Возвращает id и ссылки удалённых камер"""
+        async with use_session(session, commit=True) as session:
+            query = delete(cls.model).where(cls.model.id.in_(camera_ids)).returning(cls.model.id, cls.model.stream_url)
+            result = await session.execute(query)
+            return result.all()
+
+    @classmethod
+    async def bulk_insert(cls, rows: list[dict], session_maker=async_session_maker) -> list[int]:
+        """Пакетная вставка камер одним INSERT ... ON CONFLICT DO NOTHING. Возвращает id добавленных камер"""
+        if not rows:
+            return []
+        async with session_maker() as session:
+            query = pg_insert(cls.model).values(rows).on_conflict_do_nothing(index_elements=[cls.model.id]).returning(cls.model.id)
+            result = await session.execute(query)
             await session.commit()
+            return result.scalars().all()
+
+    @classmethod
+    async def sync_id_sequence(cls, session_maker=async_session_maker):
+        """Синхронизация последовательности id с максимальным id после импорта с явными id"""
+        async with session_maker() as session:
+            query = text("SELECT setval(pg_get_serial_sequence('cameras', 'id'), COALESCE((SELECT MAX(id) FROM cameras), 1))")
+            await session.execute(query)
+            await session.commit()
+
+    @classmethod
+    async def find_page_by_user(cls, user_id, limit: int, cursor: str | None = None, with_total: bool = False, columns: list[str] | None = None, session: AsyncSession | None = None) -> dict:
+        """Постраничный поиск камер, закрепленных за пользователем, одним запросом с JOIN"""
+        query = (
+            cls.select_columns(columns)
+            .join(UserCamera, UserCamera.camera_id == cls.model.id)
+            .where(UserCamera.user_id == user_id)
+        )
+        return await cls.paginate(query, cls.model.id, limit, cursor, with_total, columns, session)
+
+    @classmethod
+    async def find_page_favorites_by_user(cls, user_id, limit: int, cursor: str | None = None, with_total: bool = False, columns: list[str] | None = None, session: AsyncSession | None = None) -> dict:
+        """Постраничный поиск избранных камер пользователя одним запросом с JOIN"""
+        query = (
+            cls.select_columns(columns)
+            .join(FavoriteCamera, FavoriteCamera.camera_id == cls.model.id)
+            .where(FavoriteCamera.user_id == user_id)
+        )
+        return await cls.paginate(query, cls.model.id, limit, cursor, with_total, columns, session)
 
 
 class UserCameraService(BaseRequests):
     model = UserCamera
 
     @classmethod
-    async def delete(cls, user_id, camera_id):
-        """Удаление объектов"""
+    async def find_camera_ids(cls, user_id) -> set[int]:
+        """Поиск id всех камер, к которым у пользователя есть доступ"""
         async with async_session_maker() as session:
-            async with session.begin():
-                query = delete(cls.model).where(cls.model.user_id == user_id, cls.model.camera_id == camera_id)
-                await session.execute(query)
-                await session.commit()
+            query = select(cls.model.camera_id).where(cls.model.user_id == user_id)
+            result = await session.execute(query)
+            return set(result.scalars().all())
 
+    @classmethod
+    async def bulk_grant(cls, pairs: list[tuple], session: AsyncSession | None = None) -> list:
+        """Выдача доступа по списку пар (user_id, camera_id) одним запросом: пары из VALUES проверяются
+        LEFT JOIN на пользователей и камеры, существующие добавляются INSERT ... ON CONFLICT DO NOTHING RETURNING.
+        Возвращает строки (user_id, camera_id, user_exists, camera_exists, granted) по каждой паре"""
+        rows = values(column("user_id", UUID(as_uuid=True)), column("camera_id", Integer), name="pairs").data(pairs)
+        checked = (
+            select(
+                rows.c.user_id,
+                rows.c.camera_id,
+                User.id.is_not(None).label("user_exists"),
+                Camera.id.is_not(None).label("camera_exists"),
+            )
+            .select_from(rows)
+            .outerjoin(User, User.id == rows.c.user_id)
+            .outerjoin(Camera, Camera.id == rows.c.camera_id)
+            .cte("checked")
+        )
+        granted = (
+            pg_insert(cls.model)
+            .from_select(
+                ["user_id", "camera_id"],
+                select(checked.c.user_id, checked.c.camera_id).where(checked.c.user_exists, checked.c.camera_exists),
+            )
+            .on_conflict_do_nothing()
+            .returning(cls.model.user_id, cls.model.camera_id)
+            .cte("granted")
+        )
+        query = (
+            select(
+                checked.c.user_id,
+                checked.c.camera_id,
+                checked.c.user_exists,
+                checked.c.camera_exists,
+                granted.c.user_id.is_not(None).label("granted"),
+            )
+            .select_from(checked)
+            .outerjoin(granted, and_(granted.c.user_id == checked.c.user_id, granted.c.camera_id == checked.c.camera_id))
+        )
+        async with use_session(session, commit=True) as session:
+            result = await session.execute(query)
+            return result.all()
 
     @classmethod
-    async def delete_all(cls, camera_id: int):
-        """Удаление всех объектов, связанных с данной камерой"""
-        async with async_session_maker() as session:
-            async with session.begin():
-                query = delete(cls.model).where(cls.model.camera_id == camera_id)
-                await session.execute(query)
-                await session.commit()
+    async def bulk_revoke(cls, pairs: list[tuple], session: AsyncSession | None = None) -> set[tuple]:
+        """Отзыв доступа по списку пар (user_id, camera_id) одним DELETE ... RETURNING. Возвращает удалённые пары"""
+        async with use_session(session, commit=True) as session:
+            query = (
+                delete(cls.model)
+                .where(tuple_(cls.model.user_id, cls.model.camera_id).in_(pairs))
+                .returning(cls.model.user_id, cls.model.camera_id)
+            )
+            result = await session.execute(query)
+            return {tuple(row) for row in result.all()}
+
+    @classmethod
+    async def delete(cls, user_id, camera_id, session: AsyncSession | None = None) -> bool:
+        """Удаление объекта одним DELETE ... RETURNING. Возвращает False, если удалять было нечего"""
+        async with use_session(session, commit=True) as session:
+            query = (
+                delete(cls.model)
+                .where(cls.model.user_id == user_id, cls.model.camera_id == camera_id)
+                .returning(cls.model.camera_id)
+            )
+            result = await session.execute(query)
+            return result.first() is not None
+
 
 
 class UserFavoriteCameraService(BaseRequests):
     model = FavoriteCamera
 
     @classmethod
-    async def delete(cls, user_id, camera_id):
-        """Удаление объектов"""
+    async def find_most_popular_camera_ids(cls, limit: int) -> list[int]:
+        """Поиск id камер, которые чаще всего добавляют в избранное"""
         async with async_session_maker() as session:
-            async with session.begin():
-                query = delete(cls.model).where(cls.model.user_id == user_id, cls.model.camera_id == camera_id)
-                await session.execute(query)
-                await session.commit()
+            query = (
+                select(cls.model.camera_id)
+                .group_by(cls.model.camera_id)
+                .order_by(func.count().desc())
+                .limit(limit)
+            )
+            result = await session.execute(query)
+            return result.scalars().all()
 
+    @classmethod
+    async def add_if_allowed(cls, user_id, camera_id: int, session: AsyncSession | None = None) -> bool:
+        """Добавление в избранное одним запросом, только если камера закреплена за пользователем
+        (INSERT ... SELECT WHERE EXISTS ... ON CONFLICT DO NOTHING). Возвращает False, если камера не добавлена"""
+        allowed = select(UserCamera).where(UserCamera.user_id == user_id, UserCamera.camera_id == camera_id).exists()
+        async with use_session(session, commit=True) as session:
+            query = (
+                pg_insert(cls.model)
+                .from_select(["user_id", "camera_id"], select(literal(user_id, UserCamera.user_id.type), literal(camera_id)).where(allowed))
+                .on_conflict_do_nothing()
+                .returning(cls.model.camera_id)
+            )
+            result = await session.execute(query)
+            return result.first() is not None
 
     @classmethod
-    async def delete_all(cls, camera_id: int):
-        """Удаление всех объектов, связанных с данной камерой"""
-        async with async_session_maker() as session:
-            async with session.begin():
-                query = delete(cls.model).where(cls.model.camera_id == camera_id)
-                await session.execute(query)
-                await session.commit()
+    async def delete(cls, user_id, camera_id, session: AsyncSession | None = None) -> bool:
+        """Удаление объекта одним DELETE ... RETURNING. Возвращает False, если удалять было нечего"""
+        async with use_session(session, commit=True) as session:
+            query = (
+                delete(cls.model)
+                .where(cls.model.user_id == user_id, cls.model.camera_id == camera_id)
+                .returning(cls.model.camera_id)
+            )
+            result = await session.execute(query)
+            return result.first() is not None
+
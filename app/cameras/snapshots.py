@@ -0,0 +1,312 @@
+import os, cv2, time, asyncio, tempfile
+
+from threading import Lock
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+from app.logger import logger
+from app.stream.supervisor import stream_supervisor
+from app.stream.url_encryption import decrypt_stream_url
+from app.cameras.services import CameraService
+
+
+snapshot_executor = ThreadPoolExecutor(max_workers=settings.SNAPSHOT_WORKERS, thread_name_prefix="snapshot")
+
+# Отдельный пул для чтения и записи миниатюр на диск, чтобы обращения к кэшу не ждали съёмку с камер
+snapshot_cache_executor = ThreadPoolExecutor(max_workers=settings.SNAPSHOT_CACHE_WORKERS, thread_name_prefix="snapshot_cache")
+
+
+class Snapshot:
+    """
+    JPEG миниатюра кадра камеры
+    """
+
+    def __init__(self, camera_id: int, data: bytes, captured_at: float):
+        self.camera_id = camera_id
+        self.data = data
+        self.captured_at = captured_at
+        self.etag = f'"{camera_id:x}-{int(captured_at * 1000):x}"'
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.captured_at
+
+
+def encode_thumbnail(frame, width: int, quality: int) -> bytes | None:
+    """
+    Уменьшение кадра до заданной ширины (INTER_AREA, с сохранением пропорций) и кодирование в JPEG
+    """
+    height, frame_width = frame.shape[:2]
+    if frame_width > width:
+        frame = cv2.resize(frame, (width, max(1, round(height * width / frame_width))), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes() if ok else None
+
+
+def read_frame(source: str, timeout: float):
+    """
+    Чтение первого кадра из файла сегмента или RTSP потока
+    """
+    timeout_ms = int(timeout * 1000)
+    capture = cv2.VideoCapture(
+        source,
+        cv2.CAP_FFMPEG,
+        [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms],
+    )
+    try:
+        if not capture.isOpened():
+            return None
+        ok, frame = capture.read()
+        return frame if ok else None
+    finally:
+        capture.release()
+
+
+def latest_segment(directory: str, playlist_path: str) -> tuple[str, str | None] | None:
+    """
+    Последний сегмент плейлиста запущенного процесса ffmpeg и инициализирующий сегмент для fMP4
+    """
+    try:
+        with open(playlist_path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return None
+
+    init = None
+    segment = None
+    for line in lines:
+        if line.startswith("#EXT-X-MAP:") and 'URI="' in line:
+            init = line.split('URI="', 1)[1].split('"', 1)[0]
+        elif line and not line.startswith("#"):
+            segment = line
+    if segment is None:
+        return None
+    return os.path.join(directory, segment), os.path.join(directory, init) if init else None
+
+
+def frame_from_segment(segment_path: str, init_path: str | None, timeout: float):
+    """
+    Кадр из сегмента HLS. Сегмент fMP4 читается вместе с инициализирующим сегментом
+    """
+    if init_path is None:
+        return read_frame(segment_path, timeout)
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4") as combined:
+        with open(init_path, "rb") as init, open(segment_path, "rb") as segment:
+            combined.write(init.read())
+            combined.write(segment.read())
+        combined.flush()
+        return read_frame(combined.name, timeout)
+
+
+def capture_snapshot(camera_id: int, stream_url: str, segment: tuple[str, str | None] | None) -> bytes | None:
+    """
+    Получение миниатюры: из последнего сегмента запущенного процесса, иначе из RTSP потока камеры
+    """
+    frame = None
+    if segment is not None:
+        try:
+            frame = frame_from_segment(*segment, settings.SNAPSHOT_TIMEOUT)
+        except OSError:
+            frame = None
+    if frame is None:
+        frame = read_frame(stream_url, settings.SNAPSHOT_TIMEOUT)
+    if frame is None:
+        return None
+    return encode_thumbnail(frame, settings.SNAPSHOT_WIDTH, settings.SNAPSHOT_JPEG_QUALITY)
+
+
+class SnapshotCache:
+    """
+    LRU кэш миниатюр в памяти с ограничением по объёму. Вытесненные миниатюры сохраняются на диск
+    и при следующем обращении читаются оттуда, а не снимаются с камеры заново
+    """
+
+    def __init__(self, max_bytes: int, directory: str):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._snapshots: OrderedDict[int, Snapshot] = OrderedDict()
+        self._lock = Lock()
+
+    def _path(self, camera_id: int) -> str:
+        return os.path.join(self.directory, f"camera_{camera_id}.jpg")
+
+    def get(self, camera_id: int) -> Snapshot | None:
+        return self.get_memory(camera_id) or self.load(camera_id)
+
+    def get_memory(self, camera_id: int) -> Snapshot | None:
+        """
+        Миниатюра из памяти (без обращения к диску, можно вызывать из event loop)
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(camera_id)
+            if snapshot is not None:
+                self._snapshots.move_to_end(camera_id)
+                self.hits += 1
+            return snapshot
+
+    def load(self, camera_id: int) -> Snapshot | None:
+        """
+        Миниатюра, сохранённая на диск при вытеснении из памяти
+        """
+        path = self._path(camera_id)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            captured_at = os.stat(path).st_mtime
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        snapshot = Snapshot(camera_id, data, captured_at)
+        self._store(snapshot)
+        with self._lock:
+            self.disk_hits += 1
+        return snapshot
+
+    def set(self, snapshot: Snapshot) -> None:
+        self._store(snapshot)
+
+    def _store(self, snapshot: Snapshot) -> None:
+        evicted = []
+        with self._lock:
+            old = self._snapshots.pop(snapshot.camera_id, None)
+            if old is not None:
+                self.size -= len(old.data)
+            self._snapshots[snapshot.camera_id] = snapshot
+            self.size += len(snapshot.data)
+            while self.size > self.max_bytes and len(self._snapshots) > 1:
+                _, item = self._snapshots.popitem(last=False)
+                self.size -= len(item.data)
+                evicted.append(item)
+
+        for item in evicted:
+            self._spill(item)
+
+    def _spill(self, snapshot: Snapshot) -> None:
+        path = self._path(snapshot.camera_id)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{path}.tmp", "wb") as file:
+                file.write(snapshot.data)
+            os.utime(f"{path}.tmp", (snapshot.captured_at, snapshot.captured_at))
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить миниатюру камеры {snapshot.camera_id} на диск: {e}")
+
+    def drop(self, camera_id: int) -> None:
+        with self._lock:
+            old = self._snapshots.pop(camera_id, None)
+            if old is not None:
+                self.size -= len(old.data)
+        try:
+            os.remove(self._path(camera_id))
+        except OSError:
+            pass
+
+    def drop_many(self, camera_ids) -> None:
+        for camera_id in camera_ids:
+            self.drop(camera_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "snapshots": len(self._snapshots),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SnapshotService:
+    """
+    Выдача миниатюр камер: свежая миниатюра отдаётся из кэша, устаревшая отдаётся сразу
+    и обновляется в фоне, отсутствующая снимается в пуле потоков. Одновременные запросы
+    одной камеры используют одно и то же обновление
+    """
+
+    def __init__(self, cache: SnapshotCache, max_age: float):
+        self.cache = cache
+        self.max_age = max_age
+        self._refreshing: dict[int, asyncio.Future] = {}
+
+    async def _cached(self, camera_id: int) -> Snapshot | None:
+        snapshot = self.cache.get_memory(camera_id)
+        if snapshot is None:
+            snapshot = await asyncio.get_running_loop().run_in_executor(snapshot_cache_executor, self.cache.load, camera_id)
+        return snapshot
+
+    async def get(self, camera) -> Snapshot | None:
+        snapshot = await self._cached(camera.id)
+        if snapshot is not None:
+            if snapshot.age > self.max_age:
+                self.refresh(camera)
+            return snapshot
+
+        return await self.refresh(camera)
+
+    async def get_cached(self, camera) -> Snapshot | None:
+        """
+        Миниатюра только из кэша: отсутствующая или устаревшая миниатюра обновляется в фоне, ожидания съёмки нет
+        """
+        snapshot = await self._cached(camera.id)
+        if snapshot is None or snapshot.age > self.max_age:
+            self.refresh(camera)
+        return snapshot
+
+    async def get_many(self, cameras) -> list[Snapshot | None]:
+        return await asyncio.gather(*(self.get_cached(camera) for camera in cameras))
+
+    def refresh(self, camera) -> asyncio.Future:
+        """
+        Обновление миниатюры камеры в фоне (повторный вызов во время обновления возвращает то же обновление)
+        """
+        future = self._refreshing.get(camera.id)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(camera))
+            self._refreshing[camera.id] = future
+            future.add_done_callback(lambda _: self._refreshing.pop(camera.id, None))
+        return future
+
+    async def _refresh(self, camera) -> Snapshot | None:
+        segment = None
+        stream = stream_supervisor.streams.get(camera.id)
+        if stream is not None and stream.ready.is_set():
+            segment = latest_segment(stream.directory, stream.playlist_path)
+
+        loop = asyncio.get_running_loop()
+        try:
+            stream_url = decrypt_stream_url(camera.stream_url)
+            data = await loop.run_in_executor(snapshot_executor, capture_snapshot, camera.id, stream_url, segment)
+        except Exception as e:
+            logger.warning(f"Не удалось получить миниатюру камеры {camera.id}: {e}")
+            return None
+        if data is None:
+            return None
+
+        # Камеру могли удалить, пока шла съёмка: её миниатюра уже удалена из кэша и не должна вернуться
+        if await CameraService.find_by_id(camera.id) is None:
+            return None
+
+        snapshot = Snapshot(camera.id, data, time.time())
+        await loop.run_in_executor(snapshot_cache_executor, self.cache.set, snapshot)
+        return snapshot
+
+    def shutdown(self) -> None:
+        snapshot_executor.shutdown(wait=False, cancel_futures=True)
+        snapshot_cache_executor.shutdown(wait=False, cancel_futures=True)
+
+
+snapshot_cache = SnapshotCache(settings.SNAPSHOT_CACHE_MAX_BYTES, settings.SNAPSHOT_DIR)
+
+snapshot_service = SnapshotService(snapshot_cache, settings.SNAPSHOT_MAX_AGE)
@@ -1,15 +1,23 @@
-import re
+import re, asyncio
 
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.cache import TTLCache
 from app.cameras.schemas import CameraAdmin, URLStreamDetails
 from app.stream.url_encryption import decrypt_stream_url, encrypt_stream_url
 
 
+RTSP_URL_PATTERN = re.compile(r"(?P<stream_type>[^://]+)://(?P<user>[^:]+):(?P<password>[^@]+)@(?P<url>[^:/]+):(?P<port>\d+)(?P<args>/.*)")
+
+stream_url_cache = TTLCache(maxsize=settings.STREAM_URL_CACHE_MAXSIZE, ttl=settings.STREAM_URL_CACHE_TTL)
+
+
 def parse_rtsp_url(rtsp_url: str) -> dict:
     """
     Парсинг RTSP URL в словарь с компонентами (тип, пользователь, пароль, адрес, порт, аргументы)
     """
-    pattern = r"(?P<stream_type>[^://]+)://(?P<user>[^:]+):(?P<password>[^@]+)@(?P<url>[^:/]+):(?P<port>\d+)(?P<args>/.*)"
-    match = re.match(pattern, rtsp_url)
+    match = RTSP_URL_PATTERN.match(rtsp_url)
     if match:
         return match.groupdict()
     else:
@@ -46,11 +54,16 @@ async def handle_stream_url(new_stream_url, old_stream_url):
     raise ValueError("Некорректный формат stream_url")
 
 
-def format_camera(camera) -> CameraAdmin:
+def format_stream_url(encrypted_stream_url: str) -> list[URLStreamDetails] | str:
     """
-    Форматирование одного объекта камеры
+    Дешифрование и разбор ссылки на поток с маскировкой пароля.
+    Результат кэшируется по зашифрованной ссылке
     """
-    decrypted_url = decrypt_stream_url(camera.stream_url)
+    stream_url = stream_url_cache.get(encrypted_stream_url)
+    if stream_url is not None:
+        return stream_url
+
+    decrypted_url = decrypt_stream_url(encrypted_stream_url)
     parsed_url = parse_rtsp_url(decrypted_url)
 
     if parsed_url:
@@ -66,11 +79,29 @@ def format_camera(camera) -> CameraAdmin:
     else:
         stream_url = decrypted_url
 
+    stream_url_cache.set(encrypted_stream_url, stream_url)
+    return stream_url
+
+
+def invalidate_stream_url(encrypted_stream_url: str) -> None:
+    """
+    Сброс разобранной ссылки из кэша (при редактировании или удалении камеры)
+    """
+    stream_url_cache.pop(encrypted_stream_url)
+
+
+def format_camera(camera) -> CameraAdmin:
+    """
+    Форматирование одного объекта камеры
+    """
     return CameraAdmin(
         id=camera.id,
         name=camera.name,
-        stream_url=stream_url,
-        location=camera.location
+        stream_url=format_stream_url(camera.stream_url),
+        location=camera.location,
+        transcode_mode=camera.transcode_mode,
+        transcode_profile=camera.transcode_profile,
+        hls_mode=camera.hls_mode,
     )
 
 
@@ -82,3 +113,17 @@ def cameras_list_formatter(cameras: list) -> list:
     for camera in cameras:
         cameras_list.append(format_camera(camera))
     return cameras_list
+
+
+async def cameras_list_formatter_async(cameras: list) -> list:
+    """
+    Форматирование списка камер. Большие списки обрабатываются пачками в пуле потоков,
+    чтобы дешифрование не блокировало event loop
+    """
+    threshold = settings.CAMERA_FORMAT_THREADPOOL_THRESHOLD
+    if len(cameras) <= threshold:
+        return cameras_list_formatter(cameras)
+
+    chunks = [cameras[i:i + threshold] for i in range(0, len(cameras), threshold)]
+    results = await asyncio.gather(*(run_in_threadpool(cameras_list_formatter, chunk) for chunk in chunks))
+    return [camera for chunk in results for camera in chunk]
@@ -1,4 +1,4 @@
-from pydantic import BaseSettings, root_validator
+from pydantic import BaseSettings, root_validator, validator
 
 
 class Settings(BaseSettings):
@@ -13,14 +13,111 @@ class Settings(BaseSettings):
         v["DATABASE_URL"] = f"postgresql+asyncpg://{v['DB_USER']}:{v['DB_PASS']}@{v['DB_HOST']}:{v['DB_PORT']}/{v['DB_NAME']}"
         return v
 
+    DB_POOL_SIZE:int = 20
+    DB_MAX_OVERFLOW:int = 10
+    DB_POOL_TIMEOUT:float = 30.0
+    DB_POOL_RECYCLE:int = 1800
+    DB_POOL_PRE_PING:bool = True
+    DB_STATEMENT_CACHE_SIZE:int = 100
+
     SECRET_KEY:str
     REFRESH_SECRET_KEY:str
     ALGORITHM:str
     ACCESS_TOKEN_EXPIRE_MINUTES:int
     REFRESH_TOKEN_EXPIRE_DAYS:int
+    PASSWORD_HASH_WORKERS:int = 4
+    LOGIN_CONCURRENCY:int = 16
+    JWT_BACKEND:str = "jose"
+    JWT_CACHE_MAXSIZE:int = 50000
+    USER_CACHE_MAXSIZE:int = 10000
+    USER_CACHE_TTL:float = 30.0
+    USER_CACHE_INVALIDATION_CHANNEL:str = ""
     ENCRYPTION_KEY:str
+    STREAM_URL_CACHE_MAXSIZE:int = 20000
+    STREAM_URL_CACHE_TTL:float = 3600.0
+    CAMERA_FORMAT_THREADPOOL_THRESHOLD:int = 500
     GIN_HOST:str
+    GIN_MAX_CONNECTIONS:int = 100
+    GIN_MAX_KEEPALIVE_CONNECTIONS:int = 20
+    GIN_KEEPALIVE_EXPIRY:float = 30.0
+    GIN_CONNECT_TIMEOUT:float = 5.0
+    GIN_TIMEOUT:float = 15.0
+    GIN_HTTP2:bool = True
     STREAMS_DIR:str
+    STREAM_BACKEND:str = "gin"
+    FFMPEG_PATH:str = "ffmpeg"
+    FFPROBE_PATH:str = "ffprobe"
+    STREAM_PROBE_TIMEOUT:float = 10.0
+    STREAM_MAX_PROCESSES:int = 32
+    STREAM_MAX_PER_USER:int = 4
+    STREAM_READY_TIMEOUT:float = 30.0
+    STREAM_STOP_TIMEOUT:float = 5.0
+    STREAM_RESTART_BACKOFF_INITIAL:float = 1.0
+    STREAM_RESTART_BACKOFF_MAX:float = 30.0
+    STREAM_IDLE_GRACE_SECONDS:float = 30.0
+    STREAM_PINNED_CAMERAS:str = ""
+    STREAM_PREWARM_TOP_FAVORITES:int = 0
+    LIVE_MAX_STREAMS:int = 16
+    LIVE_QUEUE_SIZE:int = 8
+    LIVE_KEYFRAME_INTERVAL:float = 1.0
+    PROBE_CONCURRENCY:int = 200
+    PROBE_TIMEOUT:float = 5.0
+    PROBE_BATCH_SIZE:int = 1000
+    PROBE_STALE_SECONDS:int = 86400
+    PROBE_INTERVAL_SECONDS:int = 0
+    PROBE_FRAME_GRAB:bool = True
+    PROBE_FRAME_WORKERS:int = 8
+    PROBE_FRAMES:int = 3
+    SNAPSHOT_DIR:str = "./snapshots"
+    SNAPSHOT_CACHE_MAX_BYTES:int = 64 * 1024 * 1024
+    SNAPSHOT_MAX_AGE:float = 300.0
+    SNAPSHOT_WORKERS:int = 8
+    SNAPSHOT_CACHE_WORKERS:int = 2
+    SNAPSHOT_TIMEOUT:float = 5.0
+    SNAPSHOT_WIDTH:int = 320
+    SNAPSHOT_JPEG_QUALITY:int = 75
+    SNAPSHOT_BATCH_MAX:int = 100
+    ANALYTICS_QUEUE_SIZE:int = 10000
+    ANALYTICS_BATCH_SIZE:int = 500
+    ANALYTICS_FLUSH_INTERVAL:float = 2.0
+    ANALYTICS_VIEWER_TTL:float = 4 * 60 * 60
+    HLS_REQUIRE_AUTH:bool = True
+    ACL_CACHE_MAXSIZE:int = 10000
+    ACL_CACHE_TTL:float = 60.0
+    ACL_INVALIDATION_CHANNEL:str = ""
+    HLS_CACHE_MAX_BYTES:int = 256 * 1024 * 1024
+    HLS_CACHE_MAX_FILE_BYTES:int = 16 * 1024 * 1024
+    HLS_PLAYLIST_CHECK_INTERVAL:float = 0.2
+    HLS_SEGMENT_CHECK_INTERVAL:float = 2.0
+    HLS_PLAYLIST_MAX_AGE:int = 1
+    HLS_SEGMENT_MAX_AGE:int = 2
+    HLS_BLOCKING_RELOAD_TIMEOUT:float = 6.0
+    HLS_BLOCKING_RELOAD_POLL_INTERVAL:float = 0.1
+    HLS_ADVERTISE_BLOCKING_RELOAD:bool = True
+    LL_HLS_SEGMENT_TIME:int = 1
+    LL_HLS_LIST_SIZE:int = 6
+    PAGE_SIZE_DEFAULT:int = 100
+    PAGE_SIZE_MAX:int = 1000
+    IMPORT_CHUNK_SIZE:int = 1000
+    IMPORT_ENCRYPT_WORKERS:int = 0
+    IMPORT_MAX_REJECTIONS:int = 1000
+    IMPORT_JOB_WORKERS:int = 2
+    IMPORT_JOBS_KEEP:int = 100
+    IMPORT_JOB_HEARTBEAT_INTERVAL:float = 30.0
+    IMPORT_JOB_STALE_SECONDS:float = 120.0
+    BULK_ACCESS_CHUNK_SIZE:int = 1000
+    BULK_ACCESS_MAX_ITEMS:int = 50000
+    BULK_DELETE_MAX_CAMERAS:int = 10000
+
+    @validator("IMPORT_CHUNK_SIZE")
+    def clamp_import_chunk_size(cls, v):
+        # Девять параметров на камеру (все колонки cameras), asyncpg допускает не более 32767 параметров в запросе
+        return max(1, min(v, 32767 // 9))
+
+    @validator("BULK_ACCESS_CHUNK_SIZE")
+    def clamp_bulk_access_chunk_size(cls, v):
+        # Два параметра на пару (user_id, camera_id), asyncpg допускает не более 32767 параметров в запросе
+        return max(1, min(v, 32767 // 2))
     
     class Config:
         env_file = '.env'
@@ -1,12 +1,69 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 from app.config import settings
 
 
-engine = create_async_engine(settings.DATABASE_URL)
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    },
+)
 
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 class Base(DeclarativeBase):
     pass
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Сессия на время запроса: все запросы обработчика идут через одно соединение пула.
+    Изменения фиксирует сам обработчик (session.commit()), незафиксированные откатываются при закрытии
+    """
+    async with async_session_maker() as session:
+        yield session
+
+
+@asynccontextmanager
+async def use_session(session: AsyncSession | None = None, commit: bool = False) -> AsyncIterator[AsyncSession]:
+    """
+    Переданная сессия запроса или новая сессия. При commit=True новая сессия фиксируется на выходе,
+    а в переданной изменения только отправляются в БД (flush) - фиксирует их владелец сессии
+    """
+    if session is not None:
+        yield session
+        if commit:
+            await session.flush()
+        return
+
+    async with async_session_maker() as new_session:
+        yield new_session
+        if commit:
+            await new_session.commit()
+
+
+def pool_stats() -> dict:
+    """
+    Состояние пула соединений: занятые, свободные и сверх pool_size, доля занятых от максимума
+    """
+    pool = engine.pool
+    checked_out = pool.checkedout()
+    capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+    }
@@ -115,9 +115,51 @@ class IncorrectFileDataException(ProjectException):
     detail="Некорректный формат данных в файле"
 
 
-class ImportDataException(ProjectException):
-    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
-    def __init__(self, error_message: str):
-        super().__init__(detail=f"Ошибка при импорте данных: {error_message}")
+class ImportJobNotFoundException(ProjectException):
+    status_code=status.HTTP_404_NOT_FOUND
+    detail="Задача импорта не найдена"
+
+
+class IncorrectCursorException(ProjectException):
+    status_code=status.HTTP_400_BAD_REQUEST
+    detail="Некорректный курсор постраничной выдачи"
+
+
+class StreamLimitExceededException(ProjectException):
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+    detail="Достигнуто максимальное количество одновременно транслируемых камер"
+
+
+class StreamStartException(ProjectException):
+    status_code=status.HTTP_504_GATEWAY_TIMEOUT
+    detail="Не удалось запустить поток"
+
+
+class ProbeAlreadyRunningException(ProjectException):
+    status_code=status.HTTP_409_CONFLICT
+    detail="Проверка камер уже выполняется"
+
 
-        
\ No newline at end of file
+class CameraHealthNotFoundException(ProjectException):
+    status_code=status.HTTP_404_NOT_FOUND
+    detail="Камера ещё не проверялась"
+
+
+class SnapshotUnavailableException(ProjectException):
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+    detail="Не удалось получить кадр с камеры"
+
+
+class TooManySnapshotsRequestedException(ProjectException):
+    status_code=status.HTTP_400_BAD_REQUEST
+    detail="Запрошено слишком много миниатюр"
+
+
+class TooManyBulkAccessItemsException(ProjectException):
+    status_code=status.HTTP_400_BAD_REQUEST
+    detail="Слишком много пар пользователь - камера в одном запросе"
+
+
+class TooManyCamerasToDeleteException(ProjectException):
+    status_code=status.HTTP_400_BAD_REQUEST
+    detail="Слишком много камер для удаления в одном запросе"
@@ -0,0 +1,235 @@
+import os, asyncio, multiprocessing
+import pandas as pd
+
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.logger import logger
+from app.database import async_session_maker
+from app.cameras.services import CameraService
+from app.importer.readers import iter_batches
+from app.stream.url_encryption import encrypt_stream_url
+from app.exceptions import IncorrectFileDataException
+
+
+REQUIRED_COLUMNS = ['id', 'name', 'stream_url', 'location', 'created_at', 'updated_at']
+
+ENCRYPT_WORKERS = settings.IMPORT_ENCRYPT_WORKERS or os.cpu_count() or 1
+
+_encrypt_executor: ProcessPoolExecutor | None = None
+
+
+def start_encrypt_executor() -> None:
+    """
+    Создание пула процессов для шифрования ссылок при старте приложения. Процессы запускаются через spawn:
+    fork многопоточного процесса сервера (пул создавался бы из потоков задач импорта) может зависнуть
+    """
+    global _encrypt_executor
+    if _encrypt_executor is None and ENCRYPT_WORKERS > 1:
+        _encrypt_executor = ProcessPoolExecutor(max_workers=ENCRYPT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown_encrypt_executor() -> None:
+    """
+    Остановка пула процессов шифрования
+    """
+    global _encrypt_executor
+    if _encrypt_executor is not None:
+        _encrypt_executor.shutdown(wait=False, cancel_futures=True)
+        _encrypt_executor = None
+
+
+def encrypt_batch(urls: list[str]) -> list[str]:
+    """
+    Шифрование пачки ссылок (выполняется в отдельном процессе)
+    """
+    return [encrypt_stream_url(url) for url in urls]
+
+
+async def encrypt_urls(urls: list[str]) -> list[str]:
+    """
+    Шифрование ссылок пачками, распределёнными по ядрам процессора
+    (в потоке, если пул процессов не запущен или ссылок мало)
+    """
+    executor = _encrypt_executor
+    if executor is None or len(urls) < ENCRYPT_WORKERS * 2:
+        return await run_in_threadpool(encrypt_batch, urls)
+
+    size = -(-len(urls) // ENCRYPT_WORKERS)
+    batches = [urls[i:i + size] for i in range(0, len(urls), size)]
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(loop.run_in_executor(executor, encrypt_batch, batch) for batch in batches))
+    return [url for batch in results for url in batch]
+
+
+class PreparedBatch:
+    """
+    Пачка строк, готовых к записи, с номерами строк файла и отклонёнными строками
+    """
+
+    def __init__(self, rows: list[int], records: list[dict], rejected: list[dict]):
+        self.rows = rows
+        self.records = records
+        self.rejected = rejected
+
+
+def prepare_frame(df: pd.DataFrame, first_row: int = 2, row_numbers: list[int] | None = None) -> PreparedBatch:
+    """
+    Проверка колонок и векторное приведение типов (даты, строки) для всей таблицы.
+    Строки с некорректными данными (в том числе с неразобранной датой) не прерывают импорт, а попадают в отклонённые с причиной.
+    first_row - номер строки файла, соответствующий первой строке таблицы (с учётом заголовка),
+    row_numbers - номера строк файла для каждой строки таблицы, если строки идут не подряд
+    """
+    if not all(column in df.columns for column in REQUIRED_COLUMNS):
+        raise IncorrectFileDataException
+
+    df = df[REQUIRED_COLUMNS].copy()
+    df.index = row_numbers if row_numbers is not None else range(first_row, first_row + len(df))
+    now = datetime.utcnow()
+
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    ids = pd.to_numeric(df['id'], errors='coerce')
+    reasons[ids.isna() | (ids % 1 != 0)] = "Некорректный id"
+    for column in ('name', 'stream_url', 'location'):
+        missing = df[column].isna() | (df[column].astype(str).str.strip() == "")
+        reasons[missing & reasons.isna()] = f"Отсутствует значение '{column}'"
+
+    # format="mixed" разбирает формат каждой строки отдельно, как прежний построчный разбор.
+    # Пустая дата заменяется текущим временем, непустая и неразобранная - причина отклонить строку
+    dates = {}
+    for column in ('created_at', 'updated_at'):
+        missing = df[column].isna() | (df[column].astype(str).str.strip() == "")
+        parsed = pd.to_datetime(df[column].where(~missing), errors='coerce', format='mixed', utc=True).dt.tz_convert(None)
+        reasons[parsed.isna() & ~missing & reasons.isna()] = f"Некорректная дата '{column}'"
+        dates[column] = parsed.fillna(now)
+
+    invalid = reasons.notna()
+    rejected = [{"row": row, "reason": reason} for row, reason in reasons[invalid].items()]
+    df = df[~invalid].copy()
+
+    df['id'] = ids[~invalid].astype(int)
+    for column in ('name', 'stream_url', 'location'):
+        df[column] = df[column].astype(str)
+    for column, parsed in dates.items():
+        df[column] = parsed[~invalid].astype(object)
+
+    return PreparedBatch(df.index.tolist(), df.to_dict('records'), rejected)
+
+
+async def import_chunk(records: list[dict], session_maker=async_session_maker) -> list[int]:
+    """
+    Шифрование ссылок и запись одной пачки камер. Возвращает id добавленных камер
+    """
+    encrypted = await encrypt_urls([row['stream_url'] for row in records])
+    for row, stream_url in zip(records, encrypted):
+        row['stream_url'] = stream_url
+    return await CameraService.bulk_insert(records, session_maker=session_maker)
+
+
+async def import_batches(
+    next_batch,
+    total: int | None = None,
+    on_progress=None,
+    should_stop=None,
+    session_maker=async_session_maker,
+) -> dict:
+    """
+    Импорт пачек, которые возвращает асинхронная функция next_batch (None - конец данных).
+    После каждой пачки ожидается асинхронный on_progress с отчётом о ней, should_stop позволяет прервать импорт между пачками.
+    """
+    processed = 0
+    inserted = 0
+    rejected = 0
+    rejections = []
+    chunks = []
+    number = 0
+    cancelled = False
+
+    while (batch := await next_batch()) is not None:
+        if should_stop is not None and should_stop():
+            cancelled = True
+            break
+
+        number += 1
+        inserted_ids = set(await import_chunk(batch.records, session_maker=session_maker)) if batch.records else set()
+        duplicates = []
+        remaining_ids = set(inserted_ids)
+        for row, record in zip(batch.rows, batch.records):
+            if record['id'] in remaining_ids:
+                remaining_ids.discard(record['id'])
+            else:
+                duplicates.append({"row": row, "reason": "Камера с таким id уже существует"})
+        chunk_rejections = batch.rejected + duplicates
+
+        rows = len(batch.records) + len(batch.rejected)
+        processed += rows
+        inserted += len(inserted_ids)
+        rejected += len(chunk_rejections)
+        rejections.extend(chunk_rejections[:max(settings.IMPORT_MAX_REJECTIONS - len(rejections), 0)])
+
+        report = {
+            "chunk": number,
+            "rows": rows,
+            "inserted": len(inserted_ids),
+            "rejected": len(chunk_rejections),
+            "processed": processed,
+            "total": total,
+        }
+        chunks.append(report)
+        logger.info(f"Импорт камер: пачка {number}, обработано {processed} из {total or '?'}")
+        if on_progress is not None:
+            await on_progress(report, chunk_rejections)
+
+    if inserted:
+        await CameraService.sync_id_sequence(session_maker=session_maker)
+
+    return {
+        "total": processed,
+        "inserted": inserted,
+        "rejected": rejected,
+        "rejections": rejections,
+        "chunks": chunks,
+        "cancelled": cancelled,
+    }
+
+
+async def import_excel(file, **options) -> dict:
+    """
+    Импорт камер из excel файла: чтение и подготовка таблицы вне event loop, затем пакетная запись
+    """
+    df = await run_in_threadpool(pd.read_excel, file, engine='openpyxl')
+    chunk_size = settings.IMPORT_CHUNK_SIZE
+    starts = iter(range(0, len(df), chunk_size))
+
+    def read_batch():
+        start = next(starts, None)
+        if start is None:
+            return None
+        return prepare_frame(df.iloc[start:start + chunk_size], first_row=start + 2)
+
+    async def next_batch():
+        return await run_in_threadpool(read_batch)
+
+    return await import_batches(next_batch, total=len(df), **options)
+
+
+async def import_stream(rows, **options) -> dict:
+    """
+    Потоковый импорт: пары (номер строки файла, строка) читаются из генератора пачками по IMPORT_CHUNK_SIZE,
+    в памяти одновременно находится только одна пачка
+    """
+    batches = iter_batches(rows, settings.IMPORT_CHUNK_SIZE)
+
+    def read_batch():
+        batch = next(batches, None)
+        if batch is None:
+            return None
+        numbers, records = zip(*batch)
+        return prepare_frame(pd.DataFrame(list(records)), row_numbers=list(numbers))
+
+    async def next_batch():
+        return await run_in_threadpool(read_batch)
+
+    return await import_batches(next_batch, **options)
@@ -0,0 +1,230 @@
+import os, shutil, asyncio, tempfile
+
+from datetime import datetime, timedelta
+from threading import Event, Lock
+from concurrent.futures import ThreadPoolExecutor
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.config import settings
+from app.logger import logger
+from app.models import ImportJob, ImportJobStatus
+from app.importer.services import ImportJobService
+from app.importer.engine import import_excel, import_stream
+from app.importer.readers import iter_xlsx_rows, iter_csv_rows
+
+
+class ImportRun:
+    """
+    Выполнение задачи импорта в этом процессе: временный файл, прогресс и флаг отмены.
+    Прогресс после каждой пачки записывается в БД, откуда его читают все воркеры
+    """
+
+    def __init__(self, job_id, path: str, file_type: str, streaming: bool):
+        self.job_id = job_id
+        self.path = path
+        self.file_type = file_type
+        self.streaming = streaming
+        self.parsed = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.rejections = []
+        self.chunks = 0
+        self.cancel_event = Event()
+        self.future = None
+
+    async def on_progress(self, report: dict, rejections: list[dict], session_maker) -> None:
+        """
+        Обновление прогресса после записи очередной пачки. Отмена, запрошенная через другой воркер,
+        приходит в ответ статусом CANCELLING
+        """
+        self.chunks = report['chunk']
+        self.parsed = report['processed']
+        self.inserted += report['inserted']
+        self.rejected += report['rejected']
+        free = settings.IMPORT_MAX_REJECTIONS - len(self.rejections)
+        if free > 0:
+            self.rejections.extend(rejections[:free])
+
+        status = await ImportJobService.save_progress(
+            self.job_id,
+            session_maker=session_maker,
+            chunks=self.chunks,
+            parsed=self.parsed,
+            inserted=self.inserted,
+            rejected=self.rejected,
+            rejections=self.rejections,
+        )
+        if status == ImportJobStatus.CANCELLING:
+            self.cancel_event.set()
+
+
+class ImportJobManager:
+    """
+    Фоновые задачи импорта. Задачи выполняются в отдельных потоках, каждая со своим event loop
+    и своим подключением к БД, не занимая event loop API. Состояние задач хранится в БД,
+    поэтому прогресс и отмена доступны через любой воркер приложения.
+    Сам импорт и загруженный файл есть только в процессе, принявшем файл, поэтому задачи
+    не переживают его остановку или перезапуск: процесс периодически обновляет heartbeat своих задач,
+    а задачи без heartbeat дольше IMPORT_JOB_STALE_SECONDS любой процесс переводит в FAILED
+    """
+
+    def __init__(self, workers: int, keep: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import")
+        self.keep = keep
+        self.runs: dict[str, ImportRun] = {}
+        self.heartbeat_task: asyncio.Task | None = None
+        self._lock = Lock()
+
+    def start(self) -> None:
+        """
+        Запуск фоновой задачи heartbeat (при старте приложения). Первым делом помечаются
+        задачи, оставшиеся от остановленных процессов
+        """
+        if self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.create_task(self._keep_alive())
+
+    async def _keep_alive(self) -> None:
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"Ошибка heartbeat задач импорта: {e}")
+            await asyncio.sleep(settings.IMPORT_JOB_HEARTBEAT_INTERVAL)
+
+    async def heartbeat(self) -> None:
+        """
+        Обновление heartbeat задач этого процесса и перевод в FAILED задач остановленных процессов
+        """
+        with self._lock:
+            job_ids = [run.job_id for run in self.runs.values()]
+        if job_ids:
+            await ImportJobService.heartbeat(job_ids)
+        stale = await ImportJobService.fail_stale(datetime.utcnow() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS))
+        for job_id in stale:
+            logger.warning(f"Задача импорта {job_id} прервана: процесс, выполнявший её, остановлен")
+
+    async def submit(self, file, filename: str, file_type: str, streaming: bool) -> ImportJob:
+        """
+        Сохранение загруженного файла во временный файл, создание задачи в БД и постановка её в очередь
+        """
+        suffix = '.csv' if file_type == 'csv' else '.xlsx'
+        path = await run_in_threadpool(self._save_file, file, suffix)
+
+        job = await ImportJobService.add(filename=filename, status=ImportJobStatus.PENDING, rejections=[])
+        await ImportJobService.cleanup(self.keep)
+
+        run = ImportRun(job.id, path, file_type, streaming)
+        with self._lock:
+            self.runs[str(job.id)] = run
+        run.future = self.executor.submit(self._run, run)
+        return job
+
+    async def get(self, job_id) -> ImportJob | None:
+        return await ImportJobService.find_by_id(job_id)
+
+    async def list(self) -> list[ImportJob]:
+        return await ImportJobService.find_recent(self.keep)
+
+    async def cancel(self, job_id) -> ImportJob | None:
+        """
+        Отмена задачи. Ожидающая задача отменяется сразу, выполняющаяся - после текущей пачки
+        (в том числе если она выполняется другим воркером)
+        """
+        job = await ImportJobService.request_cancel(job_id)
+        if job is None:
+            return await ImportJobService.find_by_id(job_id)
+
+        with self._lock:
+            run = self.runs.get(str(job_id))
+        if run is not None:
+            run.cancel_event.set()
+            if run.future is not None and run.future.cancel():
+                self._finish(run)
+        return job
+
+    def shutdown(self) -> None:
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+        with self._lock:
+            runs = list(self.runs.values())
+        for run in runs:
+            run.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _save_file(file, suffix: str) -> str:
+        with tempfile.NamedTemporaryFile(prefix='camera_import_', suffix=suffix, delete=False) as tmp:
+            shutil.copyfileobj(file, tmp)
+        return tmp.name
+
+    def _run(self, run: ImportRun) -> None:
+        try:
+            asyncio.run(self._execute(run))
+        finally:
+            self._finish(run)
+
+    async def _execute(self, run: ImportRun) -> None:
+        engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+        session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            if not await ImportJobService.start(run.job_id, session_maker=session_maker):
+                return
+
+            result = {}
+            try:
+                result = await self._import(run, session_maker)
+                status = ImportJobStatus.CANCELLED if result['cancelled'] else ImportJobStatus.COMPLETED
+                error = None
+            except Exception as e:
+                error = getattr(e, "detail", None) or str(e)
+                logger.error(f"Ошибка задачи импорта {run.job_id}: {error}")
+                status = ImportJobStatus.FAILED
+
+            await ImportJobService.save_progress(
+                run.job_id,
+                session_maker=session_maker,
+                status=status,
+                error=error,
+                parsed=run.parsed,
+                inserted=run.inserted,
+                rejected=run.rejected,
+                chunks=run.chunks,
+                rejections=run.rejections,
+                finished_at=datetime.utcnow(),
+            )
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояние задачи импорта {run.job_id}: {e}")
+        finally:
+            await engine.dispose()
+
+    @staticmethod
+    async def _import(run: ImportRun, session_maker) -> dict:
+        async def on_progress(report: dict, rejections: list[dict]) -> None:
+            await run.on_progress(report, rejections, session_maker)
+
+        options = {
+            "on_progress": on_progress,
+            "should_stop": run.cancel_event.is_set,
+            "session_maker": session_maker,
+        }
+        with open(run.path, 'rb') as file:
+            if run.file_type == 'csv':
+                return await import_stream(iter_csv_rows(file), **options)
+            if run.streaming:
+                return await import_stream(iter_xlsx_rows(file), **options)
+            return await import_excel(file, **options)
+
+    def _finish(self, run: ImportRun) -> None:
+        with self._lock:
+            self.runs.pop(str(run.job_id), None)
+        try:
+            os.remove(run.path)
+        except FileNotFoundError:
+            pass
+
+
+import_jobs = ImportJobManager(settings.IMPORT_JOB_WORKERS, settings.IMPORT_JOBS_KEEP)
@@ -0,0 +1,69 @@
+import io, csv
+
+from itertools import islice
+from typing import Iterator
+from openpyxl import load_workbook
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# application/vnd.ms-excel браузеры присылают и для .xls, поэтому такой файл считается CSV только по расширению
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+
+
+def _row_dict(columns: list[str], values) -> dict:
+    """
+    Строка в виде словаря по заголовку. Недостающие в конце строки ячейки считаются пустыми
+    """
+    values = tuple(values)
+    return dict(zip(columns, values + (None,) * (len(columns) - len(values))))
+
+
+def iter_xlsx_rows(file) -> Iterator[tuple[int, dict]]:
+    """
+    Построчное чтение excel файла в режиме read-only (без загрузки всей книги в память).
+    Возвращает пары (номер строки листа, строка), пустые строки пропускаются без сдвига нумерации
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        # В режиме read-only пропущенные строки листа возвращаются пустыми, поэтому порядковый номер совпадает с номером строки
+        rows = enumerate(workbook.active.iter_rows(values_only=True), start=1)
+        _, header = next(rows, (None, None))
+        if header is None:
+            return
+        columns = [str(column).strip() if column is not None else "" for column in header]
+        for number, values in rows:
+            if values is None or all(value is None for value in values):
+                continue
+            yield number, _row_dict(columns, values)
+    finally:
+        workbook.close()
+
+
+def iter_csv_rows(file, encoding: str = 'utf-8-sig') -> Iterator[tuple[int, dict]]:
+    """
+    Построчное чтение CSV файла. Возвращает пары (номер записи с учётом заголовка, строка).
+    Пустые значения считаются отсутствующими, пустые строки пропускаются без сдвига нумерации
+    """
+    text = io.TextIOWrapper(file, encoding=encoding, newline='')
+    try:
+        rows = enumerate(csv.reader(text), start=1)
+        _, header = next(rows, (None, None))
+        if header is None:
+            return
+        columns = [column.strip() for column in header]
+        for number, values in rows:
+            if all(value == "" for value in values):
+                continue
+            row = _row_dict(columns, values)
+            yield number, {key: (value if value != "" else None) for key, value in row.items() if key}
+    finally:
+        text.detach()
+
+
+def iter_batches(rows: Iterator, size: int) -> Iterator[list]:
+    """
+    Разбиение потока строк на пачки фиксированного размера
+    """
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
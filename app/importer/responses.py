@@ -0,0 +1,12 @@
+from typing import List
+from pydantic import BaseModel
+
+from app.importer.schemas import ImportJob
+
+
+class ImportJobResponse(BaseModel):
+    job: ImportJob
+
+
+class ImportJobsResponse(BaseModel):
+    jobs: List[ImportJob]
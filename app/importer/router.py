@@ -1,14 +1,12 @@
-import pandas as pd
-
-from datetime import datetime
+from uuid import UUID
 from fastapi import APIRouter, status, UploadFile, File, Depends
 
-from app.models import Camera
-from app.cameras.services import CameraService
+from app.importer.jobs import import_jobs
 from app.users.schemas import User as UserSchema
-from app.stream.url_encryption import encrypt_stream_url
 from app.authorization.dependencies import check_is_current_user_admin
-from app.exceptions import IncorrectFileTypeException, IncorrectFileDataException, ImportDataException
+from app.importer.responses import ImportJobResponse, ImportJobsResponse
+from app.importer.readers import XLSX_CONTENT_TYPE, CSV_CONTENT_TYPES
+from app.exceptions import IncorrectFileTypeException, ImportJobNotFoundException
 
 
 router = APIRouter(
@@ -17,37 +15,55 @@ router = APIRouter(
 )
 
 
-@router.post(path="/cameras", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def cameras_importer(file: UploadFile = File(...), current_user: UserSchema = Depends(check_is_current_user_admin)):
+@router.post(path="/cameras", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def cameras_importer(file: UploadFile = File(...), streaming: bool = False, current_user: UserSchema = Depends(check_is_current_user_admin)):
     """
-    Импортирование камер из excel файла
+    Импортирование камер из excel или CSV файла в фоновой задаче. Возвращает задачу, прогресс которой
+    можно отслеживать через /import/jobs/{job_id}. Задача выполняется процессом, принявшим файл,
+    и не переживает его перезапуск: такая задача переходит в FAILED (уже записанные пачки остаются в базе).
+    При streaming=true (и всегда для CSV) файл читается построчно с постоянным расходом памяти
     """
-    if file.content_type != 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet':
+    is_csv = file.content_type in CSV_CONTENT_TYPES or (file.filename or "").lower().endswith('.csv')
+    if file.content_type != XLSX_CONTENT_TYPE and not is_csv:
         raise IncorrectFileTypeException
 
-    try:
-        df = pd.read_excel(file.file, engine='openpyxl')
-
-        required_columns = ['id', 'name', 'stream_url', 'location', 'created_at', 'updated_at']
-        if not all(column in df.columns for column in required_columns):
-            raise IncorrectFileDataException
-
-        cameras_to_insert = []
-        for _, row in df.iterrows():
-            camera = Camera(
-                id=row['id'],
-                name=row['name'],
-                stream_url=encrypt_stream_url(row['stream_url']),
-                location=row['location'],
-                created_at=pd.to_datetime(row['created_at']).to_pydatetime() if not pd.isnull(row['created_at']) else datetime.utcnow(),
-                updated_at=pd.to_datetime(row['updated_at']).to_pydatetime() if not pd.isnull(row['updated_at']) else datetime.utcnow()
-            )
-            cameras_to_insert.append(camera)
-
-        await CameraService.import_cameras(cameras_to_insert)
-        
-        return {"success": True, "message": f"Импортировано {len(cameras_to_insert)} камер."}
-
-    except Exception as e:
-        raise ImportDataException(str(e))
-    
\ No newline at end of file
+    job = await import_jobs.submit(
+        file.file,
+        file.filename or "",
+        'csv' if is_csv else 'xlsx',
+        streaming,
+    )
+
+    return {"job": job}
+
+
+@router.get(path="/jobs", response_model=ImportJobsResponse, status_code=status.HTTP_200_OK)
+async def get_import_jobs(current_user: UserSchema = Depends(check_is_current_user_admin)):
+    """
+    Список задач импорта
+    """
+    return {"jobs": await import_jobs.list()}
+
+
+@router.get(path="/jobs/{job_id}", response_model=ImportJobResponse, status_code=status.HTTP_200_OK)
+async def get_import_job(job_id: UUID, current_user: UserSchema = Depends(check_is_current_user_admin)):
+    """
+    Прогресс задачи импорта: прочитано, добавлено и отклонено строк (с причинами)
+    """
+    job = await import_jobs.get(job_id)
+    if not job:
+        raise ImportJobNotFoundException
+
+    return {"job": job}
+
+
+@router.delete(path="/jobs/{job_id}", response_model=ImportJobResponse, status_code=status.HTTP_200_OK)
+async def cancel_import_job(job_id: UUID, current_user: UserSchema = Depends(check_is_current_user_admin)):
+    """
+    Отмена задачи импорта (уже записанные пачки остаются в базе)
+    """
+    job = await import_jobs.cancel(job_id)
+    if not job:
+        raise ImportJobNotFoundException
+
+    return {"job": job}
@@ -0,0 +1,27 @@
+from uuid import UUID
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class ImportRejection(BaseModel):
+    row: int
+    reason: str
+
+
+class ImportJob(BaseModel):
+    id: UUID
+    filename: str
+    status: str
+    parsed: int
+    inserted: int
+    rejected: int
+    chunks: int
+    rejections: list[ImportRejection]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
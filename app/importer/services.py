@@ -0,0 +1,110 @@
+from datetime import datetime
+from sqlalchemy import case, delete, select, update
+
+from app.services import BaseRequests
+from app.database import async_session_maker
+from app.models import ImportJob, ImportJobStatus
+
+
+FINISHED_STATUSES = (ImportJobStatus.CANCELLED, ImportJobStatus.COMPLETED, ImportJobStatus.FAILED)
+
+ACTIVE_STATUSES = (ImportJobStatus.PENDING, ImportJobStatus.RUNNING, ImportJobStatus.CANCELLING)
+
+STALE_JOB_ERROR = "Задача прервана: процесс приложения, выполнявший импорт, остановлен или перезапущен"
+
+
+class ImportJobService(BaseRequests):
+    """Состояние задач импорта в БД (общее для всех воркеров приложения)"""
+
+    model = ImportJob
+
+    @classmethod
+    async def find_recent(cls, limit: int):
+        """Последние задачи импорта, новые первыми"""
+        async with async_session_maker() as session:
+            query = select(cls.model).order_by(cls.model.created_at.desc()).limit(limit)
+            result = await session.execute(query)
+            return result.scalars().all()
+
+    @classmethod
+    async def cleanup(cls, keep: int) -> None:
+        """Удаление завершённых задач сверх keep последних"""
+        async with async_session_maker() as session:
+            old = (
+                select(cls.model.id)
+                .where(cls.model.status.in_(FINISHED_STATUSES))
+                .order_by(cls.model.created_at.desc())
+                .offset(keep)
+            )
+            await session.execute(delete(cls.model).where(cls.model.id.in_(old)))
+            await session.commit()
+
+    @classmethod
+    async def request_cancel(cls, job_id):
+        """Отмена задачи: ожидающая отменяется сразу, выполняющаяся помечается CANCELLING
+        и останавливается воркером после текущей пачки. Возвращает задачу или None, если она уже завершена"""
+        async with async_session_maker() as session:
+            pending = cls.model.status == ImportJobStatus.PENDING
+            query = (
+                update(cls.model)
+                .where(cls.model.id == job_id, cls.model.status.in_((ImportJobStatus.PENDING, ImportJobStatus.RUNNING)))
+                .values(
+                    status=case((pending, ImportJobStatus.CANCELLED), else_=ImportJobStatus.CANCELLING),
+                    finished_at=case((pending, datetime.utcnow()), else_=None),
+                )
+                .returning(cls.model)
+            )
+            result = await session.execute(query)
+            job = result.scalars().one_or_none()
+            await session.commit()
+            return job
+
+    @classmethod
+    async def start(cls, job_id, session_maker=async_session_maker) -> bool:
+        """Перевод задачи в RUNNING. Возвращает False, если задачу успели отменить"""
+        async with session_maker() as session:
+            query = (
+                update(cls.model)
+                .where(cls.model.id == job_id, cls.model.status == ImportJobStatus.PENDING)
+                .values(status=ImportJobStatus.RUNNING, started_at=datetime.utcnow())
+                .returning(cls.model.id)
+            )
+            result = await session.execute(query)
+            await session.commit()
+            return result.first() is not None
+
+    @classmethod
+    async def save_progress(cls, job_id, session_maker=async_session_maker, **data) -> str | None:
+        """Запись прогресса задачи (заодно обновляет heartbeat). Возвращает текущий статус (CANCELLING - запрошена отмена)"""
+        async with session_maker() as session:
+            query = update(cls.model).where(cls.model.id == job_id).values(heartbeat_at=datetime.utcnow(), **data).returning(cls.model.status)
+            result = await session.execute(query)
+            await session.commit()
+            return result.scalar_one_or_none()
+
+    @classmethod
+    async def heartbeat(cls, job_ids: list) -> None:
+        """Отметка, что процесс, принявший задачи, жив и задачи выполняются (или ждут очереди)"""
+        async with async_session_maker() as session:
+            query = (
+                update(cls.model)
+                .where(cls.model.id.in_(job_ids), cls.model.status.in_(ACTIVE_STATUSES))
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            await session.execute(query)
+            await session.commit()
+
+    @classmethod
+    async def fail_stale(cls, stale_before: datetime) -> list:
+        """Перевод в FAILED незавершённых задач, heartbeat которых не обновлялся с stale_before
+        (процесс, принявший файл, остановлен). Возвращает id таких задач"""
+        async with async_session_maker() as session:
+            query = (
+                update(cls.model)
+                .where(cls.model.status.in_(ACTIVE_STATUSES), cls.model.heartbeat_at < stale_before)
+                .values(status=ImportJobStatus.FAILED, error=STALE_JOB_ERROR, finished_at=datetime.utcnow())
+                .returning(cls.model.id)
+            )
+            result = await session.execute(query)
+            await session.commit()
+            return result.scalars().all()
@@ -1,7 +1,7 @@
 import time, traceback
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.users.router import router as users_router
@@ -9,19 +9,63 @@ from app.stream.router import router as stream_router
 from app.cameras.router import router as cameras_router
 from app.authorization.router import router as authorization_router
 from app.importer.router import router as importer_router
+from app.metrics.router import router as metrics_router
+from app.probe.router import router as probe_router
+from app.analytics.router import router as analytics_router
+from app.users.services import user_cache_channel
+from app.authorization.authorization import password_pool
+from app.importer.engine import start_encrypt_executor, shutdown_encrypt_executor
+from app.importer.jobs import import_jobs
+from app.stream.client import GinClient
+from app.stream.hls import HLSFiles
+from app.stream.acl import acl_channel, authorize_stream_request, touch_stream_viewer
+from app.stream.supervisor import stream_supervisor, prewarm_streams
+from app.stream.live import live_hub
+from app.probe.prober import camera_prober
+from app.cameras.snapshots import snapshot_service
+from app.analytics.writer import stream_events
 from app.logger import logger
 from app.config import settings
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await GinClient.open()
+    for channel in (user_cache_channel, acl_channel):
+        if channel is not None:
+            await channel.start()
+    stream_events.start()
+    import_jobs.start()
+    start_encrypt_executor()
+    await prewarm_streams()
+    camera_prober.start_periodic()
+    yield
+    await camera_prober.shutdown()
+    snapshot_service.shutdown()
+    await stream_events.stop()
+    await stream_supervisor.shutdown()
+    await live_hub.shutdown()
+    for channel in (user_cache_channel, acl_channel):
+        if channel is not None:
+            await channel.stop()
+    await GinClient.close()
+    password_pool.shutdown()
+    import_jobs.shutdown()
+    shutdown_encrypt_executor()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(authorization_router)
 app.include_router(users_router)
 app.include_router(cameras_router)
 app.include_router(stream_router)
 app.include_router(importer_router)
+app.include_router(probe_router)
+app.include_router(analytics_router)
+app.include_router(metrics_router)
 
-app.mount("/streams", StaticFiles(directory=settings.STREAMS_DIR), name="streams")
+app.mount("/streams", HLSFiles(directory=settings.STREAMS_DIR, authorize=authorize_stream_request, on_access=touch_stream_viewer), name="streams")
 
 origins = ["*"]
 
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, status
+
+from app.database import pool_stats
+from app.users.services import user_cache
+from app.stream.hls import hls_cache
+from app.stream.acl import camera_acl
+from app.stream.supervisor import stream_supervisor
+from app.stream.live import live_hub
+from app.analytics.writer import stream_events
+from app.cameras.utils import stream_url_cache
+from app.cameras.snapshots import snapshot_cache
+from app.authorization.authorization import claims_cache, password_pool
+from app.users.schemas import User as UserSchema
+from app.authorization.dependencies import check_is_current_user_root
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Метрики"],
+)
+
+
+@router.get("/cache", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_cache_metrics(current_user: UserSchema = Depends(check_is_current_user_root)):
+    """
+    Статистика попаданий и промахов кэшей приложения
+    """
+    return {
+        "users": user_cache.stats(),
+        "jwt_claims": claims_cache.stats(),
+        "stream_urls": stream_url_cache.stats(),
+        "hls_files": hls_cache.stats(),
+        "camera_acl": camera_acl.cache.stats(),
+        "snapshots": snapshot_cache.stats(),
+    }
+
+
+@router.get("/password_pool", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_password_pool_metrics(current_user: UserSchema = Depends(check_is_current_user_root)):
+    """
+    Состояние пула хэширования паролей (очередь и выполняющиеся задачи)
+    """
+    return password_pool.stats()
+
+
+@router.get("/streams", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_streams_metrics(current_user: UserSchema = Depends(check_is_current_user_root)):
+    """
+    Состояние процессов ffmpeg встроенного управления потоками
+    """
+    return stream_supervisor.stats()
+
+
+@router.get("/live", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_live_metrics(current_user: UserSchema = Depends(check_is_current_user_root)):
+    """
+    Состояние WebSocket трансляций: зрители, отправленные фрагменты и отключённые медленные зрители
+    """
+    return live_hub.stats()
+
+
+@router.get("/stream_events", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_stream_events_metrics(current_user: UserSchema = Depends(check_is_current_user_root)):
+    """
+    Состояние очереди записи событий просмотра: в очереди, записано, отброшено при переполнении
+    """
+    return stream_events.stats()
+
+
+@router.get("/db_pool", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_db_pool_metrics(current_user: UserSchema = Depends(check_is_current_user_root)):
+    """
+    Состояние пула соединений с БД: занятые и свободные соединения, насыщение пула
+    """
+    return pool_stats()
@@ -1,9 +1,9 @@
 from uuid import uuid4
 from datetime import datetime
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
 
 
 Base = declarative_base()
@@ -15,6 +15,45 @@ class UserRole:
     ROOT = 'ROOT'
 
 
+class TranscodeMode:
+    AUTO = 'auto'
+    COPY = 'copy'
+    TRANSCODE = 'transcode'
+
+
+class HLSMode:
+    STANDARD = 'hls'
+    LOW_LATENCY = 'll-hls'
+
+
+class StreamEventType:
+    START = 'start'
+    STOP = 'stop'
+
+
+class RollupGranularity:
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAY = 'day'
+
+
+class ImportJobStatus:
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    CANCELLING = 'CANCELLING'
+    CANCELLED = 'CANCELLED'
+    COMPLETED = 'COMPLETED'
+    FAILED = 'FAILED'
+
+
+class ProbeStatus:
+    ONLINE = 'online'
+    OFFLINE = 'offline'
+    UNAUTHORIZED = 'unauthorized'
+    NO_VIDEO = 'no_video'
+    ERROR = 'error'
+
+
 class User(Base):
     __tablename__ = 'users'
 
@@ -44,11 +83,14 @@ class Camera(Base):
     name = Column(String, nullable=False)
     stream_url = Column(String, nullable=False)
     location = Column(String, nullable=False)
+    transcode_mode = Column(String, default=TranscodeMode.TRANSCODE, server_default=TranscodeMode.TRANSCODE, nullable=False)
+    transcode_profile = Column(String, default='360p', server_default='360p', nullable=False)
+    hls_mode = Column(String, default=HLSMode.STANDARD, server_default=HLSMode.STANDARD, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    users = relationship("UserCamera", back_populates="camera")
-    favorites = relationship("FavoriteCamera", back_populates="camera")
+    users = relationship("UserCamera", back_populates="camera", passive_deletes=True)
+    favorites = relationship("FavoriteCamera", back_populates="camera", passive_deletes=True)
 
     def __str__(self):
         return f"Camera {self.name}"
@@ -58,7 +100,7 @@ class UserCamera(Base):
     __tablename__ = 'user_cameras'
 
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), primary_key=True)
-    camera_id = Column(Integer, ForeignKey('cameras.id'), primary_key=True)
+    camera_id = Column(Integer, ForeignKey('cameras.id', ondelete='CASCADE'), primary_key=True, index=True)
 
     user = relationship("User", back_populates="cameras")
     camera = relationship("Camera", back_populates="users")
@@ -73,7 +115,7 @@ class FavoriteCamera(Base):
     __tablename__ = 'favorite_cameras'
 
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), primary_key=True)
-    camera_id = Column(Integer, ForeignKey('cameras.id'), primary_key=True)
+    camera_id = Column(Integer, ForeignKey('cameras.id', ondelete='CASCADE'), primary_key=True, index=True)
 
     user = relationship("User", back_populates="favorite_cameras")
     camera = relationship("Camera", back_populates="favorites")
@@ -82,3 +124,68 @@ class FavoriteCamera(Base):
 
     def __str__(self):
         return f"FavoriteCamera: User {self.user_id} - Camera {self.camera_id}"
+
+
+class CameraHealth(Base):
+    __tablename__ = 'camera_health'
+    __table_args__ = (Index('ix_camera_health_status_camera_id', 'status', 'camera_id'),)
+
+    camera_id = Column(Integer, ForeignKey('cameras.id', ondelete='CASCADE'), primary_key=True)
+    status = Column(String, nullable=False)
+    latency_ms = Column(Float)
+    width = Column(Integer)
+    height = Column(Integer)
+    codec = Column(String)
+    error = Column(String)
+    checked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __str__(self):
+        return f"CameraHealth: Camera {self.camera_id} - {self.status}"
+
+
+class StreamEvent(Base):
+    __tablename__ = 'stream_events'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    camera_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    event = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __str__(self):
+        return f"StreamEvent: Camera {self.camera_id} - {self.event}"
+
+
+class StreamUsageRollup(Base):
+    __tablename__ = 'stream_usage_rollups'
+
+    granularity = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    camera_id = Column(Integer, primary_key=True)
+    starts = Column(Integer, default=0, nullable=False)
+    stops = Column(Integer, default=0, nullable=False)
+    peak_viewers = Column(Integer, default=0, nullable=False)
+
+    def __str__(self):
+        return f"StreamUsageRollup: {self.granularity} {self.bucket} - Camera {self.camera_id}"
+
+
+class ImportJob(Base):
+    __tablename__ = 'import_jobs'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
+    filename = Column(String, nullable=False)
+    status = Column(String, default=ImportJobStatus.PENDING, nullable=False)
+    parsed = Column(Integer, default=0, nullable=False)
+    inserted = Column(Integer, default=0, nullable=False)
+    rejected = Column(Integer, default=0, nullable=False)
+    chunks = Column(Integer, default=0, nullable=False)
+    rejections = Column(JSONB, default=list, nullable=False)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __str__(self):
+        return f"ImportJob {self.id} - {self.status}"
@@ -0,0 +1,45 @@
+import json, base64
+
+from typing import Optional
+from fastapi import Query
+
+from app.config import settings
+from app.exceptions import IncorrectCursorException
+
+
+def encode_cursor(value) -> str:
+    """
+    Кодирование значения ключа последней записи страницы в курсор
+    """
+    return base64.urlsafe_b64encode(json.dumps(str(value)).encode()).decode()
+
+
+def decode_cursor(cursor: str, column):
+    """
+    Декодирование курсора в значение ключа с приведением к типу колонки
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return column.type.python_type(value)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise IncorrectCursorException
+
+
+class Pagination:
+    """
+    Параметры постраничной выдачи по курсору (keyset).
+    Общее количество записей считается только при with_total=true
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.with_total = with_total
+
+    def as_dict(self) -> dict:
+        return {"limit": self.limit, "cursor": self.cursor, "with_total": self.with_total}
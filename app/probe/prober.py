@@ -0,0 +1,207 @@
+import cv2, time, asyncio
+
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+from app.logger import logger
+from app.models import ProbeStatus
+from app.probe.rtsp import RTSPError, probe_rtsp
+from app.probe.services import CameraHealthService
+from app.stream.url_encryption import decrypt_stream_url
+from app.exceptions import ProbeAlreadyRunningException
+
+
+frame_executor = ThreadPoolExecutor(max_workers=settings.PROBE_FRAME_WORKERS, thread_name_prefix="probe-frame")
+
+
+def grab_frame(stream_url: str, frames: int, timeout: float) -> tuple[int, int] | None:
+    """
+    Захват нескольких кадров через OpenCV. Возвращает разрешение последнего полученного кадра или None
+    """
+    timeout_ms = int(timeout * 1000)
+    capture = cv2.VideoCapture(
+        stream_url,
+        cv2.CAP_FFMPEG,
+        [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms],
+    )
+    try:
+        if not capture.isOpened():
+            return None
+        shape = None
+        for _ in range(frames):
+            ok, frame = capture.read()
+            if ok and frame is not None:
+                shape = frame.shape
+        return (shape[1], shape[0]) if shape else None
+    finally:
+        capture.release()
+
+
+async def probe_camera(camera_id: int, stream_url: str) -> dict:
+    """
+    Проверка одной камеры: сначала RTSP OPTIONS/DESCRIBE, захват кадров - только если
+    SDP не содержит разрешения (или адрес не RTSP). Не выбрасывает исключений:
+    любая ошибка записывается в результат со статусом ERROR
+    """
+    row = {"camera_id": camera_id, "status": ProbeStatus.ERROR, "latency_ms": None, "width": None,
+           "height": None, "codec": None, "error": None, "checked_at": datetime.utcnow()}
+    try:
+        url = decrypt_stream_url(stream_url)
+    except Exception as e:
+        row["error"] = f"Не удалось расшифровать адрес: {e}"
+        return row
+
+    grab_needed = True
+    try:
+        result = await probe_rtsp(url, settings.PROBE_TIMEOUT)
+    except RTSPError as e:
+        row["error"] = str(e)
+    except asyncio.TimeoutError:
+        row["status"] = ProbeStatus.OFFLINE
+        row["error"] = "Превышено время ожидания ответа"
+        return row
+    except OSError as e:
+        row["status"] = ProbeStatus.OFFLINE
+        row["error"] = str(e) or e.__class__.__name__
+        return row
+    except Exception as e:
+        row["error"] = f"Ошибка проверки: {e.__class__.__name__}: {e}"
+        return row
+    else:
+        row.update(latency_ms=result.latency_ms, codec=result.codec, width=result.width, height=result.height)
+        if result.status == 401:
+            row["status"] = ProbeStatus.UNAUTHORIZED
+            return row
+        if result.status != 200:
+            row["error"] = f"RTSP {result.status}"
+            return row
+        if result.codec is None:
+            row["status"] = ProbeStatus.NO_VIDEO
+            return row
+        row["status"] = ProbeStatus.ONLINE
+        grab_needed = result.width is None
+
+    if not grab_needed or not settings.PROBE_FRAME_GRAB:
+        return row
+
+    loop = asyncio.get_running_loop()
+    try:
+        resolution = await loop.run_in_executor(frame_executor, grab_frame, url, settings.PROBE_FRAMES, settings.PROBE_TIMEOUT)
+    except Exception as e:
+        row["status"] = ProbeStatus.ERROR
+        row["error"] = f"Ошибка захвата кадра: {e.__class__.__name__}: {e}"
+        return row
+    if resolution is not None:
+        row["width"], row["height"] = resolution
+        row["status"] = ProbeStatus.ONLINE
+        row["error"] = None
+    elif row["status"] == ProbeStatus.ONLINE:
+        row["status"] = ProbeStatus.NO_VIDEO
+    return row
+
+
+class CameraProber:
+    """
+    Проверка состояния камер пачками по id: в пачке одновременно проверяется не более
+    PROBE_CONCURRENCY камер, повторно проверяются только камеры старше PROBE_STALE_SECONDS
+    """
+
+    def __init__(self, concurrency: int, batch_size: int):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.task: asyncio.Task | None = None
+        self.loop_task: asyncio.Task | None = None
+        self.checked = 0
+        self.statuses: dict[str, int] = {}
+        self.started_at = None
+        self.finished_at = None
+        self.duration = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self, force: bool = False, camera_ids: list[int] | None = None) -> asyncio.Task:
+        """
+        Запуск проверки в фоне. force - проверить все камеры независимо от давности последней проверки
+        """
+        if self.running:
+            raise ProbeAlreadyRunningException
+        self.task = asyncio.create_task(self.run(force, camera_ids))
+        return self.task
+
+    async def run(self, force: bool = False, camera_ids: list[int] | None = None) -> None:
+        self.checked = 0
+        self.statuses = {}
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        started = time.monotonic()
+
+        stale_before = None if force else datetime.utcnow() - timedelta(seconds=settings.PROBE_STALE_SECONDS)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded_probe(camera_id: int, stream_url: str) -> dict:
+            async with semaphore:
+                return await probe_camera(camera_id, stream_url)
+
+        after_id = 0
+        try:
+            while cameras := await CameraHealthService.find_stale_cameras(after_id, self.batch_size, stale_before, camera_ids):
+                rows = await asyncio.gather(*(bounded_probe(camera.id, camera.stream_url) for camera in cameras))
+                try:
+                    await CameraHealthService.upsert(rows)
+                except Exception as e:
+                    logger.error(f"Не удалось сохранить результаты проверки камер {cameras[0].id}-{cameras[-1].id}: {e}")
+                for row in rows:
+                    self.statuses[row["status"]] = self.statuses.get(row["status"], 0) + 1
+                self.checked += len(rows)
+                after_id = cameras[-1].id
+        except Exception as e:
+            logger.error(f"Ошибка при проверке камер: {e}")
+            raise
+        finally:
+            self.finished_at = datetime.utcnow()
+            self.duration = round(time.monotonic() - started, 1)
+
+        logger.info(f"Проверено камер: {self.checked} за {self.duration} с: {self.statuses}")
+
+    def start_periodic(self) -> None:
+        """
+        Периодическая проверка раз в PROBE_INTERVAL_SECONDS (выключена при 0)
+        """
+        if settings.PROBE_INTERVAL_SECONDS > 0 and self.loop_task is None:
+            self.loop_task = asyncio.create_task(self._periodic())
+
+    async def _periodic(self) -> None:
+        while True:
+            if not self.running:
+                try:
+                    await self.start()
+                except Exception:
+                    pass
+            await asyncio.sleep(settings.PROBE_INTERVAL_SECONDS)
+
+    async def shutdown(self) -> None:
+        for task in (self.loop_task, self.task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self.loop_task = None
+        frame_executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "checked": self.checked,
+            "statuses": self.statuses,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": self.duration,
+        }
+
+
+camera_prober = CameraProber(settings.PROBE_CONCURRENCY, settings.PROBE_BATCH_SIZE)
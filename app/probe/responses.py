@@ -0,0 +1,18 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+from app.probe.schemas import CameraHealth, ProbeState
+
+
+class CameraHealthResponse(BaseModel):
+    health: CameraHealth
+
+
+class CamerasHealthResponse(BaseModel):
+    health: List[CameraHealth]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class ProbeStateResponse(BaseModel):
+    state: ProbeState
@@ -0,0 +1,65 @@
+from typing import Optional, List
+from fastapi import APIRouter, Depends, Query, status
+
+from app.pagination import Pagination
+from app.probe.prober import camera_prober
+from app.probe.services import CameraHealthService
+from app.users.schemas import User as UserSchema
+from app.authorization.dependencies import check_is_current_user_admin
+from app.probe.responses import CameraHealthResponse, CamerasHealthResponse, ProbeStateResponse
+from app.exceptions import CameraHealthNotFoundException
+
+
+router = APIRouter(
+    prefix="/probe",
+    tags=["Проверка состояния камер"],
+)
+
+
+@router.post(path="/run", response_model=ProbeStateResponse, status_code=status.HTTP_202_ACCEPTED)
+async def run_probe(
+    force: bool = False,
+    camera_ids: Optional[List[int]] = Query(None),
+    current_user: UserSchema = Depends(check_is_current_user_admin),
+):
+    """
+    Запуск проверки камер в фоне. По умолчанию проверяются только камеры, не проверявшиеся
+    дольше PROBE_STALE_SECONDS; force=true - все камеры (или только переданные camera_ids)
+    """
+    camera_prober.start(force, camera_ids)
+    return {"state": camera_prober.stats()}
+
+
+@router.get(path="/state", response_model=ProbeStateResponse, status_code=status.HTTP_200_OK)
+async def get_probe_state(current_user: UserSchema = Depends(check_is_current_user_admin)):
+    """
+    Ход последней проверки: количество проверенных камер по статусам
+    """
+    return {"state": camera_prober.stats()}
+
+
+@router.get(path="/cameras", response_model=CamerasHealthResponse, status_code=status.HTTP_200_OK)
+async def get_cameras_health(
+    probe_status: Optional[str] = Query(None, alias="status"),
+    pagination: Pagination = Depends(),
+    current_user: UserSchema = Depends(check_is_current_user_admin),
+):
+    """
+    Результаты последней проверки камер с фильтром по статусу
+    """
+    filter_by = {"status": probe_status} if probe_status else {}
+    page = await CameraHealthService.find_page(**pagination.as_dict(), order_by="camera_id", **filter_by)
+
+    return {"health": page["items"], "next_cursor": page["next_cursor"], "total": page["total"]}
+
+
+@router.get(path="/cameras/{camera_id}", response_model=CameraHealthResponse, status_code=status.HTTP_200_OK)
+async def get_camera_health(camera_id: int, current_user: UserSchema = Depends(check_is_current_user_admin)):
+    """
+    Результат последней проверки камеры
+    """
+    health = await CameraHealthService.find_one_or_none(camera_id=camera_id)
+    if not health:
+        raise CameraHealthNotFoundException
+
+    return {"health": health}
@@ -0,0 +1,177 @@
+import re, time, base64, asyncio, hashlib
+
+from urllib.parse import urlsplit, urlunsplit, unquote
+
+
+DEFAULT_RTSP_PORT = 554
+
+USER_AGENT = "camera-health-probe"
+
+AUTH_PARAM_PATTERN = re.compile(r'(\w+)="?([^",]*)"?')
+FRAMESIZE_PATTERN = re.compile(r"^a=(?:framesize:\d+ (\d+)-(\d+)|x-dimensions:\s*(\d+),\s*(\d+))", re.MULTILINE)
+RTPMAP_PATTERN = re.compile(r"^a=rtpmap:(\d+) ([\w.-]+)/", re.MULTILINE)
+
+
+class RTSPError(Exception):
+    """Ошибка обмена с RTSP сервером (некорректный ответ, разрыв соединения)"""
+
+
+class RTSPResponse:
+    """Ответ RTSP сервера: код, заголовки (в нижнем регистре) и тело"""
+
+    def __init__(self, status: int, headers: dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class RTSPProbeResult:
+    """Результат проверки камеры по RTSP: ответ на DESCRIBE и параметры видео из SDP"""
+
+    def __init__(self, status: int, latency_ms: float, codec: str | None = None, width: int | None = None, height: int | None = None):
+        self.status = status
+        self.latency_ms = latency_ms
+        self.codec = codec
+        self.width = width
+        self.height = height
+
+
+def parse_sdp(sdp: str) -> tuple[str | None, int | None, int | None]:
+    """
+    Кодек и разрешение первого видеопотока из SDP. Разрешение указывают не все камеры
+    """
+    video = None
+    for media in re.split(r"^(?=m=)", sdp, flags=re.MULTILINE):
+        if media.startswith("m=video"):
+            video = media
+            break
+    if video is None:
+        return None, None, None
+
+    codec = None
+    payload_types = video.splitlines()[0].split()[3:]
+    for payload_type, name in RTPMAP_PATTERN.findall(video):
+        if not payload_types or payload_type in payload_types:
+            codec = name.lower()
+            break
+
+    width = height = None
+    match = FRAMESIZE_PATTERN.search(video)
+    if match:
+        width, height = (int(value) for value in (match.group(1) or match.group(3), match.group(2) or match.group(4)))
+
+    return codec, width, height
+
+
+def _authorization(method: str, uri: str, username: str, password: str, challenge: str | None) -> str:
+    if challenge and challenge.lower().startswith("digest"):
+        params = dict(AUTH_PARAM_PATTERN.findall(challenge))
+        realm, nonce = params.get("realm", ""), params.get("nonce", "")
+        ha1 = hashlib.md5(f"{username}:{realm}:{password}".encode()).hexdigest()
+        ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
+        response = hashlib.md5(f"{ha1}:{nonce}:{ha2}".encode()).hexdigest()
+        return f'Digest username="{username}", realm="{realm}", nonce="{nonce}", uri="{uri}", response="{response}"'
+
+    credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return f"Basic {credentials}"
+
+
+class RTSPConnection:
+    """
+    Минимальный RTSP клиент для проверки камеры: OPTIONS и DESCRIBE с Basic/Digest авторизацией
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, uri: str, username: str | None, password: str | None):
+        self.reader = reader
+        self.writer = writer
+        self.uri = uri
+        self.username = username
+        self.password = password
+        self.challenge = None
+        self.cseq = 0
+
+    async def request(self, method: str, headers: dict[str, str] | None = None) -> RTSPResponse:
+        """Запрос с повтором после 401, если в адресе камеры есть учётные данные"""
+        response = await self._send(method, headers or {})
+        if response.status == 401 and self.username is not None and self.challenge is None:
+            self.challenge = response.headers.get("www-authenticate", "")
+            response = await self._send(method, headers or {})
+        return response
+
+    async def _send(self, method: str, headers: dict[str, str]) -> RTSPResponse:
+        self.cseq += 1
+        lines = [f"{method} {self.uri} RTSP/1.0", f"CSeq: {self.cseq}", f"User-Agent: {USER_AGENT}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        if self.username is not None and self.challenge is not None:
+            lines.append(f"Authorization: {_authorization(method, self.uri, self.username, self.password or '', self.challenge)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        await self.writer.drain()
+        return await self._read_response()
+
+    async def _read_response(self) -> RTSPResponse:
+        try:
+            head = await self.reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            raise RTSPError("Соединение закрыто до получения ответа") from e
+
+        status_line, *header_lines = head.decode(errors="replace").split("\r\n")
+        parts = status_line.split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("RTSP/") or not parts[1].isdigit():
+            raise RTSPError(f"Некорректный ответ: {status_line[:100]}")
+
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError as e:
+            raise RTSPError(f"Некорректный Content-Length: {headers['content-length'][:20]}") from e
+        if length:
+            try:
+                body = await self.reader.readexactly(length)
+            except asyncio.IncompleteReadError as e:
+                raise RTSPError("Соединение закрыто до получения тела ответа") from e
+        return RTSPResponse(int(parts[1]), headers, body)
+
+
+async def _describe(parts, uri: str, username: str | None, password: str | None) -> RTSPResponse:
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or DEFAULT_RTSP_PORT, ssl=parts.scheme == "rtsps" or None)
+    try:
+        connection = RTSPConnection(reader, writer, uri, username, password)
+        await connection.request("OPTIONS")
+        return await connection.request("DESCRIBE", {"Accept": "application/sdp"})
+    finally:
+        writer.close()
+
+
+async def probe_rtsp(stream_url: str, timeout: float) -> RTSPProbeResult:
+    """
+    Проверка камеры по RTSP: TCP соединение, OPTIONS и DESCRIBE. Возвращает код ответа на DESCRIBE,
+    задержку и параметры видео из SDP. Исключения: OSError, asyncio.TimeoutError, RTSPError
+    """
+    parts = urlsplit(stream_url)
+    if parts.scheme not in ("rtsp", "rtsps") or not parts.hostname:
+        raise RTSPError("Адрес камеры не является RTSP адресом")
+
+    try:
+        port = parts.port
+    except ValueError as e:
+        raise RTSPError("Некорректный порт в адресе камеры") from e
+
+    netloc = parts.hostname if port is None else f"{parts.hostname}:{port}"
+    uri = urlunsplit((parts.scheme, netloc, parts.path or "/", parts.query, ""))
+    username = unquote(parts.username) if parts.username is not None else None
+    password = unquote(parts.password) if parts.password is not None else None
+
+    started = time.monotonic()
+    response = await asyncio.wait_for(_describe(parts, uri, username, password), timeout=timeout)
+    latency_ms = round((time.monotonic() - started) * 1000, 1)
+    if response.status != 200:
+        return RTSPProbeResult(response.status, latency_ms)
+
+    codec, width, height = parse_sdp(response.body.decode(errors="replace"))
+    return RTSPProbeResult(response.status, latency_ms, codec, width, height)
@@ -0,0 +1,26 @@
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class CameraHealth(BaseModel):
+    camera_id: int
+    status: str
+    latency_ms: Optional[float]
+    width: Optional[int]
+    height: Optional[int]
+    codec: Optional[str]
+    error: Optional[str]
+    checked_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class ProbeState(BaseModel):
+    running: bool
+    checked: int
+    statuses: dict[str, int]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    duration: Optional[float]
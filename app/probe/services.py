@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy import select, or_, values, column, cast
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.services import BaseRequests
+from app.database import async_session_maker
+from app.models import Camera, CameraHealth
+
+
+class CameraHealthService(BaseRequests):
+    """Запросы к результатам проверки камер"""
+
+    model = CameraHealth
+
+    @classmethod
+    async def find_stale_cameras(cls, after_id: int, limit: int, stale_before: datetime | None = None, camera_ids: list[int] | None = None):
+        """Камеры с id больше after_id, которые не проверялись или проверялись раньше stale_before. Возвращает строки (id, stream_url)"""
+        async with async_session_maker() as session:
+            query = (
+                select(Camera.id, Camera.stream_url)
+                .outerjoin(CameraHealth, CameraHealth.camera_id == Camera.id)
+                .where(Camera.id > after_id)
+            )
+            if stale_before is not None:
+                query = query.where(or_(CameraHealth.checked_at.is_(None), CameraHealth.checked_at < stale_before))
+            if camera_ids:
+                query = query.where(Camera.id.in_(camera_ids))
+            result = await session.execute(query.order_by(Camera.id).limit(limit))
+            return result.all()
+
+    @classmethod
+    async def upsert(cls, rows: list[dict]) -> None:
+        """Запись результатов проверки одним INSERT ... SELECT FROM (VALUES ...) JOIN cameras с заменой предыдущих.
+        Результаты камер, удалённых во время проверки, пропускаются. Колонки приводятся к типам таблицы:
+        колонка VALUES из одних NULL иначе получает тип text"""
+        if not rows:
+            return
+        columns = list(CameraHealth.__table__.columns)
+        results = values(*(column(item.name, item.type) for item in columns), name="results").data(
+            [tuple(row.get(item.name) for item in columns) for row in rows]
+        )
+        async with async_session_maker() as session:
+            query = pg_insert(CameraHealth).from_select(
+                [item.name for item in columns],
+                select(*(cast(results.c[item.name], item.type) for item in columns)).join(Camera, Camera.id == results.c.camera_id),
+            )
+            query = query.on_conflict_do_update(
+                index_elements=[CameraHealth.camera_id],
+                set_={item.name: query.excluded[item.name] for item in columns if item.name != "camera_id"},
+            )
+            await session.execute(query)
+            await session.commit()
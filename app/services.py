@@ -1,81 +1,139 @@
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import delete, insert, select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from app.database import async_session_maker
+from app.database import use_session
+from app.pagination import encode_cursor, decode_cursor
+
+
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def violated_foreign_key(error: IntegrityError) -> str | None:
+    """Колонка нарушенного внешнего ключа (по имени ограничения вида <таблица>_<колонка>_fkey) или None для других нарушений"""
+    cause = error.orig.__cause__ or error.orig
+    if getattr(cause, "sqlstate", None) != FOREIGN_KEY_VIOLATION:
+        return None
+    constraint = getattr(cause, "constraint_name", None) or ""
+    table = getattr(cause, "table_name", None) or ""
+    return constraint.removeprefix(f"{table}_").removesuffix("_fkey") or None
 
 
 class BaseRequests:
-    """Базовый класс с запросами к БД"""
+    """Базовый класс с запросами к БД. Все методы принимают необязательную сессию запроса (get_session),
+    без неё каждый вызов открывает собственную сессию"""
 
     model = None
 
     @classmethod
-    async def find_by_id(cls, model_id: int):
+    async def find_by_id(cls, model_id: int, session: AsyncSession | None = None):
         """Поиск одного объекта по id с проверкой на существование. Возвращает один объект или None"""
-        async with async_session_maker() as session:
+        async with use_session(session) as session:
             query = select(cls.model).filter_by(id=model_id)
             result = await session.execute(query)
             return result.scalar_one_or_none()
 
     @classmethod
-    async def find_one_or_none(cls, **filter_by):
+    async def find_one_or_none(cls, session: AsyncSession | None = None, **filter_by):
         """Поиск одного объекта по фильтру с проверкой на существование. Возвращает один объект или None"""
-        async with async_session_maker() as session:
+        async with use_session(session) as session:
             query = select(cls.model).filter_by(**filter_by)
             result = await session.execute(query)
             return result.scalar_one_or_none()
 
     @classmethod
-    async def find_all(cls, **filter_by):
+    async def find_all(cls, session: AsyncSession | None = None, **filter_by):
         """Поиск объектов по фильтру. Возвращает список элементов"""
-        async with async_session_maker() as session:
+        async with use_session(session) as session:
             query = select(cls.model).filter_by(**filter_by)
             result = await session.execute(query)
             return result.scalars().all()
 
     @classmethod
-    async def find_last(cls):
+    async def find_last(cls, session: AsyncSession | None = None):
         """Поиск последнего объекта. Возвращает один объект или None"""
-        async with async_session_maker() as session:
+        async with use_session(session) as session:
             query = select(cls.model).order_by(cls.model.id.desc()).limit(1)
             result = await session.execute(query)
             return result.scalar_one_or_none()
 
     @classmethod
-    async def add(cls, **data):
+    async def add(cls, session: AsyncSession | None = None, **data):
         """Добавление объектов"""
-        async with async_session_maker() as session:
+        async with use_session(session, commit=True) as session:
             query = insert(cls.model).values(**data).returning(cls.model)
             result = await session.execute(query)
-            await session.commit()
 
             created_object = result.scalars().one_or_none()
             return created_object
 
     @classmethod
-    async def delete(cls, id):
+    async def add_if_absent(cls, session: AsyncSession | None = None, **data) -> bool:
+        """Добавление объекта одним INSERT ... ON CONFLICT DO NOTHING. Возвращает False, если такой объект уже есть"""
+        async with use_session(session, commit=True) as session:
+            query = pg_insert(cls.model).values(**data).on_conflict_do_nothing().returning(*cls.model.__table__.primary_key.columns)
+            result = await session.execute(query)
+            return result.first() is not None
+
+    @classmethod
+    async def delete(cls, id, session: AsyncSession | None = None):
         """Удаление объектов"""
-        async with async_session_maker() as session:
-            async with session.begin():
-                query = delete(cls.model).where(cls.model.id == id)
-                await session.execute(query)
-                await session.commit()
+        async with use_session(session, commit=True) as session:
+            query = delete(cls.model).where(cls.model.id == id)
+            await session.execute(query)
 
     @classmethod
-    async def update(cls, id, **data):
+    async def update(cls, id, session: AsyncSession | None = None, **data):
         """Обновление объектов"""
-        async with async_session_maker() as session:
+        async with use_session(session, commit=True) as session:
             query = update(cls.model).where(cls.model.id == id).values(**data).returning(cls.model)
             result = await session.execute(query)
-            await session.commit()
 
             updated_object = result.scalars().one_or_none()
             return updated_object
 
     @classmethod
-    async def select_all_filter(cls, *args, **kwargs):
+    async def select_all_filter(cls, *args, session: AsyncSession | None = None, **kwargs):
         """Выборка объектов по фильтру"""
-        async with async_session_maker() as session:
+        async with use_session(session) as session:
             query = select(cls.model).filter(*args, **kwargs)
             result = await session.execute(query)
             return result.scalars().all()
-        
\ No newline at end of file
+
+    @classmethod
+    def select_columns(cls, columns: list[str] | None = None):
+        """Запрос всей модели или только указанных колонок"""
+        if not columns:
+            return select(cls.model)
+        return select(*(getattr(cls.model, column) for column in columns))
+
+    @classmethod
+    async def paginate(cls, query, order_column, limit: int, cursor: str | None = None, with_total: bool = False, columns: list[str] | None = None, session: AsyncSession | None = None) -> dict:
+        """Постраничная выборка по курсору (keyset) для произвольного запроса. Возвращает словарь с элементами, курсором следующей страницы и общим количеством"""
+        async with use_session(session) as session:
+            total = None
+            if with_total:
+                total = await session.scalar(select(func.count()).select_from(query.subquery()))
+
+            if cursor:
+                query = query.where(order_column > decode_cursor(cursor, order_column))
+            query = query.order_by(order_column).limit(limit + 1)
+            result = await session.execute(query)
+            items = result.all() if columns else result.scalars().all()
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(getattr(items[-1], order_column.key))
+
+        return {"items": items, "next_cursor": next_cursor, "total": total}
+
+    @classmethod
+    async def find_page(cls, limit: int, cursor: str | None = None, with_total: bool = False, columns: list[str] | None = None, order_by: str = "id", session: AsyncSession | None = None, **filter_by) -> dict:
+        """Постраничный поиск объектов по фильтру с сортировкой по order_by и необязательной выборкой только части колонок"""
+        order_column = getattr(cls.model, order_by)
+        if columns and order_by not in columns:
+            columns = [*columns, order_by]
+        query = cls.select_columns(columns).filter_by(**filter_by)
+        return await cls.paginate(query, order_column, limit, cursor, with_total, columns, session)
@@ -0,0 +1,174 @@
+import re, asyncio
+
+from datetime import datetime
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+from app.models import UserRole
+from app.cache import TTLCache, CacheInvalidationChannel
+from app.analytics.writer import stream_events
+from app.users.services import UserService
+from app.cameras.services import UserCameraService
+from app.authorization.dependencies import get_token
+from app.authorization.authorization import decode_access_token
+from app.exceptions import ProjectException, TokenExpiredException, UserIsNotPresentException
+
+
+CAMERA_PATH_PATTERN = re.compile(r"^/?camera_(\d+)/")
+
+
+class CameraAccessList:
+    """
+    Список доступа пользователей к камерам в памяти (user_id -> множество camera_id).
+    Загружается одним запросом при первом обращении пользователя и далее обновляется
+    точечно при выдаче и отзыве доступа, поэтому проверка не обращается к БД
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loading: dict[str, asyncio.Future] = {}
+        self._stale: set[str] = set()
+
+    async def allowed_cameras(self, user_id) -> set[int]:
+        """
+        Множество камер, доступных пользователю. Одновременные обращения ждут одну загрузку из БД
+        """
+        key = str(user_id)
+        cameras = self.cache.get(key)
+        if cameras is not None:
+            return cameras
+
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(key, user_id))
+            self._loading[key] = loading
+        return await asyncio.shield(loading)
+
+    async def _load(self, key: str, user_id) -> set[int]:
+        """
+        Загрузка списка пользователя. Если доступ изменился во время запроса к БД, прочитанный список
+        мог его не застать: список читается повторно, а при новом изменении возвращается без сохранения в кэш
+        """
+        try:
+            for _ in range(2):
+                self._stale.discard(key)
+                cameras = await UserCameraService.find_camera_ids(user_id)
+                if key not in self._stale:
+                    self.cache.set(key, cameras)
+                    return cameras
+            return cameras
+        finally:
+            self._loading.pop(key, None)
+            self._stale.discard(key)
+
+    def _changed(self, key: str) -> None:
+        if key in self._loading:
+            self._stale.add(key)
+
+    async def has_access(self, user_id, camera_id: int) -> bool:
+        """
+        Проверка доступа пользователя к камере
+        """
+        return camera_id in await self.allowed_cameras(user_id)
+
+    def grant(self, user_id, camera_id: int) -> None:
+        """
+        Выдача доступа (обновляется только уже загруженный список пользователя)
+        """
+        key = str(user_id)
+        self._changed(key)
+        cameras = self.cache.peek(key)
+        if cameras is not None:
+            cameras.add(camera_id)
+
+    def revoke(self, user_id, camera_id: int) -> None:
+        """
+        Отзыв доступа к камере у пользователя
+        """
+        key = str(user_id)
+        self._changed(key)
+        cameras = self.cache.peek(key)
+        if cameras is not None:
+            cameras.discard(camera_id)
+
+    def revoke_camera(self, camera_id: int) -> None:
+        """
+        Отзыв доступа к камере у всех пользователей (при удалении камеры)
+        """
+        self._stale.update(self._loading)
+        for cameras in self.cache.values():
+            cameras.discard(camera_id)
+
+    def drop_user(self, user_id) -> None:
+        """
+        Сброс списка пользователя (будет загружен заново при следующем обращении)
+        """
+        key = str(user_id)
+        self._changed(key)
+        self.cache.pop(key)
+
+
+camera_acl = CameraAccessList(settings.ACL_CACHE_MAXSIZE, settings.ACL_CACHE_TTL)
+
+acl_channel = (
+    CacheInvalidationChannel(settings.ACL_INVALIDATION_CHANNEL, camera_acl.drop_user)
+    if settings.ACL_INVALIDATION_CHANNEL else None
+)
+
+
+async def acl_changed(user_id) -> None:
+    """
+    Уведомление остальных воркеров об изменении доступа пользователя (если настроен канал)
+    """
+    if acl_channel is not None:
+        await acl_channel.publish(str(user_id))
+
+
+async def authorize_stream_request(scope) -> int | None:
+    """
+    Проверка доступа к плейлисту или сегменту потока камеры.
+    Токен проверяется через кэш JWT, пользователь - через кэш пользователей (забаненным доступ закрыт,
+    администраторам открыт ко всем камерам), доступ к камере - через список доступа в памяти.
+    Возвращает HTTP статус ошибки или None, если доступ разрешён (зритель сохраняется в scope["state"])
+    """
+    if not settings.HLS_REQUIRE_AUTH:
+        return None
+
+    match = CAMERA_PATH_PATTERN.match(scope["path"])
+    if not match:
+        return 404
+
+    try:
+        token = await get_token(HTTPConnection(scope))
+        payload = decode_access_token(token)
+
+        expire = payload.get("exp")
+        if not expire or datetime.utcnow().timestamp() > expire:
+            raise TokenExpiredException
+
+        user_id = payload.get("sub")
+        if not user_id:
+            raise UserIsNotPresentException
+
+        user = await UserService.find_by_id_cached(user_id)
+        if not user:
+            raise UserIsNotPresentException
+    except ProjectException as e:
+        return e.status_code
+
+    camera_id = int(match.group(1))
+    if user.ban:
+        return 403
+    if user.role not in (UserRole.ADMIN, UserRole.ROOT) and not await camera_acl.has_access(user_id, camera_id):
+        return 403
+    scope.setdefault("state", {})["stream_viewer"] = (camera_id, user_id)
+    return None
+
+
+def touch_stream_viewer(scope) -> None:
+    """
+    Отметка активности зрителя для аналитики после успешной проверки доступа к файлу потока
+    """
+    viewer = scope.get("state", {}).get("stream_viewer")
+    if viewer is not None:
+        stream_events.touch(*viewer)
@@ -0,0 +1,65 @@
+import httpx
+
+from importlib.util import find_spec
+
+from app.config import settings
+from app.logger import logger
+
+
+class GinClient:
+    """
+    Общий HTTP клиент для обращений к Gin сервису.
+    Создаётся один раз на время жизни приложения и переиспользует соединения (keep-alive).
+    """
+
+    client: httpx.AsyncClient | None = None
+
+    @classmethod
+    async def open(cls) -> None:
+        """
+        Создание клиента с пулом соединений (вызывается при старте приложения)
+        """
+        if cls.client is not None:
+            return
+
+        http2 = settings.GIN_HTTP2 and find_spec("h2") is not None
+        if settings.GIN_HTTP2 and not http2:
+            logger.warning("Пакет h2 не установлен, соединения с Gin будут использовать HTTP/1.1")
+
+        cls.client = httpx.AsyncClient(
+            base_url=settings.GIN_HOST,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.GIN_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GIN_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GIN_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.GIN_TIMEOUT, connect=settings.GIN_CONNECT_TIMEOUT),
+        )
+
+    @classmethod
+    async def close(cls) -> None:
+        """
+        Закрытие клиента и всех открытых соединений (вызывается при остановке приложения)
+        """
+        if cls.client is not None:
+            await cls.client.aclose()
+            cls.client = None
+
+    @classmethod
+    async def post(cls, path: str, token: str, timeout: float | None = None) -> httpx.Response:
+        """
+        POST запрос к Gin с передачей токена пользователя.
+        Таймаут можно переопределить для отдельного вызова.
+        """
+        if cls.client is None:
+            await cls.open()
+
+        request_timeout = httpx.Timeout(timeout, connect=settings.GIN_CONNECT_TIMEOUT) if timeout else httpx.USE_CLIENT_DEFAULT
+        response = await cls.client.post(
+            path,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=request_timeout,
+        )
+        response.raise_for_status()
+        return response
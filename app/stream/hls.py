@@ -0,0 +1,357 @@
+import os, re, time, asyncio
+
+from threading import Lock
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from starlette.types import Scope, Receive, Send
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, PlainTextResponse, FileResponse
+
+from app.config import settings
+
+
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+PLAYLIST_SUFFIX = ".m3u8"
+
+SERVER_CONTROL_TAG = b"#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES"
+
+MEDIA_SEQUENCE_PATTERN = re.compile(rb"#EXT-X-MEDIA-SEQUENCE:(\d+)")
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def file_etag(mtime_ns: int, file_size: int) -> str:
+    return f'"{mtime_ns:x}-{file_size:x}"'
+
+
+def parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    Разбор заголовка Range с одним диапазоном. Возвращает (start, end) включительно или None, если диапазон некорректен
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    else:
+        start = max(size - int(match.group(2)), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+class HLSFile:
+    """
+    Файл плейлиста или сегмента, закэшированный в памяти
+    """
+
+    def __init__(self, path: str, data: bytes, mtime_ns: int, file_size: int, low_latency: bool = False):
+        self.path = path
+        self.is_playlist = path.endswith(PLAYLIST_SUFFIX)
+        if self.is_playlist and low_latency and settings.HLS_ADVERTISE_BLOCKING_RELOAD and SERVER_CONTROL_TAG not in data:
+            data = data.replace(b"#EXTM3U\n", b"#EXTM3U\n" + SERVER_CONTROL_TAG + b"\n", 1)
+        self.data = data
+        self.mtime_ns = mtime_ns
+        self.file_size = file_size
+        self.size = len(data)
+        self.etag = file_etag(mtime_ns, file_size)
+        self.checked_at = time.monotonic()
+        self.content_type = CONTENT_TYPES[os.path.splitext(path)[1]]
+
+    def last_sequence(self) -> tuple[int, int] | None:
+        """
+        Номер последнего полного сегмента плейлиста и количество частичных сегментов после него
+        """
+        match = MEDIA_SEQUENCE_PATTERN.search(self.data)
+        media_sequence = int(match.group(1)) if match else 0
+        segments = 0
+        parts = 0
+        for line in self.data.splitlines():
+            if line.startswith(b"#EXTINF"):
+                segments += 1
+                parts = 0
+            elif line.startswith(b"#EXT-X-PART:"):
+                parts += 1
+        return media_sequence + segments - 1, parts
+
+
+class HLSFileCache:
+    """
+    LRU кэш плейлистов и сегментов с ограничением по объёму.
+    Записи перепроверяются через stat не чаще заданного интервала, изменённые файлы перечитываются.
+    В плейлисты каталогов низкой задержки (их регистрирует supervisor) добавляется EXT-X-SERVER-CONTROL
+    """
+
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._files: OrderedDict[str, HLSFile] = OrderedDict()
+        self._low_latency_dirs: set[str] = set()
+        self._lock = Lock()
+
+    def add_low_latency_directory(self, directory: str) -> None:
+        with self._lock:
+            self._low_latency_dirs.add(os.path.realpath(directory))
+
+    def remove_low_latency_directory(self, directory: str) -> None:
+        with self._lock:
+            self._low_latency_dirs.discard(os.path.realpath(directory))
+
+    def _check_interval(self, path: str) -> float:
+        if path.endswith(PLAYLIST_SUFFIX):
+            return settings.HLS_PLAYLIST_CHECK_INTERVAL
+        return settings.HLS_SEGMENT_CHECK_INTERVAL
+
+    def get(self, path: str) -> HLSFile | None:
+        """
+        Получение файла из кэша с перепроверкой изменений. None - файл не найден или слишком большой для кэша
+        """
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and time.monotonic() - cached.checked_at < self._check_interval(path):
+                self._files.move_to_end(path)
+                self.hits += 1
+                return cached
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._drop(path)
+            return None
+
+        if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.file_size == stat.st_size:
+            with self._lock:
+                cached.checked_at = time.monotonic()
+                self.hits += 1
+            return cached
+
+        if stat.st_size > self.max_file_bytes:
+            self._drop(path)
+            return None
+
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            self._drop(path)
+            return None
+
+        with self._lock:
+            low_latency = os.path.dirname(path) in self._low_latency_dirs
+        entry = HLSFile(path, data, stat.st_mtime_ns, stat.st_size, low_latency)
+        with self._lock:
+            self.misses += 1
+            old = self._files.pop(path, None)
+            if old is not None:
+                self.size -= old.size
+            self._files[path] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes and len(self._files) > 1:
+                _, evicted = self._files.popitem(last=False)
+                self.size -= evicted.size
+        return entry
+
+    def _drop(self, path: str) -> None:
+        with self._lock:
+            old = self._files.pop(path, None)
+            if old is not None:
+                self.size -= old.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+hls_cache = HLSFileCache(settings.HLS_CACHE_MAX_BYTES, settings.HLS_CACHE_MAX_FILE_BYTES)
+
+
+class HLSFiles:
+    """
+    ASGI приложение для раздачи HLS плейлистов и сегментов вместо StaticFiles:
+    кэш в памяти, короткий Cache-Control с перепроверкой по ETag (имена сегментов повторяются
+    после перезапуска ffmpeg, поэтому сегменты не помечаются immutable), ETag/Range, блокирующая перезагрузка плейлиста (_HLS_msn/_HLS_part) и zero-copy отправка больших файлов.
+    authorize - необязательная проверка доступа, возвращающая HTTP статус ошибки или None,
+    on_access - необязательный обработчик запроса, прошедшего проверку доступа
+    """
+
+    def __init__(self, directory: str, cache: HLSFileCache = hls_cache, authorize=None, on_access=None):
+        self.directory = os.path.realpath(directory)
+        self.cache = cache
+        self.authorize = authorize
+        self.on_access = on_access
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+            return await response(scope, receive, send)
+
+        path = self.resolve_path(scope["path"])
+        if path is None:
+            return await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+
+        if self.authorize is not None:
+            error_status = await self.authorize(scope)
+            if error_status is not None:
+                return await Response(status_code=error_status)(scope, receive, send)
+        if self.on_access is not None:
+            self.on_access(scope)
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        query = parse_qs(scope.get("query_string", b"").decode())
+
+        if path.endswith(PLAYLIST_SUFFIX) and "_HLS_msn" in query:
+            response = await self.blocking_playlist(path, query)
+            return await response(scope, receive, send)
+
+        entry = await run_in_threadpool(self.cache.get, path)
+        if entry is None:
+            if os.path.isfile(path):
+                return await self.send_file(path, headers, scope, receive, send)
+            return await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+
+        response = self.file_response(entry, headers)
+        await response(scope, receive, send)
+
+    def resolve_path(self, request_path: str) -> str | None:
+        """
+        Проверка пути запроса: только файлы HLS внутри каталога потоков
+        """
+        path = os.path.realpath(os.path.join(self.directory, request_path.lstrip("/")))
+        if os.path.commonpath([self.directory, path]) != self.directory:
+            return None
+        if os.path.splitext(path)[1] not in CONTENT_TYPES:
+            return None
+        return path
+
+    @staticmethod
+    def cache_control(is_playlist: bool) -> str:
+        if is_playlist:
+            return f"public, max-age={settings.HLS_PLAYLIST_MAX_AGE}"
+        return f"public, max-age={settings.HLS_SEGMENT_MAX_AGE}, must-revalidate"
+
+    def cache_headers(self, entry: HLSFile) -> dict:
+        return {"Cache-Control": self.cache_control(entry.is_playlist), "ETag": entry.etag, "Accept-Ranges": "bytes"}
+
+    def file_response(self, entry: HLSFile, request_headers: dict) -> Response:
+        """
+        Ответ из кэша с учётом If-None-Match и Range
+        """
+        headers = self.cache_headers(entry)
+
+        if request_headers.get("if-none-match") == entry.etag:
+            return Response(status_code=304, headers=headers)
+
+        range_header = request_headers.get("range")
+        if range_header and not entry.is_playlist:
+            byte_range = parse_range(range_header, entry.size)
+            if byte_range is None:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{entry.size}"})
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{entry.size}"
+            return Response(entry.data[start:end + 1], status_code=206, headers=headers, media_type=entry.content_type)
+
+        return Response(entry.data, headers=headers, media_type=entry.content_type)
+
+    async def blocking_playlist(self, path: str, query: dict) -> Response:
+        """
+        Блокирующая перезагрузка плейлиста (LL-HLS): ответ отправляется, когда в плейлисте
+        появится сегмент _HLS_msn (и часть _HLS_part), либо по истечении таймаута
+        """
+        try:
+            msn = int(query["_HLS_msn"][0])
+            part = int(query["_HLS_part"][0]) if "_HLS_part" in query else None
+        except ValueError:
+            return PlainTextResponse("Bad Request", status_code=400)
+
+        deadline = time.monotonic() + settings.HLS_BLOCKING_RELOAD_TIMEOUT
+        while True:
+            entry = await run_in_threadpool(self.cache.get, path)
+            if entry is None:
+                return PlainTextResponse("Not Found", status_code=404)
+
+            last_msn, parts = entry.last_sequence()
+            if msn > last_msn + 2:
+                return PlainTextResponse("Bad Request", status_code=400)
+            if last_msn >= msn or (part is not None and last_msn + 1 == msn and parts > part):
+                break
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(settings.HLS_BLOCKING_RELOAD_POLL_INTERVAL)
+
+        headers = self.cache_headers(entry)
+        return Response(entry.data, headers=headers, media_type=entry.content_type)
+
+    async def send_file(self, path: str, headers: dict, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Отправка файла, который не помещается в кэш, с учётом If-None-Match и Range:
+        через zero-copy расширение сервера, если оно поддерживается, иначе обычным FileResponse
+        """
+        content_type = CONTENT_TYPES[os.path.splitext(path)[1]]
+        try:
+            file = await run_in_threadpool(open, path, "rb")
+        except FileNotFoundError:
+            return await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+
+        try:
+            stat = os.fstat(file.fileno())
+            size = stat.st_size
+            response_headers = {
+                "Cache-Control": self.cache_control(False),
+                "ETag": file_etag(stat.st_mtime_ns, size),
+                "Accept-Ranges": "bytes",
+            }
+
+            if headers.get("if-none-match") == response_headers["ETag"]:
+                return await Response(status_code=304, headers=response_headers)(scope, receive, send)
+
+            start, end, status = 0, size - 1, 200
+            if headers.get("range"):
+                byte_range = parse_range(headers["range"], size)
+                if byte_range is None:
+                    return await Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})(scope, receive, send)
+                start, end = byte_range
+                status = 206
+                response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+            if "http.response.zerocopysend" not in scope.get("extensions", {}):
+                if status == 200:
+                    response = FileResponse(path, media_type=content_type, headers=response_headers, stat_result=stat)
+                else:
+                    file.seek(start)
+                    data = await run_in_threadpool(file.read, end - start + 1)
+                    response = Response(data, status_code=206, headers=response_headers, media_type=content_type)
+                return await response(scope, receive, send)
+
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", content_type.encode()),
+                    (b"content-length", str(end - start + 1).encode()),
+                    *((key.lower().encode(), value.encode()) for key, value in response_headers.items()),
+                ],
+            })
+            if scope["method"] == "HEAD":
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({"type": "http.response.zerocopysend", "file": file.fileno(), "offset": start, "count": end - start + 1})
+        finally:
+            file.close()
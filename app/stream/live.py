@@ -0,0 +1,309 @@
+import re, time, struct, asyncio
+
+from collections import deque
+
+from app.config import settings
+from app.logger import logger
+from app.models import TranscodeMode
+from app.stream.profiles import DEFAULT_PROFILE, video_codec_args, resolve_transcode_mode
+from app.exceptions import StreamLimitExceededException, StreamStartException
+
+
+LINE_SEPARATOR = re.compile(rb"[\r\n]+")
+
+BOX_HEADER = struct.Struct(">I4s")
+LARGE_BOX_SIZE = struct.Struct(">Q")
+
+INIT_BOXES = (b"ftyp", b"moov")
+
+DEFAULT_MIME_TYPE = 'video/mp4; codecs="avc1.42E01E"'
+
+
+def build_live_args(stream_url: str, mode: str = TranscodeMode.TRANSCODE, profile: str = DEFAULT_PROFILE) -> list[str]:
+    """
+    Аргументы ffmpeg для фрагментированного MP4 в stdout: каждый фрагмент начинается с ключевого кадра
+    """
+    keyframe_args = []
+    if mode != TranscodeMode.COPY:
+        keyframe_args = ["-tune", "zerolatency", "-force_key_frames", f"expr:gte(t,n_forced*{settings.LIVE_KEYFRAME_INTERVAL})"]
+
+    return [
+        "-hide_banner",
+        "-fflags", "nobuffer",
+        "-i", stream_url,
+        *video_codec_args(mode, profile),
+        *keyframe_args,
+        "-an",
+        "-f", "mp4",
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+        "pipe:1",
+    ]
+
+
+def mime_type(init_segment: bytes) -> str:
+    """
+    MIME тип для MediaSource по записи avcC инициализирующего сегмента (профиль, совместимость, уровень H.264)
+    """
+    index = init_segment.find(b"avcC")
+    if index < 0 or len(init_segment) < index + 8:
+        return DEFAULT_MIME_TYPE
+    profile, compatibility, level = init_segment[index + 5:index + 8]
+    return f'video/mp4; codecs="avc1.{profile:02X}{compatibility:02X}{level:02X}"'
+
+
+async def read_box(reader: asyncio.StreamReader) -> tuple[bytes, bytes]:
+    """
+    Чтение одного бокса MP4 целиком (заголовок вместе с содержимым)
+    """
+    header = await reader.readexactly(BOX_HEADER.size)
+    size, box_type = BOX_HEADER.unpack(header)
+    if size == 1:
+        large = await reader.readexactly(LARGE_BOX_SIZE.size)
+        header += large
+        size = LARGE_BOX_SIZE.unpack(large)[0]
+    if size < len(header):
+        raise ValueError(f"Некорректный размер бокса {box_type!r}: {size}")
+    return box_type, header + await reader.readexactly(size - len(header))
+
+
+class LiveSubscriber:
+    """
+    Зритель WebSocket трансляции с ограниченной очередью фрагментов
+    """
+
+    def __init__(self, viewer_id: str, queue_size: int):
+        self.viewer_id = viewer_id
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def push(self, fragment: bytes) -> bool:
+        try:
+            self.queue.put_nowait(fragment)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def close(self) -> None:
+        """
+        Завершение отправки: очередь очищается, None сообщает отправителю о конце потока
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class LiveStream:
+    """
+    Общий процесс ffmpeg камеры, из stdout которого читаются фрагменты fMP4 для всех зрителей
+    """
+
+    def __init__(self, camera_id: int, stream_url: str, mode: str, profile: str):
+        self.camera_id = camera_id
+        self.stream_url = stream_url
+        self.mode = mode
+        self.profile = profile
+        self.resolved_mode = None
+        self.subscribers: set[LiveSubscriber] = set()
+        self.init_segment: bytes | None = None
+        self.mime_type = DEFAULT_MIME_TYPE
+        self.ready = asyncio.Event()
+        self.process: asyncio.subprocess.Process | None = None
+        self.task: asyncio.Task | None = None
+        self.fragments = 0
+        self.dropped = 0
+        self.started_at = time.time()
+        self.last_output = deque(maxlen=20)
+
+    def broadcast(self, fragment: bytes) -> None:
+        """
+        Рассылка фрагмента без ожидания: зритель с переполненной очередью отключается
+        """
+        self.fragments += 1
+        for subscriber in list(self.subscribers):
+            if subscriber.push(fragment):
+                continue
+            logger.warning(f"Зритель {subscriber.viewer_id} камеры {self.camera_id} не успевает получать поток и отключён")
+            self.subscribers.discard(subscriber)
+            subscriber.dropped = True
+            subscriber.close()
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "camera_id": self.camera_id,
+            "subscribers": len(self.subscribers),
+            "mode": self.resolved_mode or self.mode,
+            "profile": self.profile,
+            "mime_type": self.mime_type,
+            "ready": self.ready.is_set(),
+            "pid": self.process.pid if self.process else None,
+            "fragments": self.fragments,
+            "dropped": self.dropped,
+            "uptime": round(time.time() - self.started_at, 1),
+        }
+
+
+class LiveStreamHub:
+    """
+    Трансляции камер через WebSocket: один процесс ffmpeg на камеру, фрагменты рассылаются всем зрителям.
+    Процесс останавливается после ухода последнего зрителя, при его завершении зрители отключаются
+    """
+
+    def __init__(self, ffmpeg_path: str, max_streams: int, queue_size: int):
+        self.ffmpeg_path = ffmpeg_path
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self.streams: dict[int, LiveStream] = {}
+        self._lock = asyncio.Lock()
+
+    async def subscribe(
+        self,
+        camera_id: int,
+        viewer_id: str,
+        stream_url: str,
+        mode: str = TranscodeMode.TRANSCODE,
+        profile: str = DEFAULT_PROFILE,
+    ) -> tuple[LiveStream, LiveSubscriber]:
+        """
+        Подключение зрителя. Возвращается после получения инициализирующего сегмента
+        """
+        subscriber = LiveSubscriber(viewer_id, self.queue_size)
+        async with self._lock:
+            stream = self.streams.get(camera_id)
+            if stream is None:
+                if len(self.streams) >= self.max_streams:
+                    raise StreamLimitExceededException
+                stream = LiveStream(camera_id, stream_url, mode, profile)
+                self.streams[camera_id] = stream
+                stream.task = asyncio.create_task(self._run(stream))
+                logger.info(f"Начало WebSocket трансляции камеры {camera_id}")
+            stream.subscribers.add(subscriber)
+
+        try:
+            await asyncio.wait_for(stream.ready.wait(), timeout=settings.STREAM_READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"Превышено время ожидания инициализирующего сегмента камеры {camera_id}: {list(stream.last_output)}")
+            await self.unsubscribe(stream, subscriber)
+            raise StreamStartException
+
+        if subscriber.dropped or stream.init_segment is None:
+            await self.unsubscribe(stream, subscriber)
+            raise StreamStartException
+
+        return stream, subscriber
+
+    async def unsubscribe(self, stream: LiveStream, subscriber: LiveSubscriber) -> None:
+        """
+        Отключение зрителя. Процесс останавливается, когда не остаётся зрителей
+        """
+        async with self._lock:
+            stream.subscribers.discard(subscriber)
+            if stream.subscribers or self.streams.get(stream.camera_id) is not stream:
+                return
+            del self.streams[stream.camera_id]
+
+        logger.info(f"Остановка WebSocket трансляции камеры {stream.camera_id} (нет зрителей)")
+        await self._shutdown_stream(stream)
+
+    async def shutdown(self) -> None:
+        """
+        Остановка всех процессов (при остановке приложения)
+        """
+        async with self._lock:
+            streams = list(self.streams.values())
+            self.streams.clear()
+        await asyncio.gather(*(self._shutdown_stream(stream) for stream in streams), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "processes": len(self.streams),
+            "max_processes": self.max_streams,
+            "streams": [stream.stats() for stream in self.streams.values()],
+        }
+
+    async def _shutdown_stream(self, stream: LiveStream) -> None:
+        await self._terminate(stream.process)
+        if stream.task is not None and stream.task is not asyncio.current_task():
+            stream.task.cancel()
+            try:
+                await stream.task
+            except asyncio.CancelledError:
+                pass
+        for subscriber in list(stream.subscribers):
+            subscriber.close()
+
+    @staticmethod
+    async def _terminate(process: asyncio.subprocess.Process | None) -> None:
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=settings.STREAM_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def _run(self, stream: LiveStream) -> None:
+        """
+        Запуск ffmpeg и разбор stdout на инициализирующий сегмент (ftyp + moov) и фрагменты (moof + mdat)
+        """
+        try:
+            stream.resolved_mode = await resolve_transcode_mode(stream.mode, stream.stream_url)
+            stream.process = await asyncio.create_subprocess_exec(
+                self.ffmpeg_path,
+                *build_live_args(stream.stream_url, stream.resolved_mode, stream.profile),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            output_task = asyncio.create_task(self._watch_output(stream, stream.process))
+            try:
+                await self._read_fragments(stream, stream.process.stdout)
+            finally:
+                output_task.cancel()
+        except OSError as e:
+            logger.error(f"Ошибка при запуске ffmpeg для WebSocket трансляции камеры {stream.camera_id}: {e}")
+        except (asyncio.IncompleteReadError, ValueError) as e:
+            logger.warning(f"WebSocket трансляция камеры {stream.camera_id} завершилась: {e} {list(stream.last_output)[-3:]}")
+        except Exception as e:
+            logger.error(f"Ошибка WebSocket трансляции камеры {stream.camera_id}: {e}")
+        finally:
+            async with self._lock:
+                if self.streams.get(stream.camera_id) is stream:
+                    del self.streams[stream.camera_id]
+            await self._terminate(stream.process)
+            stream.ready.set()
+            for subscriber in list(stream.subscribers):
+                subscriber.close()
+
+    @staticmethod
+    async def _read_fragments(stream: LiveStream, reader: asyncio.StreamReader) -> None:
+        init_boxes = []
+        fragment_header = b""
+        while True:
+            box_type, box = await read_box(reader)
+            if box_type in INIT_BOXES and stream.init_segment is None:
+                init_boxes.append(box)
+                if box_type == b"moov":
+                    stream.init_segment = b"".join(init_boxes)
+                    stream.mime_type = mime_type(stream.init_segment)
+                    stream.ready.set()
+            elif box_type == b"moof":
+                fragment_header = box
+            elif box_type == b"mdat" and fragment_header:
+                stream.broadcast(fragment_header + box)
+                fragment_header = b""
+
+    @staticmethod
+    async def _watch_output(stream: LiveStream, process: asyncio.subprocess.Process) -> None:
+        buffer = b""
+        while chunk := await process.stderr.read(4096):
+            *lines, buffer = LINE_SEPARATOR.split(buffer + chunk)
+            stream.last_output.extend(line.decode(errors="replace") for line in lines if line)
+
+
+live_hub = LiveStreamHub(
+    settings.FFMPEG_PATH,
+    settings.LIVE_MAX_STREAMS,
+    settings.LIVE_QUEUE_SIZE,
+)
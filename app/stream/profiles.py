@@ -0,0 +1,71 @@
+import asyncio
+
+from app.config import settings
+from app.logger import logger
+from app.models import TranscodeMode
+
+
+TRANSCODE_PROFILES = {
+    "240p": {"size": "426x240", "bitrate": "300k"},
+    "360p": {"size": "640x360", "bitrate": "500k"},
+    "480p": {"size": "854x480", "bitrate": "1000k"},
+    "720p": {"size": "1280x720", "bitrate": "2500k"},
+    "1080p": {"size": "1920x1080", "bitrate": "5000k"},
+}
+
+DEFAULT_PROFILE = "360p"
+
+PASSTHROUGH_CODECS = ("h264",)
+
+
+def video_codec_args(mode: str, profile: str) -> list[str]:
+    """
+    Аргументы ffmpeg для видео: копирование потока без перекодирования или перекодирование по профилю
+    """
+    if mode == TranscodeMode.COPY:
+        return ["-c:v", "copy", "-c:a", "aac"]
+
+    ladder = TRANSCODE_PROFILES.get(profile, TRANSCODE_PROFILES[DEFAULT_PROFILE])
+    return ["-c:v", "libx264", "-preset", "ultrafast", "-b:v", ladder["bitrate"], "-s", ladder["size"]]
+
+
+async def probe_video_codec(stream_url: str) -> str | None:
+    """
+    Определение видеокодека потока через ffprobe. None - определить не удалось
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            settings.FFPROBE_PATH,
+            "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=codec_name", "-of", "csv=p=0",
+            stream_url,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except OSError as e:
+        logger.error(f"Ошибка при запуске ffprobe: {e}")
+        return None
+
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=settings.STREAM_PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+
+    codec = stdout.decode(errors="replace").strip().splitlines()
+    return codec[0] if codec else None
+
+
+async def resolve_transcode_mode(mode: str, stream_url: str) -> str:
+    """
+    Выбор режима для 'auto': копирование, если браузер может воспроизвести кодек камеры, иначе перекодирование
+    """
+    if mode != TranscodeMode.AUTO:
+        return mode
+
+    codec = await probe_video_codec(stream_url)
+    if codec in PASSTHROUGH_CODECS:
+        return TranscodeMode.COPY
+    return TranscodeMode.TRANSCODE
@@ -1,13 +1,23 @@
-import httpx
+import json, httpx, asyncio
+
+from typing import Optional
 
 from app.config import settings
+from app.logger import logger
+from app.models import HLSMode, StreamEventType
+from app.analytics.writer import stream_events
+from app.stream.client import GinClient
+from app.stream.acl import camera_acl
+from app.stream.supervisor import stream_supervisor
+from app.stream.live import live_hub
+from app.stream.url_encryption import decrypt_stream_url
 from app.users.schemas import User as UserSchema
 from app.authorization.dependencies import get_current_user, get_token
-from app.cameras.services import CameraService, UserCameraService
-from app.exceptions import CameraNotFoundException, UserCameraNotFoundException
+from app.cameras.services import CameraService
+from app.exceptions import ProjectException, TokenAbsentException, CameraNotFoundException, UserCameraNotFoundException
 
 from fastapi.templating import Jinja2Templates
-from fastapi import APIRouter, Depends, status, HTTPException, Request
+from fastapi import APIRouter, Depends, status, HTTPException, Request, WebSocket
 
 
 router = APIRouter(
@@ -16,54 +26,137 @@ router = APIRouter(
 )
 
 templates = Jinja2Templates(directory="./app/templates")
-GIN_HOST = settings.GIN_HOST
 
 
 @router.get("/start/{camera_id}", status_code=status.HTTP_200_OK)
-async def stream_camera(request: Request, camera_id: int, current_user: UserSchema = Depends(get_current_user), token: str = Depends(get_token)):
+async def stream_camera(
+    request: Request,
+    camera_id: int,
+    low_latency: Optional[bool] = None,
+    current_user: UserSchema = Depends(get_current_user),
+    token: str = Depends(get_token),
+):
     """
-    Потоковое воспроизведение камеры, к которой у пользователя есть доступ
+    Потоковое воспроизведение камеры, к которой у пользователя есть доступ.
+    low_latency переопределяет режим HLS камеры (LL-HLS с сегментами fMP4) для этого запроса
     """
-    user_camera = await UserCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id)
-    if not user_camera:
+    if not await camera_acl.has_access(current_user.id, camera_id):
         raise UserCameraNotFoundException
 
     camera = await CameraService.find_one_or_none(id=camera_id)
     if not camera:
         raise CameraNotFoundException
-    print(f"Отправляемый токен: Bearer {token}")
+
+    hls_mode = camera.hls_mode
+    if low_latency is not None:
+        hls_mode = HLSMode.LOW_LATENCY if low_latency else HLSMode.STANDARD
+
+    if settings.STREAM_BACKEND == "native":
+        stream = await stream_supervisor.start(
+            camera_id,
+            str(current_user.id),
+            decrypt_stream_url(camera.stream_url),
+            camera.transcode_mode,
+            camera.transcode_profile,
+            hls_mode,
+        )
+        stream_events.emit(camera_id, current_user.id, StreamEventType.START)
+        context = {"request": request, "low_latency": stream.hls_mode == HLSMode.LOW_LATENCY}
+        return templates.TemplateResponse("index.html", context)
+
+    logger.debug(f"Запуск потока камеры {camera_id} через Gin")
 
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as client:
-            response = await client.post(
-                f"{GIN_HOST}/start/{camera_id}",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            response.raise_for_status()
+        await GinClient.post(f"/start/{camera_id}", token)
     except httpx.HTTPStatusError as e:
         print(HTTPException(status_code=e.response.status_code, detail="Не удалось запустить поток"))
+    else:
+        stream_events.emit(camera_id, current_user.id, StreamEventType.START)
 
     return templates.TemplateResponse("index.html", {"request": request})
 
 
 @router.get("/stop/{camera_id}", status_code=status.HTTP_200_OK)
 async def stream_camera_stop(request: Request, camera_id: int, current_user: UserSchema = Depends(get_current_user), token: str = Depends(get_token)):
-    user_camera = await UserCameraService.find_one_or_none(user_id=current_user.id, camera_id=camera_id)
-    if not user_camera:
+    if not await camera_acl.has_access(current_user.id, camera_id):
         raise UserCameraNotFoundException
 
     camera = await CameraService.find_one_or_none(id=camera_id)
     if not camera:
         raise CameraNotFoundException
 
+    if settings.STREAM_BACKEND == "native":
+        await stream_supervisor.stop(camera_id, str(current_user.id))
+        stream_events.emit(camera_id, current_user.id, StreamEventType.STOP)
+        return templates.TemplateResponse("index.html", {"request": request})
+
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as client:
-            response = await client.post(
-                f"{GIN_HOST}/stop/{camera_id}",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            response.raise_for_status()
+        await GinClient.post(f"/stop/{camera_id}", token)
     except httpx.HTTPStatusError as e:
         print(HTTPException(status_code=e.response.status_code, detail="Не удалось остановить поток"))
+    else:
+        stream_events.emit(camera_id, current_user.id, StreamEventType.STOP)
 
     return templates.TemplateResponse("index.html", {"request": request})
+
+
+@router.websocket("/ws/{camera_id}")
+async def stream_camera_websocket(websocket: WebSocket, camera_id: int):
+    """
+    Трансляция камеры через WebSocket для MediaSource Extensions.
+    Первое сообщение - JSON с MIME типом потока, второе - инициализирующий сегмент,
+    далее бинарные фрагменты fMP4. Один процесс ffmpeg на камеру для всех зрителей,
+    зритель, не успевающий получать фрагменты, отключается с кодом 1013
+    """
+    try:
+        token = websocket.cookies.get("access_token") or websocket.headers.get("authorization")
+        if not token:
+            raise TokenAbsentException
+        current_user = await get_current_user(token)
+        if not await camera_acl.has_access(current_user.id, camera_id):
+            raise UserCameraNotFoundException
+        camera = await CameraService.find_one_or_none(id=camera_id)
+        if not camera:
+            raise CameraNotFoundException
+    except ProjectException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        stream, subscriber = await live_hub.subscribe(
+            camera_id,
+            str(current_user.id),
+            decrypt_stream_url(camera.stream_url),
+            camera.transcode_mode,
+            camera.transcode_profile,
+        )
+    except ProjectException as e:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=e.detail)
+        return
+
+    async def send_fragments():
+        await websocket.send_text(json.dumps({"mime": stream.mime_type}))
+        await websocket.send_bytes(stream.init_segment)
+        while (fragment := await subscriber.queue.get()) is not None:
+            await websocket.send_bytes(fragment)
+
+    async def wait_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender = asyncio.create_task(send_fragments())
+    receiver = asyncio.create_task(wait_disconnect())
+    try:
+        done, pending = await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if receiver in done:
+            return
+        try:
+            sender.result()
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except Exception:
+            pass
+    finally:
+        await live_hub.unsubscribe(stream, subscriber)
@@ -0,0 +1,430 @@
+import os, re, time, shutil, asyncio
+
+from collections import OrderedDict, deque
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.logger import logger
+from app.models import Camera, TranscodeMode, HLSMode
+from app.stream.hls import hls_cache
+from app.stream.profiles import DEFAULT_PROFILE, video_codec_args, resolve_transcode_mode
+from app.stream.url_encryption import decrypt_stream_url
+from app.cameras.services import CameraService, UserFavoriteCameraService
+from app.exceptions import StreamLimitExceededException, StreamStartException
+
+
+LINE_SEPARATOR = re.compile(rb"[\r\n]+")
+
+PLAYLIST_NAME = "index.m3u8"
+
+
+def build_ffmpeg_args(
+    stream_url: str,
+    playlist_path: str,
+    mode: str = TranscodeMode.TRANSCODE,
+    profile: str = DEFAULT_PROFILE,
+    hls_mode: str = HLSMode.STANDARD,
+    segment_prefix: str = "",
+) -> list[str]:
+    """
+    Аргументы ffmpeg для перекодирования (или копирования) RTSP потока в HLS.
+    В режиме низкой задержки - короткие сегменты fMP4 (CMAF) с принудительными ключевыми кадрами.
+    segment_prefix делает имена сегментов уникальными для каждого запуска процесса,
+    чтобы после перезапуска клиенты и прокси не получили закэшированные сегменты прошлого запуска
+    """
+    directory = os.path.dirname(playlist_path)
+    if hls_mode != HLSMode.LOW_LATENCY:
+        return [
+            "-hide_banner",
+            "-i", stream_url,
+            *video_codec_args(mode, profile),
+            "-f", "hls", "-hls_time", "2", "-hls_list_size", "10", "-hls_flags", "delete_segments",
+            "-hls_segment_filename", os.path.join(directory, f"{segment_prefix}index%d.ts"),
+            playlist_path,
+        ]
+
+    keyframe_args = []
+    if mode != TranscodeMode.COPY:
+        keyframe_args = ["-tune", "zerolatency", "-force_key_frames", f"expr:gte(t,n_forced*{settings.LL_HLS_SEGMENT_TIME})"]
+
+    return [
+        "-hide_banner",
+        "-fflags", "nobuffer",
+        "-i", stream_url,
+        *video_codec_args(mode, profile),
+        *keyframe_args,
+        "-f", "hls",
+        "-hls_time", str(settings.LL_HLS_SEGMENT_TIME),
+        "-hls_list_size", str(settings.LL_HLS_LIST_SIZE),
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", f"{segment_prefix}init.mp4",
+        "-hls_segment_filename", os.path.join(directory, f"{segment_prefix}index%d.m4s"),
+        "-hls_flags", "delete_segments+independent_segments+program_date_time+temp_file",
+        playlist_path,
+    ]
+
+
+class ManagedStream:
+    """
+    Процесс ffmpeg одной камеры и её зрители
+    """
+
+    def __init__(self, camera_id: int, stream_url: str, directory: str, mode: str, profile: str, hls_mode: str):
+        self.camera_id = camera_id
+        self.stream_url = stream_url
+        self.mode = mode
+        self.profile = profile
+        self.hls_mode = hls_mode
+        self.resolved_mode = None
+        self.directory = directory
+        self.playlist_path = os.path.join(directory, PLAYLIST_NAME)
+        self.viewers: set[str] = set()
+        self.pinned = False
+        self.idle_since = None
+        self.idle_task: asyncio.Task | None = None
+        self.process: asyncio.subprocess.Process | None = None
+        self.ready = asyncio.Event()
+        self.stopping = False
+        self.failed = False
+        self.restarts = 0
+        self.started_at = time.time()
+        self.last_output = deque(maxlen=20)
+        self.task: asyncio.Task | None = None
+
+    def stats(self) -> dict:
+        return {
+            "camera_id": self.camera_id,
+            "viewers": len(self.viewers),
+            "pinned": self.pinned,
+            "mode": self.resolved_mode or self.mode,
+            "profile": self.profile,
+            "hls_mode": self.hls_mode,
+            "idle": self.idle_since is not None,
+            "ready": self.ready.is_set(),
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "uptime": round(time.time() - self.started_at, 1),
+        }
+
+
+class StreamSupervisor:
+    """
+    Управление процессами ffmpeg внутри приложения: общий процесс на камеру с подсчётом зрителей,
+    готовность по выводу ffmpeg, ограничение числа процессов и перезапуск с экспоненциальной задержкой.
+    После ухода последнего зрителя процесс живёт ещё STREAM_IDLE_GRACE_SECONDS,
+    закреплённые (прогретые) камеры не останавливаются совсем
+    """
+
+    def __init__(self, streams_dir: str, ffmpeg_path: str, max_processes: int, max_per_user: int):
+        self.streams_dir = streams_dir
+        self.ffmpeg_path = ffmpeg_path
+        self.max_processes = max_processes
+        self.max_per_user = max_per_user
+        self.streams: dict[int, ManagedStream] = {}
+        self.user_history: dict[str, OrderedDict[int, float]] = {}
+        self._lock = asyncio.Lock()
+
+    async def start(
+        self,
+        camera_id: int,
+        viewer_id: str,
+        stream_url: str,
+        mode: str = TranscodeMode.TRANSCODE,
+        profile: str = DEFAULT_PROFILE,
+        hls_mode: str = HLSMode.STANDARD,
+    ) -> ManagedStream:
+        """
+        Подключение зрителя к потоку камеры. Процесс запускается при первом зрителе
+        (режим HLS задаёт первый зритель, остальные подключаются к уже запущенному процессу),
+        у пользователя, превысившего лимит потоков, закрывается самый старый поток
+        """
+        history = self.user_history.get(viewer_id, OrderedDict())
+        if camera_id not in history and len(history) >= self.max_per_user:
+            oldest_camera_id = next(iter(history))
+            logger.info(f"Закрытие самого старого потока камеры {oldest_camera_id} для пользователя {viewer_id}")
+            await self.stop(oldest_camera_id, viewer_id)
+
+        async with self._lock:
+            stream, evicted = self._get_or_create(camera_id, stream_url, mode, profile, hls_mode)
+            stream.viewers.add(viewer_id)
+            self._cancel_idle(stream)
+            self.user_history.setdefault(viewer_id, OrderedDict())[camera_id] = time.time()
+
+        if evicted is not None:
+            await self._shutdown_stream(evicted)
+
+        try:
+            await asyncio.wait_for(stream.ready.wait(), timeout=settings.STREAM_READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"Превышено время ожидания плейлиста камеры {camera_id}: {list(stream.last_output)}")
+            await self.stop(camera_id, viewer_id)
+            raise StreamStartException
+
+        if stream.failed:
+            raise StreamStartException
+        return stream
+
+    async def stop(self, camera_id: int, viewer_id: str) -> None:
+        """
+        Отключение зрителя. Процесс останавливается, когда не остаётся зрителей
+        """
+        async with self._lock:
+            history = self.user_history.get(viewer_id)
+            if history is not None:
+                history.pop(camera_id, None)
+                if not history:
+                    del self.user_history[viewer_id]
+
+            stream = self.streams.get(camera_id)
+            if stream is None or viewer_id not in stream.viewers:
+                return
+
+            stream.viewers.discard(viewer_id)
+            if stream.viewers:
+                logger.info(f"Количество зрителей камеры {camera_id} уменьшено до {len(stream.viewers)}")
+                return
+
+            if stream.pinned:
+                return
+
+            if settings.STREAM_IDLE_GRACE_SECONDS > 0:
+                stream.idle_since = time.monotonic()
+                stream.idle_task = asyncio.create_task(self._expire_idle(stream))
+                return
+
+            del self.streams[camera_id]
+
+        logger.info(f"Остановка трансляции RTSP потока камеры {camera_id} (нет зрителей)")
+        await self._shutdown_stream(stream)
+
+    async def pin(
+        self,
+        camera_id: int,
+        stream_url: str,
+        mode: str = TranscodeMode.TRANSCODE,
+        profile: str = DEFAULT_PROFILE,
+        hls_mode: str = HLSMode.STANDARD,
+    ) -> None:
+        """
+        Закрепление камеры: процесс запускается заранее и не останавливается без зрителей
+        """
+        async with self._lock:
+            stream, evicted = self._get_or_create(camera_id, stream_url, mode, profile, hls_mode)
+            stream.pinned = True
+            self._cancel_idle(stream)
+
+        if evicted is not None:
+            await self._shutdown_stream(evicted)
+
+    def _get_or_create(self, camera_id: int, stream_url: str, mode: str, profile: str, hls_mode: str) -> tuple[ManagedStream, ManagedStream | None]:
+        """
+        Поиск процесса камеры или запуск нового. При достижении лимита процессов
+        освобождается место, занятое самым давно простаивающим процессом (вызывается под блокировкой)
+        """
+        stream = self.streams.get(camera_id)
+        if stream is not None:
+            return stream, None
+
+        evicted = None
+        if len(self.streams) >= self.max_processes:
+            idle = [item for item in self.streams.values() if item.idle_since is not None and not item.pinned]
+            if not idle:
+                raise StreamLimitExceededException
+            evicted = min(idle, key=lambda item: item.idle_since)
+            self._cancel_idle(evicted)
+            del self.streams[evicted.camera_id]
+
+        stream = ManagedStream(camera_id, stream_url, os.path.join(self.streams_dir, f"camera_{camera_id}"), mode, profile, hls_mode)
+        self.streams[camera_id] = stream
+        if hls_mode == HLSMode.LOW_LATENCY:
+            hls_cache.add_low_latency_directory(stream.directory)
+        stream.task = asyncio.create_task(self._supervise(stream))
+        logger.info(f"Начало трансляции RTSP потока камеры {camera_id}")
+        return stream, evicted
+
+    @staticmethod
+    def _cancel_idle(stream: ManagedStream) -> None:
+        stream.idle_since = None
+        if stream.idle_task is not None:
+            stream.idle_task.cancel()
+            stream.idle_task = None
+
+    async def _expire_idle(self, stream: ManagedStream) -> None:
+        """
+        Остановка процесса после периода простоя, если зрители так и не вернулись
+        """
+        await asyncio.sleep(settings.STREAM_IDLE_GRACE_SECONDS)
+        async with self._lock:
+            if stream.viewers or stream.pinned or self.streams.get(stream.camera_id) is not stream:
+                return
+            stream.idle_task = None
+            del self.streams[stream.camera_id]
+
+        logger.info(f"Остановка трансляции RTSP потока камеры {stream.camera_id} (нет зрителей)")
+        await self._shutdown_stream(stream)
+
+    async def shutdown(self) -> None:
+        """
+        Остановка всех процессов (при остановке приложения)
+        """
+        async with self._lock:
+            streams = list(self.streams.values())
+            self.streams.clear()
+            self.user_history.clear()
+        await asyncio.gather(*(self._shutdown_stream(stream) for stream in streams), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "processes": len(self.streams),
+            "max_processes": self.max_processes,
+            "streams": [stream.stats() for stream in self.streams.values()],
+        }
+
+    async def _shutdown_stream(self, stream: ManagedStream) -> None:
+        stream.stopping = True
+        self._cancel_idle(stream)
+        await self._terminate(stream.process)
+        if stream.task is not None:
+            stream.task.cancel()
+            try:
+                await stream.task
+            except asyncio.CancelledError:
+                pass
+        await self._remove_files(stream)
+
+    @staticmethod
+    async def _remove_files(stream: ManagedStream) -> None:
+        await run_in_threadpool(shutil.rmtree, stream.directory, True)
+        hls_cache.remove_low_latency_directory(stream.directory)
+
+    @staticmethod
+    async def _terminate(process: asyncio.subprocess.Process | None) -> None:
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=settings.STREAM_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def _supervise(self, stream: ManagedStream) -> None:
+        """
+        Запуск процесса и перезапуск при аварийном завершении с экспоненциальной задержкой.
+        Любая другая ошибка (ffprobe, аргументы ffmpeg) снимает поток с учёта: ожидающие зрители
+        получают ошибку сразу, а не по STREAM_READY_TIMEOUT, и процесс не занимает место в лимите
+        """
+        try:
+            backoff = settings.STREAM_RESTART_BACKOFF_INITIAL
+            while not stream.stopping:
+                started = time.monotonic()
+                try:
+                    await self._run_process(stream)
+                except OSError as e:
+                    logger.error(f"Ошибка при запуске ffmpeg для камеры {stream.camera_id}: {e}")
+
+                if stream.stopping:
+                    break
+
+                stream.ready.clear()
+                stream.restarts += 1
+                if time.monotonic() - started > settings.STREAM_RESTART_BACKOFF_MAX:
+                    backoff = settings.STREAM_RESTART_BACKOFF_INITIAL
+                logger.warning(f"Процесс ffmpeg камеры {stream.camera_id} завершился, перезапуск через {backoff} с: {list(stream.last_output)[-3:]}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, settings.STREAM_RESTART_BACKOFF_MAX)
+        except Exception as e:
+            logger.error(f"Ошибка трансляции камеры {stream.camera_id}, поток остановлен: {e}")
+            await self._fail_stream(stream)
+
+    async def _fail_stream(self, stream: ManagedStream) -> None:
+        """
+        Снятие с учёта потока, задача которого завершилась ошибкой (вызывается из самой задачи)
+        """
+        stream.stopping = True
+        stream.failed = True
+        async with self._lock:
+            if self.streams.get(stream.camera_id) is stream:
+                del self.streams[stream.camera_id]
+            for viewer_id in stream.viewers:
+                history = self.user_history.get(viewer_id)
+                if history is not None:
+                    history.pop(stream.camera_id, None)
+                    if not history:
+                        del self.user_history[viewer_id]
+            self._cancel_idle(stream)
+        stream.ready.set()
+        await self._terminate(stream.process)
+        await self._remove_files(stream)
+
+    async def _run_process(self, stream: ManagedStream) -> None:
+        # Сегменты прошлого запуска (с другим префиксом) ffmpeg уже не удалит сам
+        await run_in_threadpool(shutil.rmtree, stream.directory, True)
+        await run_in_threadpool(os.makedirs, stream.directory, exist_ok=True)
+        if stream.resolved_mode is None:
+            stream.resolved_mode = await resolve_transcode_mode(stream.mode, stream.stream_url)
+            logger.info(f"Режим трансляции камеры {stream.camera_id}: {stream.resolved_mode}")
+        segment_prefix = f"{time.time_ns():x}_"
+        stream.process = await asyncio.create_subprocess_exec(
+            self.ffmpeg_path,
+            *build_ffmpeg_args(stream.stream_url, stream.playlist_path, stream.resolved_mode, stream.profile, stream.hls_mode, segment_prefix),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        await self._watch_output(stream, stream.process)
+        await stream.process.wait()
+
+    @staticmethod
+    async def _watch_output(stream: ManagedStream, process: asyncio.subprocess.Process) -> None:
+        """
+        Чтение вывода ffmpeg: поток готов, когда ffmpeg сообщил о записи плейлиста и файл появился на диске
+        """
+        buffer = b""
+        playlist_opened = False
+        while chunk := await process.stderr.read(4096):
+            *lines, buffer = LINE_SEPARATOR.split(buffer + chunk)
+            for line in lines:
+                if not line:
+                    continue
+                stream.last_output.append(line.decode(errors="replace"))
+                if PLAYLIST_NAME.encode() in line:
+                    playlist_opened = True
+            if playlist_opened and not stream.ready.is_set() and os.path.exists(stream.playlist_path):
+                stream.ready.set()
+
+
+stream_supervisor = StreamSupervisor(
+    settings.STREAMS_DIR,
+    settings.FFMPEG_PATH,
+    settings.STREAM_MAX_PROCESSES,
+    settings.STREAM_MAX_PER_USER,
+)
+
+
+async def prewarm_streams() -> None:
+    """
+    Запуск закреплённых камер (STREAM_PINNED_CAMERAS) и самых популярных
+    по избранному (STREAM_PREWARM_TOP_FAVORITES) при старте приложения
+    """
+    if settings.STREAM_BACKEND != "native":
+        return
+
+    camera_ids = [int(camera_id) for camera_id in settings.STREAM_PINNED_CAMERAS.split(",") if camera_id.strip()]
+    if settings.STREAM_PREWARM_TOP_FAVORITES > 0:
+        camera_ids += await UserFavoriteCameraService.find_most_popular_camera_ids(settings.STREAM_PREWARM_TOP_FAVORITES)
+
+    camera_ids = list(dict.fromkeys(camera_ids))[:stream_supervisor.max_processes]
+    if not camera_ids:
+        return
+
+    cameras = await CameraService.select_all_filter(Camera.id.in_(camera_ids))
+    for camera in cameras:
+        await stream_supervisor.pin(
+            camera.id,
+            decrypt_stream_url(camera.stream_url),
+            camera.transcode_mode,
+            camera.transcode_profile,
+            camera.hls_mode,
+        )
+        logger.info(f"Камера {camera.id} закреплена и запущена заранее")
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 from app.users.schemas import User, UserPublic
@@ -10,3 +10,5 @@ class UserResponse(BaseModel):
 
 class UsersResponse(BaseModel):
     users: List[User]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
@@ -1,8 +1,12 @@
 from uuid import UUID
 from datetime import datetime
 from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database import get_session
+from app.pagination import Pagination
 from app.users.services import UserService
+from app.stream.acl import camera_acl, acl_changed
 from app.users.schemas import UserUpdate, User as UserSchema
 from app.users.responses import UserResponse, UsersResponse
 from app.authorization.dependencies import get_current_user, check_is_current_user_root
@@ -27,12 +31,12 @@ async def get_user(current_user: UserSchema = Depends(get_current_user)):
 
 
 @router.get("/all", response_model=UsersResponse, status_code=status.HTTP_200_OK)
-async def get_users_all(current_user: UserSchema = Depends(check_is_current_user_root)):
+async def get_users_all(pagination: Pagination = Depends(), current_user: UserSchema = Depends(check_is_current_user_root)):
     """
-    Получение информации обо всех пользователях
+    Получение информации обо всех пользователях (постранично, без загрузки хэшей паролей)
     """
-    users = await UserService.find_all()
-    return {"users": users}
+    page = await UserService.find_page(columns=list(UserSchema.__fields__), **pagination.as_dict())
+    return {"users": page["items"], "next_cursor": page["next_cursor"], "total": page["total"]}
 
 
 @router.get("/{user_id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
@@ -48,11 +52,11 @@ async def get_user_by_id(user_id: UUID, current_user: UserSchema = Depends(check
 
 
 @router.patch("/{user_id}", response_model=dict, status_code=status.HTTP_200_OK)
-async def edit_user(user_id: UUID, user_data: UserUpdate, current_user: UserSchema = Depends(check_is_current_user_root)):
+async def edit_user(user_id: UUID, user_data: UserUpdate, current_user: UserSchema = Depends(check_is_current_user_root), session: AsyncSession = Depends(get_session)):
     """
     Редактирование пользователя
     """
-    user = await UserService.find_one_or_none(id=user_id)
+    user = await UserService.find_one_or_none(id=user_id, session=session)
     if not user:
         raise UserNotFoundException
     
@@ -74,20 +78,26 @@ async def edit_user(user_id: UUID, user_data: UserUpdate, current_user: UserSche
 
     update_data['updated_at'] = datetime.utcnow()
 
-    updated_user = await UserService.update(id=user_id, **update_data)
+    updated_user = await UserService.update(id=user_id, session=session, **update_data)
+    await session.commit()
+    await UserService.invalidate_cache(user_id)
 
     return {"success": True}
 
 
 @router.delete("/{user_id}", response_model=dict, status_code=status.HTTP_200_OK)
-async def delete_user(user_id: UUID, current_user: UserSchema = Depends(check_is_current_user_root)):
+async def delete_user(user_id: UUID, current_user: UserSchema = Depends(check_is_current_user_root), session: AsyncSession = Depends(get_session)):
     """
     Удаление пользователя
     """
-    user = await UserService.find_one_or_none(id=user_id)
+    user = await UserService.find_one_or_none(id=user_id, session=session)
     if not user:
         raise UserNotFoundException
     
-    await UserService.delete(id=user_id)
+    await UserService.delete(id=user_id, session=session)
+    await session.commit()
+    await UserService.invalidate_cache(user_id)
+    camera_acl.drop_user(user_id)
+    await acl_changed(user_id)
 
     return {"success": True}
@@ -1,9 +1,42 @@
 from sqlalchemy import select, insert, update
 
 from app.models import User
+from app.config import settings
 from app.services import BaseRequests
+from app.cache import TTLCache, CacheInvalidationChannel
+
+
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL)
+
+
+def _drop_cached_user(user_id: str) -> None:
+    user_cache.pop(user_id)
+
+
+user_cache_channel = (
+    CacheInvalidationChannel(settings.USER_CACHE_INVALIDATION_CHANNEL, _drop_cached_user)
+    if settings.USER_CACHE_INVALIDATION_CHANNEL else None
+)
 
 
 class UserService(BaseRequests):
     model = User
-    
\ No newline at end of file
+
+    @classmethod
+    async def find_by_id_cached(cls, user_id):
+        """Поиск пользователя по id через кэш. Возвращает один объект или None"""
+        key = str(user_id)
+        user = user_cache.get(key)
+        if user is None:
+            user = await cls.find_by_id(user_id)
+            if user is not None:
+                user_cache.set(key, user)
+        return user
+
+    @classmethod
+    async def invalidate_cache(cls, user_id):
+        """Сброс пользователя из кэша (во всех воркерах, если настроен канал)"""
+        key = str(user_id)
+        _drop_cached_user(key)
+        if user_cache_channel is not None:
+            await user_cache_channel.publish(key)
@@ -0,0 +1,34 @@
+from datetime import datetime
+from sqlalchemy import delete, func, select
+
+from app.database import async_session_maker
+from app.models import RollupGranularity, StreamUsageRollup
+from app.analytics.services import ROLLUP_CHUNK_SIZE, StreamEventService
+from tests.helpers import run
+
+
+def test_rollups_above_parameter_limit_are_written_in_chunks(migrated_database):
+    bucket = datetime(2000, 1, 1)
+    # Три перенесённые минуты по 2000 камер: 6000 строк по 6 параметров - больше лимита asyncpg в одном INSERT
+    rollups = [
+        {"granularity": RollupGranularity.MINUTE, "bucket": bucket.replace(minute=minute), "camera_id": camera_id, "starts": 0, "stops": 0, "peak_viewers": 1}
+        for minute in range(3)
+        for camera_id in range(1, 2001)
+    ]
+    assert len(rollups) > ROLLUP_CHUNK_SIZE
+
+    async def scenario():
+        async with async_session_maker() as session:
+            await session.execute(delete(StreamUsageRollup).where(StreamUsageRollup.bucket < datetime(2000, 1, 2)))
+            await session.commit()
+
+        await StreamEventService.write_batch([], rollups)
+        await StreamEventService.write_batch([], rollups)
+
+        async with async_session_maker() as session:
+            query = select(func.count(), func.max(StreamUsageRollup.peak_viewers)).where(StreamUsageRollup.bucket < datetime(2000, 1, 2))
+            return (await session.execute(query)).one()
+
+    count, peak_viewers = run(scenario())
+    assert count == len(rollups)
+    assert peak_viewers == 1
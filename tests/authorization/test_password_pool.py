@@ -0,0 +1,126 @@
+import time, asyncio, httpx
+
+from uuid import uuid4
+from threading import Lock
+from types import SimpleNamespace
+from fastapi import FastAPI
+from passlib.hash import bcrypt
+
+from app.authorization import authorization
+from app.authorization.router import router
+from app.authorization.authorization import PasswordWorkerPool
+from app.users.services import UserService
+from tests.helpers import run
+
+
+PASSWORD = "storm-password"
+
+LOGINS = 200
+
+WORKERS = 2
+
+LOGIN_CONCURRENCY = 4
+
+HEARTBEAT_INTERVAL = 0.005
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+class ConcurrencyProbe:
+    """
+    Обёртка функции, считающая наибольшее число одновременных вызовов в потоках пула
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.active = 0
+        self.max_active = 0
+        self._lock = Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            return self.func(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+async def heartbeat_lags(until, pool: PasswordWorkerPool | None = None, samples: list | None = None) -> list[float]:
+    """
+    Опоздание пробуждений event loop относительно HEARTBEAT_INTERVAL, пока until() истинно.
+    Если передан пул, в samples сохраняется его состояние на каждом шаге
+    """
+    lags = []
+    while until():
+        started = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(time.perf_counter() - started - HEARTBEAT_INTERVAL)
+        if pool is not None:
+            samples.append(pool.stats())
+    return sorted(lags)
+
+
+def median(values: list[float]) -> float:
+    return values[len(values) // 2]
+
+
+def test_login_storm_does_not_block_event_loop_and_is_bounded(monkeypatch):
+    # Меньше раундов bcrypt, чтобы тест шёл секунды, но каждая проверка всё ещё заметно дольше шага heartbeat
+    hashed = bcrypt.using(rounds=8).hash(PASSWORD)
+    user = SimpleNamespace(id=uuid4(), password=hashed)
+
+    async def find_one_or_none(**filter_by):
+        return user
+
+    monkeypatch.setattr(UserService, "find_one_or_none", find_one_or_none)
+    verify = ConcurrencyProbe(authorization.verify_password)
+    monkeypatch.setattr(authorization, "verify_password", verify)
+
+    started = time.perf_counter()
+    verify.func(PASSWORD, hashed)
+    hash_seconds = time.perf_counter() - started
+
+    async def scenario():
+        pool = PasswordWorkerPool(workers=WORKERS, login_concurrency=LOGIN_CONCURRENCY)
+        monkeypatch.setattr(authorization, "password_pool", pool)
+        transport = httpx.ASGITransport(app=make_app())
+        try:
+            # Базовая линия: опоздание пробуждений event loop без нагрузки
+            deadline = time.perf_counter() + 0.5
+            baseline = await heartbeat_lags(lambda: time.perf_counter() < deadline)
+
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                async def login():
+                    return await client.post("/authorization/login", json={"email": "storm@example.com", "password": PASSWORD})
+
+                samples = []
+                storm = asyncio.ensure_future(asyncio.gather(*(login() for _ in range(LOGINS))))
+                lags = await heartbeat_lags(lambda: not storm.done(), pool, samples)
+                return await storm, baseline, lags, samples, pool.stats()
+        finally:
+            pool.shutdown()
+
+    responses, baseline, lags, samples, stats = run(scenario())
+
+    assert all(response.status_code == 200 for response in responses)
+    assert stats["completed"] == LOGINS
+    assert stats["queued"] == stats["running"] == stats["login_waiting"] == 0
+
+    # Одновременно выполняется не больше WORKERS проверок, в пуле (очередь и выполнение) - не больше LOGIN_CONCURRENCY входов
+    assert verify.max_active == WORKERS
+    assert all(sample["running"] <= WORKERS for sample in samples)
+    assert max(sample["queued"] + sample["running"] for sample in samples) <= LOGIN_CONCURRENCY
+    assert max(sample["login_waiting"] for sample in samples) > 0
+
+    # Шторм длится много шагов heartbeat. Если бы bcrypt выполнялся в event loop, типичное опоздание
+    # было бы порядка одной проверки пароля, а не базовой линии
+    print(f"\nпроверка пароля {hash_seconds * 1000:.1f} мс, опоздание event loop: без нагрузки {median(baseline) * 1000:.2f} мс, при шторме {median(lags) * 1000:.2f} мс")
+    assert len(lags) >= 20
+    assert median(lags) < median(baseline) + hash_seconds / 2
@@ -0,0 +1,41 @@
+import time
+
+from uuid import uuid4
+
+from app.authorization import authorization
+from app.authorization.authorization import JWT_BACKENDS, create_access_token, decode_access_token
+
+
+CALLS = 5000
+
+# Частота опроса плейлистов, для которой считается сэкономленное процессорное время
+REQUESTS_PER_SECOND = 5000
+
+
+def cpu_per_call(func, token: str) -> float:
+    """
+    Процессорное время одного вызова в секундах (среднее по CALLS вызовам)
+    """
+    started = time.process_time()
+    for _ in range(CALLS):
+        func(token)
+    return (time.process_time() - started) / CALLS
+
+
+def test_cached_decode_saves_cpu_per_request():
+    token = create_access_token({"sub": str(uuid4())})
+
+    backends = {name: factory()[0] for name, factory in JWT_BACKENDS.items()}
+    uncached = {name: cpu_per_call(decode, token) for name, decode in backends.items()}
+
+    hits = authorization.claims_cache.hits
+    assert decode_access_token(token) == backends["jose"](token)
+    cached = cpu_per_call(decode_access_token, token)
+    assert authorization.claims_cache.hits - hits == CALLS
+
+    print()
+    for name, seconds in {**{f"без кэша ({name})": value for name, value in uncached.items()}, "кэш": cached}.items():
+        # Доля одного ядра, которую займёт проверка токенов при REQUESTS_PER_SECOND запросах
+        print(f"{name}: {seconds * 1e6:.1f} мкс на запрос, {seconds * REQUESTS_PER_SECOND * 100:.1f}% ядра при {REQUESTS_PER_SECOND} запр/с")
+
+    assert cached < min(uncached.values())
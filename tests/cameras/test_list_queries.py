@@ -0,0 +1,59 @@
+import time, pytest
+
+from app.cameras.services import CameraService, UserCameraService, UserFavoriteCameraService
+from tests.helpers import run, QueryCounter, create_user, create_cameras, delete_test_data
+
+
+CAMERA_COUNTS = (10, 100, 1000)
+
+
+async def list_with_n_plus_one(link_service, user_id) -> list:
+    """
+    Прежний способ: связи пользователя, затем отдельный запрос (и сессия) на каждую камеру
+    """
+    links = await link_service.find_all(user_id=user_id)
+    return [await CameraService.find_by_id(link.camera_id) for link in links]
+
+
+async def measure(coroutine_factory) -> tuple[int, int, float]:
+    with QueryCounter() as counter:
+        started = time.perf_counter()
+        result = await coroutine_factory()
+        elapsed = time.perf_counter() - started
+    items = result["items"] if isinstance(result, dict) else result
+    return len(items), counter.count, elapsed
+
+
+@pytest.mark.parametrize("favorites", [False, True], ids=["user", "favorite"])
+def test_camera_list_query_count_does_not_grow_with_cameras(migrated_database, favorites):
+    link_service = UserFavoriteCameraService if favorites else UserCameraService
+    find_page = CameraService.find_page_favorites_by_user if favorites else CameraService.find_page_by_user
+
+    async def scenario():
+        results = {}
+        for count in CAMERA_COUNTS:
+            user = await create_user()
+            camera_ids = await create_cameras(count, user.id, favorite=True)
+            try:
+                # Прогрев пула соединений, чтобы первое подключение не попало в замер
+                await find_page(user.id, limit=1)
+                results[count] = (
+                    await measure(lambda: list_with_n_plus_one(link_service, user.id)),
+                    await measure(lambda: find_page(user.id, limit=count, with_total=True)),
+                )
+            finally:
+                await delete_test_data([user.id], camera_ids)
+        return results
+
+    results = run(scenario())
+
+    print()
+    for count, ((old_items, old_queries, old_elapsed), (items, queries, elapsed)) in results.items():
+        print(f"камер: {count:>5}; N+1 - запросов: {old_queries}, {old_elapsed * 1000:.1f} мс; JOIN - запросов: {queries}, {elapsed * 1000:.1f} мс")
+        assert old_items == items == count
+        assert old_queries == count + 1
+        # Страница с общим количеством: COUNT и сама выборка, независимо от числа камер
+        assert queries == 2
+
+    (_, _, old_elapsed), (_, _, elapsed) = results[CAMERA_COUNTS[-1]]
+    assert elapsed < old_elapsed
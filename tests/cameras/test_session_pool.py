@@ -0,0 +1,117 @@
+import time, asyncio, httpx
+
+from types import SimpleNamespace
+from fastapi import FastAPI
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import engine, get_session
+from app.cameras.router import router
+from app.authorization.dependencies import get_current_user
+from tests.helpers import run, create_user, create_cameras, delete_test_data
+
+
+CONCURRENT_USERS = 500
+
+USERS = 50
+
+CAMERAS_PER_USER = 20
+
+
+class PoolCheckouts:
+    """
+    Подсчёт выдач соединений из пула движка приложения и наибольшего числа одновременно занятых соединений
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.max_checked_out = 0
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "checkout", self._checkout)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(engine.sync_engine, "checkout", self._checkout)
+
+    def _checkout(self, *args):
+        self.count += 1
+        self.max_checked_out = max(self.max_checked_out, engine.pool.checkedout())
+
+
+async def no_session():
+    # Прежнее поведение: без сессии запроса каждый метод сервиса открывает свою сессию
+    yield None
+
+
+def make_app(users: list, request_session: bool) -> FastAPI:
+    app = FastAPI()
+    app.include_router(router)
+
+    def current_user(user_index: int):
+        return users[user_index]
+
+    app.dependency_overrides[get_current_user] = current_user
+    if not request_session:
+        app.dependency_overrides[get_session] = no_session
+    return app
+
+
+async def load(client: httpx.AsyncClient, camera_ids: dict) -> list[float]:
+    """
+    CONCURRENT_USERS одновременных пользователей: список своих камер, затем одна камера из него
+    """
+    async def user_session(number: int) -> float:
+        user_index = number % USERS
+        started = time.perf_counter()
+        response = await client.get("/cameras/user/all", params={"user_index": user_index, "limit": CAMERAS_PER_USER})
+        assert response.status_code == 200
+        assert len(response.json()["cameras"]) == CAMERAS_PER_USER
+        response = await client.get(f"/cameras/user/{camera_ids[user_index][number % CAMERAS_PER_USER]}", params={"user_index": user_index})
+        assert response.status_code == 200
+        return time.perf_counter() - started
+
+    return sorted(await asyncio.gather(*(user_session(number) for number in range(CONCURRENT_USERS))))
+
+
+def test_request_session_uses_one_connection_per_request(migrated_database):
+    async def scenario():
+        users, camera_ids = [], {}
+        try:
+            for user_index in range(USERS):
+                user = await create_user()
+                users.append(SimpleNamespace(id=user.id))
+                camera_ids[user_index] = await create_cameras(CAMERAS_PER_USER, user.id)
+
+            results = {}
+            for request_session in (False, True, False, True):
+                transport = httpx.ASGITransport(app=make_app(users, request_session))
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    with PoolCheckouts() as checkouts:
+                        started = time.perf_counter()
+                        latencies = await load(client, camera_ids)
+                        elapsed = time.perf_counter() - started
+                # Первый проход каждого режима - прогрев пула, в результат идёт второй
+                results[request_session] = (latencies, elapsed, checkouts)
+            return results
+        finally:
+            await delete_test_data([user.id for user in users], [camera_id for ids in camera_ids.values() for camera_id in ids])
+
+    results = run(scenario())
+
+    requests = CONCURRENT_USERS * 2
+    print()
+    for request_session, (latencies, elapsed, checkouts) in results.items():
+        name = "сессия на запрос" if request_session else "сессия на запрос к БД"
+        print(
+            f"{name}: {requests / elapsed:.0f} запр/с, p50 {latencies[len(latencies) // 2] * 1000:.0f} мс, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} мс, выдач соединений на запрос {checkouts.count / requests:.2f}, "
+            f"занято одновременно до {checkouts.max_checked_out} из {settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW}"
+        )
+
+    _, _, shared = results[True]
+    _, _, separate = results[False]
+    # Обработчик с сессией запроса берёт из пула одно соединение, без неё - по соединению на каждый запрос к БД
+    assert shared.count == requests
+    assert separate.count > shared.count
+    assert shared.max_checked_out <= settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
@@ -0,0 +1,66 @@
+import time, asyncio, threading
+
+from types import SimpleNamespace
+
+from app.config import settings
+from app.cameras import snapshots
+from app.cameras.snapshots import Snapshot, SnapshotCache, SnapshotService
+from app.cameras.services import CameraService
+from tests.helpers import run
+
+
+def make_camera(camera_id: int) -> SimpleNamespace:
+    return SimpleNamespace(id=camera_id, stream_url=f"rtsp://camera.local/{camera_id}")
+
+
+def test_cache_reads_do_not_wait_for_busy_captures(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def blocked_capture(camera_id, stream_url, segment):
+        release.wait(10)
+        return None
+
+    monkeypatch.setattr(snapshots, "capture_snapshot", blocked_capture)
+    monkeypatch.setattr(snapshots, "decrypt_stream_url", lambda url: url)
+
+    # Миниатюра камеры 1 вытеснена на диск, камеры 2 - в памяти
+    cache = SnapshotCache(max_bytes=10, directory=str(tmp_path))
+    cache.set(Snapshot(1, b"0123456789", time.time()))
+    cache.set(Snapshot(2, b"abcdefghij", time.time()))
+    service = SnapshotService(cache, max_age=300)
+
+    async def scenario():
+        try:
+            # Холодная пачка занимает все потоки съёмки
+            await service.get_many([make_camera(camera_id) for camera_id in range(100, 100 + settings.SNAPSHOT_WORKERS * 2)])
+            started = time.monotonic()
+            cached = await asyncio.wait_for(service.get_many([make_camera(1), make_camera(2)]), timeout=2)
+            elapsed = time.monotonic() - started
+            assert not release.is_set()
+            return cached, elapsed
+        finally:
+            release.set()
+            await asyncio.gather(*list(service._refreshing.values()), return_exceptions=True)
+
+    cached, elapsed = run(scenario())
+    assert [snapshot.data for snapshot in cached] == [b"0123456789", b"abcdefghij"]
+    assert elapsed < 1
+
+
+def test_refresh_of_deleted_camera_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "capture_snapshot", lambda camera_id, stream_url, segment: b"jpeg")
+    monkeypatch.setattr(snapshots, "decrypt_stream_url", lambda url: url)
+
+    async def find_by_id(camera_id, session=None):
+        return None
+
+    monkeypatch.setattr(CameraService, "find_by_id", find_by_id)
+
+    cache = SnapshotCache(max_bytes=1024, directory=str(tmp_path))
+    service = SnapshotService(cache, max_age=300)
+
+    async def scenario():
+        return await service.refresh(make_camera(1))
+
+    assert run(scenario()) is None
+    assert cache.get(1) is None
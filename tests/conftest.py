@@ -0,0 +1,42 @@
+import os
+
+
+# Обязательные настройки приложения для запуска тестов без .env (значения из окружения имеют приоритет)
+TEST_SETTINGS = {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "postgres",
+    "DB_PASS": "postgres",
+    "DB_NAME": "cameras_test",
+    "SECRET_KEY": "test-secret",
+    "REFRESH_SECRET_KEY": "test-refresh-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_DAYS": "7",
+    "ENCRYPTION_KEY": "AAECAwQFBgcICQoLDA0ODxAREhMUFRYXGBkaGxwdHh8=",
+    "GIN_HOST": "http://localhost:8080",
+    "STREAMS_DIR": "./streams",
+}
+
+for name, value in TEST_SETTINGS.items():
+    os.environ.setdefault(name, value)
+
+
+import sys, subprocess, pytest
+
+from app.config import settings
+from tests.helpers import run, database_available
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def migrated_database() -> str:
+    """
+    Тестовая БД, обновлённая миграциями до последней версии. Тест пропускается, если PostgreSQL недоступен
+    """
+    if not run(database_available()):
+        pytest.skip(f"PostgreSQL недоступен: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True)
+    return settings.DATABASE_URL
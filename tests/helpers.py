@@ -0,0 +1,109 @@
+import asyncio
+
+from uuid import uuid4
+from sqlalchemy import delete, event, insert, text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.database import engine, async_session_maker
+from app.models import Camera, FavoriteCamera, User, UserCamera
+
+
+def run(coroutine):
+    """
+    Запуск корутины теста в отдельном event loop. Соединения общего пула приложения
+    закрываются в конце, иначе следующий тест получит соединения чужого event loop
+    """
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def database_available() -> bool:
+    """
+    Проверка доступности тестовой БД
+    """
+    test_engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+    try:
+        async with test_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+    finally:
+        await test_engine.dispose()
+
+
+class QueryCounter:
+    """
+    Подсчёт SQL запросов, выполненных через движок приложения
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+async def create_user(**data) -> User:
+    """
+    Добавление тестового пользователя
+    """
+    user_id = uuid4()
+    values = {
+        "id": user_id,
+        "email": f"{user_id}@example.com",
+        "phone_number": str(user_id),
+        "first_name": "Тест",
+        "last_name": "Тестов",
+        "paternal_name": "Тестович",
+        "password": "-",
+        **data,
+    }
+    async with async_session_maker() as session:
+        await session.execute(insert(User).values(**values))
+        await session.commit()
+    return User(**values)
+
+
+async def create_cameras(count: int, user_id=None, favorite: bool = False, stream_url: str = "rtsp://camera.local") -> list[int]:
+    """
+    Добавление тестовых камер (с доступом и избранным для пользователя). Возвращает id камер
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(
+            insert(Camera).returning(Camera.id),
+            [{"name": f"camera {number}", "stream_url": stream_url, "location": "test"} for number in range(count)],
+        )
+        camera_ids = result.scalars().all()
+        if user_id is not None:
+            await session.execute(insert(UserCamera), [{"user_id": user_id, "camera_id": camera_id} for camera_id in camera_ids])
+            if favorite:
+                await session.execute(insert(FavoriteCamera), [{"user_id": user_id, "camera_id": camera_id} for camera_id in camera_ids])
+        await session.commit()
+    return camera_ids
+
+
+async def delete_test_data(user_ids=(), camera_ids=()) -> None:
+    """
+    Удаление тестовых камер (доступы и избранное удаляются каскадно) и пользователей
+    """
+    async with async_session_maker() as session:
+        if camera_ids:
+            await session.execute(delete(Camera).where(Camera.id.in_(camera_ids)))
+        if user_ids:
+            await session.execute(delete(User).where(User.id.in_(user_ids)))
+        await session.commit()
@@ -0,0 +1,55 @@
+"""
+Замер импорта камер в отдельном процессе для тестов памяти. Аргументы: режим (stream или memory), тип файла (xlsx или csv) и путь.
+Запись в БД заменена заглушкой: проверяется чтение, проверка и шифрование строк, которые и определяют расход памяти.
+Печатает JSON: число строк, время, прирост пикового RSS (КиБ) относительно процесса после импорта модулей.
+Пик берётся из VmHWM и сбрасывается через /proc/self/clear_refs (Linux): ru_maxrss наследуется от родительского процесса.
+"""
+import sys, json, time, asyncio
+
+from app.importer import engine
+from app.importer.engine import encrypt_batch, import_excel, import_stream
+from app.importer.readers import iter_csv_rows, iter_xlsx_rows
+
+
+async def import_chunk(records: list[dict], session_maker=None) -> list[int]:
+    for row, stream_url in zip(records, encrypt_batch([row['stream_url'] for row in records])):
+        row['stream_url'] = stream_url
+    return [row['id'] for row in records]
+
+
+def memory_status() -> dict[str, int]:
+    """
+    Текущий и пиковый RSS процесса в КиБ
+    """
+    with open('/proc/self/status') as status:
+        fields = dict(line.split(':', 1) for line in status)
+    return {name: int(fields[name].split()[0]) for name in ('VmRSS', 'VmHWM')}
+
+
+def main() -> int:
+    mode, file_type, path = sys.argv[1:4]
+    engine.import_chunk = import_chunk
+
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    baseline = memory_status()['VmRSS']
+    started = time.perf_counter()
+    with open(path, 'rb') as file:
+        if mode == 'memory':
+            result = asyncio.run(import_excel(file))
+        else:
+            rows = iter_csv_rows(file) if file_type == 'csv' else iter_xlsx_rows(file)
+            result = asyncio.run(import_stream(rows))
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "rows": result['total'],
+        "inserted": result['inserted'],
+        "seconds": elapsed,
+        "peak_rss_kib": memory_status()['VmHWM'] - baseline,
+    }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
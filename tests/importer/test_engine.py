@@ -0,0 +1,48 @@
+from sqlalchemy import delete
+
+from app.config import Settings
+from app.database import async_session_maker
+from app.models import Camera
+from app.importer import engine
+from app.importer.engine import encrypt_urls, import_chunk, start_encrypt_executor, shutdown_encrypt_executor
+from app.stream.url_encryption import decrypt_stream_url
+from tests.helpers import run
+
+
+def test_import_chunk_size_is_clamped_to_parameter_limit():
+    assert Settings(IMPORT_CHUNK_SIZE=100000).IMPORT_CHUNK_SIZE == 32767 // 9
+    assert Settings(IMPORT_CHUNK_SIZE=0).IMPORT_CHUNK_SIZE == 1
+    assert Settings(IMPORT_CHUNK_SIZE=500).IMPORT_CHUNK_SIZE == 500
+
+
+def test_urls_are_encrypted_in_spawned_processes(monkeypatch):
+    monkeypatch.setattr(engine, "ENCRYPT_WORKERS", 2)
+    urls = [f"rtsp://camera.local/{number}" for number in range(50)]
+
+    start_encrypt_executor()
+    try:
+        assert engine._encrypt_executor._mp_context.get_start_method() == "spawn"
+        encrypted = run(encrypt_urls(urls))
+    finally:
+        shutdown_encrypt_executor()
+
+    assert [decrypt_stream_url(url) for url in encrypted] == urls
+
+
+def test_largest_import_chunk_fits_in_one_insert(migrated_database):
+    size = Settings(IMPORT_CHUNK_SIZE=100000).IMPORT_CHUNK_SIZE
+    first_id = 900000
+    records = [
+        {"id": first_id + number, "name": f"camera {number}", "stream_url": "rtsp://camera.local", "location": "test"}
+        for number in range(size)
+    ]
+
+    async def scenario():
+        try:
+            return await import_chunk(records)
+        finally:
+            async with async_session_maker() as session:
+                await session.execute(delete(Camera).where(Camera.id >= first_id, Camera.id < first_id + size))
+                await session.commit()
+
+    assert len(run(scenario())) == size
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+from app.models import ImportJobStatus
+from app.importer.jobs import ImportJobManager, ImportRun
+from app.importer.services import ImportJobService, STALE_JOB_ERROR
+from tests.helpers import run
+
+
+def test_jobs_of_stopped_process_are_failed_and_own_jobs_kept_alive(migrated_database):
+    long_ago = datetime.utcnow() - timedelta(days=1)
+
+    async def scenario():
+        manager = ImportJobManager(workers=1, keep=100)
+        try:
+            orphaned = await ImportJobService.add(filename="orphaned.csv", status=ImportJobStatus.RUNNING, heartbeat_at=long_ago)
+            finished = await ImportJobService.add(filename="finished.csv", status=ImportJobStatus.COMPLETED, heartbeat_at=long_ago)
+            own = await ImportJobService.add(filename="own.csv", status=ImportJobStatus.PENDING, heartbeat_at=long_ago)
+            manager.runs[str(own.id)] = ImportRun(own.id, "/nonexistent.csv", "csv", True)
+
+            await manager.heartbeat()
+
+            return [await ImportJobService.find_by_id(job.id) for job in (orphaned, finished, own)]
+        finally:
+            manager.runs.clear()
+            manager.shutdown()
+
+    orphaned, finished, own = run(scenario())
+    assert orphaned.status == ImportJobStatus.FAILED
+    assert orphaned.error == STALE_JOB_ERROR
+    assert orphaned.finished_at is not None
+    assert finished.status == ImportJobStatus.COMPLETED
+    assert own.status == ImportJobStatus.PENDING
+    assert own.heartbeat_at > long_ago
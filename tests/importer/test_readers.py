@@ -0,0 +1,59 @@
+import io
+import pandas as pd
+
+from openpyxl import Workbook
+
+from app.importer.engine import prepare_frame
+from app.importer.readers import iter_batches, iter_csv_rows, iter_xlsx_rows
+
+
+HEADER = ['id', 'name', 'stream_url', 'location', 'created_at', 'updated_at']
+
+
+def reject_rows(rows) -> dict[int, str]:
+    """
+    Номера отклонённых строк файла после потоковой подготовки пачками по 2 строки
+    """
+    rejected = {}
+    for batch in iter_batches(rows, 2):
+        numbers, records = zip(*batch)
+        prepared = prepare_frame(pd.DataFrame(list(records)), row_numbers=list(numbers))
+        rejected.update((item["row"], item["reason"]) for item in prepared.rejected)
+    return rejected
+
+
+def test_xlsx_rejections_use_sheet_row_numbers():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    sheet.append([1, "Камера 1", "rtsp://camera.local/1", "Вход"])
+    sheet.append([])
+    sheet.append([])
+    sheet.append(["x", "Камера 2", "rtsp://camera.local/2", "Вход"])
+    sheet["A9"] = 3
+    file = io.BytesIO()
+    workbook.save(file)
+    file.seek(0)
+
+    rows = list(iter_xlsx_rows(file))
+
+    assert [number for number, _ in rows] == [2, 5, 9]
+    # Ячейки, отсутствующие в конце строки, не теряют колонку
+    assert all(list(row) == HEADER for _, row in rows)
+    assert reject_rows(rows) == {5: "Некорректный id", 9: "Отсутствует значение 'name'"}
+
+
+def test_csv_rejections_use_record_numbers():
+    content = "\n".join([
+        ",".join(HEADER),
+        "1,Камера 1,rtsp://camera.local/1,Вход,,",
+        "",
+        "x,Камера 2,rtsp://camera.local/2,Вход,,",
+        "3,,rtsp://camera.local/3,Вход",
+    ])
+
+    rows = list(iter_csv_rows(io.BytesIO(content.encode())))
+
+    assert [number for number, _ in rows] == [2, 4, 5]
+    assert rows[0][1]["created_at"] is None
+    assert reject_rows(rows) == {4: "Некорректный id", 5: "Отсутствует значение 'name'"}
@@ -0,0 +1,48 @@
+import pytest
+
+from sqlalchemy import delete, exists, or_, select, text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import FavoriteCamera, UserCamera
+from tests.helpers import run
+
+
+CAMERA_ID = 1
+
+# Формы запросов BaseRequests и сервисов камер, фильтрующие связи только по camera_id, и индексы, которые они обязаны использовать
+QUERIES = {
+    "user_cameras find_all(camera_id)": (select(UserCamera).filter_by(camera_id=CAMERA_ID), "ix_user_cameras_camera_id"),
+    "user_cameras delete(camera_id)": (delete(UserCamera).filter_by(camera_id=CAMERA_ID), "ix_user_cameras_camera_id"),
+    "favorite_cameras find_all(camera_id)": (select(FavoriteCamera).filter_by(camera_id=CAMERA_ID), "ix_favorite_cameras_camera_id"),
+    "favorite_cameras delete(camera_id)": (delete(FavoriteCamera).filter_by(camera_id=CAMERA_ID), "ix_favorite_cameras_camera_id"),
+    "CameraService.has_links": (
+        select(or_(
+            exists().where(UserCamera.camera_id.in_([CAMERA_ID])),
+            exists().where(FavoriteCamera.camera_id.in_([CAMERA_ID])),
+        )),
+        "ix_user_cameras_camera_id",
+        "ix_favorite_cameras_camera_id",
+    ),
+}
+
+
+async def explain(url: str, query) -> str:
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        async with engine.connect() as connection:
+            # На пустых таблицах планировщик предпочтёт полный просмотр, поэтому запрещаем его явно
+            await connection.execute(text("SET enable_seqscan = off"))
+            sql = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            result = await connection.execute(text(f"EXPLAIN {sql}"))
+            return "\n".join(result.scalars().all())
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_camera_id_filter_uses_index(migrated_database, name):
+    query, *indexes = QUERIES[name]
+    plan = run(explain(migrated_database, query))
+    for index in indexes:
+        assert index in plan, f"{name}: ожидался просмотр по индексу {index}\n{plan}"
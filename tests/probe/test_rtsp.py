@@ -0,0 +1,180 @@
+import asyncio, hashlib
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import CameraHealth, ProbeStatus
+from app.probe import prober
+from app.probe.prober import CameraProber, probe_camera
+from app.stream.url_encryption import encrypt_stream_url
+from tests.helpers import run, create_cameras, delete_test_data
+
+
+REALM = "camera"
+NONCE = "0123456789abcdef"
+USERNAME = "admin"
+PASSWORD = "secret"
+
+VIDEO_SDP = "v=0\r\ns=stand-in\r\nm=video 0 RTP/AVP 96\r\na=rtpmap:96 H264/90000\r\na=framesize:96 1920-1080\r\n"
+NO_SIZE_SDP = "v=0\r\ns=stand-in\r\nm=video 0 RTP/AVP 97\r\na=rtpmap:97 H265/90000\r\n"
+AUDIO_SDP = "v=0\r\ns=stand-in\r\nm=audio 0 RTP/AVP 0\r\na=rtpmap:0 PCMU/8000\r\n"
+
+
+class RTSPStandIn:
+    """
+    Заглушка RTSP камеры: отвечает на OPTIONS и DESCRIBE, по пути адреса выбирается поведение.
+    /video, /nosize, /audio - SDP с разрешением, без разрешения, без видео; /secure - Digest авторизация;
+    /hang - соединение принимается, но ответа нет; остальные пути - 404. Считает одновременные соединения
+    """
+
+    def __init__(self, describe_delay: float = 0.0):
+        self.describe_delay = describe_delay
+        self.active = 0
+        self.max_active = 0
+        self.connections = 0
+        self.server = None
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    def url(self, path: str, credentials: str = "") -> str:
+        return f"rtsp://{credentials}127.0.0.1:{self.port}{path}"
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            while True:
+                head = (await reader.readuntil(b"\r\n\r\n")).decode()
+                request_line, *lines = head.split("\r\n")
+                method, uri, _ = request_line.split(" ")
+                headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(":") for line in lines) if name}
+                path = uri.split(str(self.port), 1)[1]
+                if path == "/hang":
+                    await asyncio.sleep(3600)
+                writer.write(await self.respond(method, uri, path, headers))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def respond(self, method: str, uri: str, path: str, headers: dict) -> bytes:
+        cseq = headers.get("cseq", "0")
+        if path == "/secure" and not self.authorized(method, uri, headers.get("authorization", "")):
+            return self.response(cseq, "401 Unauthorized", {"WWW-Authenticate": f'Digest realm="{REALM}", nonce="{NONCE}"'})
+        if method == "OPTIONS":
+            return self.response(cseq, "200 OK", {"Public": "OPTIONS, DESCRIBE"})
+
+        sdp = {"/video": VIDEO_SDP, "/secure": VIDEO_SDP, "/nosize": NO_SIZE_SDP, "/audio": AUDIO_SDP}.get(path)
+        if sdp is None:
+            return self.response(cseq, "404 Not Found")
+        await asyncio.sleep(self.describe_delay)
+        return self.response(cseq, "200 OK", {"Content-Type": "application/sdp"}, sdp.encode())
+
+    @staticmethod
+    def authorized(method: str, uri: str, authorization: str) -> bool:
+        ha1 = hashlib.md5(f"{USERNAME}:{REALM}:{PASSWORD}".encode()).hexdigest()
+        ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
+        expected = hashlib.md5(f"{ha1}:{NONCE}:{ha2}".encode()).hexdigest()
+        return authorization.startswith("Digest ") and f'response="{expected}"' in authorization
+
+    @staticmethod
+    def response(cseq: str, status: str, headers: dict | None = None, body: bytes = b"") -> bytes:
+        lines = [f"RTSP/1.0 {status}", f"CSeq: {cseq}", *(f"{name}: {value}" for name, value in (headers or {}).items())]
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+
+def test_probe_statuses_against_rtsp_stand_in(monkeypatch):
+    monkeypatch.setattr(settings, "PROBE_TIMEOUT", 0.5)
+    grabbed = []
+
+    def grab_frame(stream_url: str, frames: int, timeout: float):
+        grabbed.append(stream_url)
+        return 1280, 720
+
+    monkeypatch.setattr(prober, "grab_frame", grab_frame)
+
+    async def scenario():
+        async with RTSPStandIn() as camera:
+            urls = {
+                "video": camera.url("/video"),
+                "secure": camera.url("/secure", f"{USERNAME}:{PASSWORD}@"),
+                "wrong_password": camera.url("/secure", f"{USERNAME}:wrong@"),
+                "nosize": camera.url("/nosize"),
+                "audio": camera.url("/audio"),
+                "missing": camera.url("/missing"),
+                "hang": camera.url("/hang"),
+            }
+            results = {name: await probe_camera(number, encrypt_stream_url(url)) for number, (name, url) in enumerate(urls.items())}
+        # Порт остановленной заглушки закрыт
+        results["closed"] = await probe_camera(0, encrypt_stream_url(urls["video"]))
+        return results, urls
+
+    results, urls = run(scenario())
+
+    assert results["video"]["status"] == ProbeStatus.ONLINE
+    assert (results["video"]["codec"], results["video"]["width"], results["video"]["height"]) == ("h264", 1920, 1080)
+    assert results["video"]["latency_ms"] is not None
+    assert results["secure"]["status"] == ProbeStatus.ONLINE
+    assert results["wrong_password"]["status"] == ProbeStatus.UNAUTHORIZED
+    assert results["audio"]["status"] == ProbeStatus.NO_VIDEO
+    assert results["missing"]["status"] == ProbeStatus.ERROR
+    assert results["missing"]["error"] == "RTSP 404"
+    assert results["hang"]["status"] == ProbeStatus.OFFLINE
+    assert results["closed"]["status"] == ProbeStatus.OFFLINE
+
+    # Кадры захватываются только для камеры, SDP которой не содержит разрешения
+    assert grabbed == [urls["nosize"]]
+    assert results["nosize"]["status"] == ProbeStatus.ONLINE
+    assert (results["nosize"]["codec"], results["nosize"]["width"], results["nosize"]["height"]) == ("h265", 1280, 720)
+
+
+def test_prober_is_bounded_and_incremental(migrated_database, monkeypatch):
+    monkeypatch.setattr(settings, "PROBE_TIMEOUT", 2.0)
+    concurrency = 5
+    count = 40
+
+    async def scenario():
+        async with RTSPStandIn(describe_delay=0.05) as camera:
+            camera_ids = await create_cameras(count, stream_url=encrypt_stream_url(camera.url("/video")))
+            try:
+                camera_prober = CameraProber(concurrency=concurrency, batch_size=15)
+                await camera_prober.run(camera_ids=camera_ids)
+                first = (camera_prober.checked, camera.connections, camera.max_active)
+
+                async with async_session_maker() as session:
+                    rows = (await session.execute(select(CameraHealth).where(CameraHealth.camera_id.in_(camera_ids)))).scalars().all()
+
+                # Повторная проверка пропускает камеры, проверенные позже PROBE_STALE_SECONDS назад
+                await camera_prober.run(camera_ids=camera_ids)
+                incremental = camera_prober.checked
+
+                await camera_prober.run(force=True, camera_ids=camera_ids)
+                forced = camera_prober.checked
+            finally:
+                await delete_test_data(camera_ids=camera_ids)
+            return first, rows, incremental, forced
+
+    (checked, connections, max_active), rows, incremental, forced = run(scenario())
+
+    assert checked == connections == count
+    assert 1 < max_active <= concurrency
+    assert len(rows) == count
+    assert all((row.status, row.codec, row.width, row.height) == (ProbeStatus.ONLINE, "h264", 1920, 1080) for row in rows)
+    assert incremental == 0
+    assert forced == count
@@ -0,0 +1,38 @@
+"""
+Заглушка ffmpeg для тестов супервизора. Последний аргумент - путь к плейлисту.
+Поведение задаётся переменными окружения:
+FAKE_FFMPEG_LOG - файл, в который записывается время каждого запуска;
+FAKE_FFMPEG_CRASHES - сколько первых запусков завершаются с ошибкой до записи плейлиста;
+FAKE_FFMPEG_SILENT=1 - процесс работает, но никогда не записывает плейлист.
+"""
+import os, sys, time
+
+
+def main() -> int:
+    playlist_path = sys.argv[-1]
+    log_path = os.environ["FAKE_FFMPEG_LOG"]
+
+    with open(log_path, "a") as log:
+        log.write(f"{time.monotonic()}\n")
+    with open(log_path) as log:
+        launches = len(log.read().splitlines())
+
+    sys.stderr.write("ffmpeg version fake\n")
+    sys.stderr.flush()
+
+    if launches <= int(os.environ.get("FAKE_FFMPEG_CRASHES", "0")):
+        sys.stderr.write("rtsp://camera: Connection refused\n")
+        return 1
+
+    if os.environ.get("FAKE_FFMPEG_SILENT") != "1":
+        with open(playlist_path, "w") as playlist:
+            playlist.write("#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXTINF:2.0,\nindex0.ts\n")
+        sys.stderr.write(f"[hls @ 0x0] Opening '{playlist_path}.tmp' for writing\n")
+        sys.stderr.flush()
+
+    while True:
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
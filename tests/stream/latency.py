@@ -0,0 +1,199 @@
+"""
+Замер задержки HLS потока от источника до появления сегмента в плейлисте.
+Запуск: python -m tests.stream.latency [--source URL] [--seconds 30]
+
+Без --source поднимается локальный тестовый источник: ffmpeg отдаёт testsrc в реальном времени (-re) как MPEG-TS по TCP
+и начинает передачу только после подключения супервизора, поэтому момент кадра в источнике - время запуска плюс его pts.
+С --source (например, RTSP сервер mediamtx с тем же testsrc) замер идёт через RTSP, но время подключения к источнику
+неизвестно и результат включает накопленную в источнике задержку.
+
+Для каждого сегмента считается задержка появления: время, когда сегмент появился в плейлисте, минус момент его последнего кадра.
+Отсчёт идёт от запуска процесса ffmpeg, поэтому время запуска и подключения входит в результат (оценка сверху).
+Задержка в плеере дополнительно включает запас проигрывателя: 3 * EXT-X-TARGETDURATION от конца плейлиста.
+"""
+import re, sys, time, shutil, socket, asyncio, argparse, tempfile
+
+from dataclasses import dataclass
+
+from app.models import TranscodeMode, HLSMode
+from app.stream.supervisor import StreamSupervisor
+
+
+TARGET_DURATION_PATTERN = re.compile(r"#EXT-X-TARGETDURATION:(\d+)")
+MEDIA_SEQUENCE_PATTERN = re.compile(r"#EXT-X-MEDIA-SEQUENCE:(\d+)")
+EXTINF_PATTERN = re.compile(r"#EXTINF:([\d.]+)")
+
+# Сколько целевых длительностей сегмента проигрыватель держит в запасе от конца плейлиста (RFC 8216)
+PLAYER_HOLD_BACK_SEGMENTS = 3
+
+
+@dataclass
+class Playlist:
+    media_sequence: int
+    target_duration: float
+    segments: list[tuple[int, float]]
+
+
+@dataclass
+class SegmentTiming:
+    sequence: int
+    end: float
+    seen_at: float
+
+    @property
+    def latency(self) -> float:
+        return self.seen_at - self.end
+
+
+def parse_playlist(text: str) -> Playlist:
+    """
+    Номер первого сегмента, целевая длительность и пары (номер, длительность) сегментов медиаплейлиста
+    """
+    match = MEDIA_SEQUENCE_PATTERN.search(text)
+    sequence = int(match.group(1)) if match else 0
+    match = TARGET_DURATION_PATTERN.search(text)
+    target_duration = float(match.group(1)) if match else 0.0
+
+    segments = []
+    duration = None
+    for line in text.splitlines():
+        if match := EXTINF_PATTERN.match(line):
+            duration = float(match.group(1))
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append((sequence + len(segments), duration))
+            duration = None
+    return Playlist(sequence, target_duration, segments)
+
+
+class PlaylistWatcher:
+    """
+    Отслеживание плейлиста: момент появления каждого сегмента и конец его содержимого на шкале источника
+    """
+
+    def __init__(self, path: str, started: float):
+        self.path = path
+        self.started = started
+        self.target_duration = 0.0
+        self.durations: dict[int, float] = {}
+        self.seen: dict[int, float] = {}
+
+    def observe(self, text: str, now: float) -> None:
+        # Плейлист без temp_file перезаписывается на месте, недописанный файл пропускается
+        if not text.endswith("\n"):
+            return
+        playlist = parse_playlist(text)
+        self.target_duration = playlist.target_duration or self.target_duration
+        for sequence, duration in playlist.segments:
+            self.durations.setdefault(sequence, duration)
+            self.seen.setdefault(sequence, now)
+
+    def timings(self) -> list[SegmentTiming]:
+        """
+        Задержки сегментов, для которых известны длительности всех предыдущих сегментов
+        """
+        timings = []
+        end = 0.0
+        for sequence in range(max(self.seen, default=-1) + 1):
+            if sequence not in self.durations:
+                break
+            end += self.durations[sequence]
+            timings.append(SegmentTiming(sequence, self.started + end, self.seen[sequence]))
+        return timings
+
+    async def watch(self, seconds: float, interval: float = 0.02) -> list[SegmentTiming]:
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            try:
+                with open(self.path) as playlist:
+                    self.observe(playlist.read(), time.time())
+            except FileNotFoundError:
+                pass
+            await asyncio.sleep(interval)
+        return self.timings()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_test_source(ffmpeg_path: str, port: int) -> asyncio.subprocess.Process:
+    """
+    Локальный источник: testsrc 25 к/с с ключевым кадром каждую секунду, отдаётся по TCP после подключения клиента
+    """
+    return await asyncio.create_subprocess_exec(
+        ffmpeg_path, "-hide_banner", "-loglevel", "error",
+        "-re", "-f", "lavfi", "-i", "testsrc=size=1280x720:rate=25",
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-g", "25",
+        "-f", "mpegts", f"tcp://127.0.0.1:{port}?listen=1",
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+
+
+async def measure(hls_mode: str, seconds: float, ffmpeg_path: str, source: str | None = None) -> dict:
+    """
+    Запуск потока через супервизор в заданном режиме HLS и замер задержек сегментов за seconds секунд
+    """
+    directory = tempfile.mkdtemp(prefix="hls_latency_")
+    source_process = None
+    if source is None:
+        port = free_port()
+        source_process = await start_test_source(ffmpeg_path, port)
+        source = f"tcp://127.0.0.1:{port}"
+        # Источник должен начать слушать порт до запуска супервизора
+        await asyncio.sleep(0.5)
+
+    supervisor = StreamSupervisor(directory, ffmpeg_path, max_processes=1, max_per_user=1)
+    try:
+        started = time.time()
+        stream = await supervisor.start(1, "latency", source, mode=TranscodeMode.TRANSCODE, hls_mode=hls_mode)
+        watcher = PlaylistWatcher(stream.playlist_path, started)
+        timings = await watcher.watch(seconds)
+    finally:
+        await supervisor.shutdown()
+        if source_process is not None and source_process.returncode is None:
+            source_process.kill()
+            await source_process.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    latencies = sorted(timing.latency for timing in timings)
+    if not latencies:
+        return {"mode": hls_mode, "segments": 0}
+    median = latencies[len(latencies) // 2]
+    return {
+        "mode": hls_mode,
+        "segments": len(latencies),
+        "target_duration": watcher.target_duration,
+        "median": median,
+        "max": latencies[-1],
+        "player": median + PLAYER_HOLD_BACK_SEGMENTS * watcher.target_duration,
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Замер задержки HLS и LL-HLS потока")
+    parser.add_argument("--source", help="URL источника (по умолчанию - локальный testsrc)")
+    parser.add_argument("--seconds", type=float, default=30.0, help="длительность замера для каждого режима")
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg"), help="путь к ffmpeg")
+    args = parser.parse_args()
+    if not args.ffmpeg:
+        print("ffmpeg не найден", file=sys.stderr)
+        return 1
+
+    for hls_mode in (HLSMode.STANDARD, HLSMode.LOW_LATENCY):
+        result = await measure(hls_mode, args.seconds, args.ffmpeg, args.source)
+        if not result["segments"]:
+            print(f"{hls_mode}: сегменты не появились", file=sys.stderr)
+            continue
+        print(
+            f"{hls_mode}: сегментов {result['segments']}, медиана появления {result['median']:.2f} с, "
+            f"максимум {result['max']:.2f} с, в плеере ~{result['player']:.1f} с"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
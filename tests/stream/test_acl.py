@@ -0,0 +1,90 @@
+import asyncio, httpx
+
+from app.analytics.writer import stream_events
+from app.cameras.services import UserCameraService
+from app.stream.acl import CameraAccessList, touch_stream_viewer
+from app.stream.hls import HLSFiles, HLSFileCache
+from tests.helpers import run
+
+
+USER_ID = "user"
+
+
+class SlowAccessTable:
+    """
+    Заглушка таблицы доступа: запрос к БД ждёт release, результат - состояние таблицы на момент запроса
+    """
+
+    def __init__(self, cameras: set[int]):
+        self.cameras = set(cameras)
+        self.queries = 0
+        self.release = asyncio.Event()
+
+    async def find_camera_ids(self, user_id) -> set[int]:
+        self.queries += 1
+        snapshot = set(self.cameras)
+        await self.release.wait()
+        return snapshot
+
+
+def test_access_change_during_load_is_not_lost(monkeypatch):
+    async def scenario():
+        table = SlowAccessTable({1, 2})
+        monkeypatch.setattr(UserCameraService, "find_camera_ids", table.find_camera_ids)
+        camera_acl = CameraAccessList(maxsize=10, ttl=60)
+
+        checks = [asyncio.ensure_future(camera_acl.allowed_cameras(USER_ID)) for _ in range(3)]
+        while not table.queries:
+            await asyncio.sleep(0)
+        # Пока первый запрос к БД не завершён, обработчики меняют доступ (сначала БД, затем список в памяти)
+        table.cameras = {2, 3}
+        camera_acl.grant(USER_ID, 3)
+        camera_acl.revoke(USER_ID, 1)
+        table.release.set()
+        await asyncio.gather(*checks)
+
+        return table.queries, await camera_acl.has_access(USER_ID, 3), await camera_acl.has_access(USER_ID, 1)
+
+    queries, granted, revoked = run(scenario())
+
+    # Одна загрузка на всех ожидающих и одна повторная после изменения доступа
+    assert queries == 2
+    assert granted
+    assert not revoked
+
+
+def test_grant_and_revoke_do_not_count_in_cache_stats():
+    camera_acl = CameraAccessList(maxsize=10, ttl=60)
+    camera_acl.grant(USER_ID, 1)
+    camera_acl.cache.set(USER_ID, {1})
+    camera_acl.grant(USER_ID, 2)
+    camera_acl.revoke(USER_ID, 1)
+
+    stats = camera_acl.cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 0)
+    assert camera_acl.cache.peek(USER_ID) == {2}
+
+
+def test_viewer_is_touched_only_after_authorization(tmp_path, monkeypatch):
+    touched = []
+    monkeypatch.setattr(stream_events, "touch", lambda camera_id, user_id: touched.append((camera_id, user_id)))
+    camera_dir = tmp_path / "camera_1"
+    camera_dir.mkdir()
+    (camera_dir / "index.m3u8").write_bytes(b"#EXTM3U\n")
+
+    async def authorize(scope):
+        if dict(scope["headers"]).get(b"authorization") != b"Bearer ok":
+            return 403
+        scope.setdefault("state", {})["stream_viewer"] = (1, USER_ID)
+        return None
+
+    async def scenario():
+        files = HLSFiles(str(tmp_path), cache=HLSFileCache(max_bytes=1024, max_file_bytes=1024), authorize=authorize, on_access=touch_stream_viewer)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=files), base_url="http://test") as client:
+            assert (await client.get("/camera_1/index.m3u8")).status_code == 403
+            assert touched == []
+            assert (await client.get("/camera_1/index.m3u8", headers={"Authorization": "Bearer ok"})).status_code == 200
+
+    run(scenario())
+
+    assert touched == [(1, USER_ID)]
@@ -0,0 +1,126 @@
+import time, asyncio, threading, httpx
+
+from app.config import settings
+from app.stream.client import GinClient
+from tests.helpers import run
+
+
+REQUESTS = 200
+
+CONCURRENCY = 20
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 11\r\n\r\n{\"ok\":true}"
+
+
+class StubGin:
+    """
+    Заглушка Gin: HTTP/1.1 сервер с keep-alive в отдельном потоке, считающий TCP соединения
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.port = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                writer.write(RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def __enter__(self):
+        self.thread.start()
+        server = asyncio.run_coroutine_threadsafe(asyncio.start_server(self.handle, "127.0.0.1", 0), self.loop).result()
+        self.server = server
+        self.port = server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        # Соединения keep-alive остаются открытыми, их обработчики завершаются явно
+        self.server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+
+async def load(call) -> list[float]:
+    """
+    REQUESTS вызовов при CONCURRENCY одновременных запросах, возвращает отсортированные задержки
+    """
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await call()
+            assert response.status_code == 200
+            return time.perf_counter() - started
+
+    return sorted(await asyncio.gather(*(timed() for _ in range(REQUESTS))))
+
+
+def percentile(latencies: list[float], value: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * value))]
+
+
+def test_pooled_client_reuses_connections_and_is_faster(monkeypatch):
+    monkeypatch.setattr(settings, "GIN_HTTP2", False)
+
+    with StubGin() as gin:
+        monkeypatch.setattr(settings, "GIN_HOST", gin.url)
+
+        async def per_request():
+            # Прежнее поведение роутера: новый клиент (и новое соединение) на каждый запрос
+            async with httpx.AsyncClient(base_url=gin.url) as client:
+                return await client.post("/stream", headers={"Authorization": "Bearer token"})
+
+        async def scenario():
+            await GinClient.open()
+            try:
+                # Прогрев: первые соединения пула не попадают в замер
+                await load(lambda: GinClient.post("/stream", "token"))
+                warm_connections = gin.connections
+                pooled = await load(lambda: GinClient.post("/stream", "token"))
+                pooled_connections = gin.connections - warm_connections
+            finally:
+                await GinClient.close()
+
+            before = gin.connections
+            fresh = await load(per_request)
+            return pooled, pooled_connections, fresh, gin.connections - before
+
+        pooled, pooled_connections, fresh, fresh_connections = run(scenario())
+
+    print()
+    for name, latencies, connections in (("пул", pooled, pooled_connections), ("клиент на запрос", fresh, fresh_connections)):
+        print(f"{name}: p50 {percentile(latencies, 0.5) * 1000:.2f} мс, p99 {percentile(latencies, 0.99) * 1000:.2f} мс, новых соединений: {connections}")
+
+    # Общий клиент работает на уже открытых соединениях, без TCP рукопожатия на каждый вызов
+    assert pooled_connections == 0
+    assert fresh_connections == REQUESTS
+    assert percentile(pooled, 0.5) < percentile(fresh, 0.5)
@@ -0,0 +1,77 @@
+import httpx
+
+from app.stream.hls import HLSFiles, HLSFileCache, SERVER_CONTROL_TAG
+from tests.helpers import run
+
+
+PLAYLIST = b"#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n#EXTINF:2.0,\nindex0.ts\n"
+
+SEGMENT = bytes(range(256)) * 8
+
+
+def make_files(tmp_path, max_file_bytes: int = 1024 * 1024) -> tuple[HLSFileCache, httpx.AsyncClient]:
+    camera_dir = tmp_path / "camera_1"
+    camera_dir.mkdir()
+    (camera_dir / "index.m3u8").write_bytes(PLAYLIST)
+    (camera_dir / "index0.ts").write_bytes(SEGMENT)
+    cache = HLSFileCache(max_bytes=1024 * 1024, max_file_bytes=max_file_bytes)
+    transport = httpx.ASGITransport(app=HLSFiles(str(tmp_path), cache=cache))
+    return cache, httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def test_segments_are_revalidated_instead_of_immutable(tmp_path):
+    async def scenario():
+        _, client = make_files(tmp_path)
+        async with client:
+            response = await client.get("/camera_1/index0.ts")
+            assert response.status_code == 200
+            assert "immutable" not in response.headers["cache-control"]
+            assert "must-revalidate" in response.headers["cache-control"]
+
+            revalidated = await client.get("/camera_1/index0.ts", headers={"If-None-Match": response.headers["etag"]})
+            assert revalidated.status_code == 304
+
+    run(scenario())
+
+
+def test_uncached_file_sends_etag_and_honours_range(tmp_path):
+    async def scenario():
+        _, client = make_files(tmp_path, max_file_bytes=16)
+        async with client:
+            response = await client.get("/camera_1/index0.ts")
+            assert response.status_code == 200
+            assert response.content == SEGMENT
+            assert "immutable" not in response.headers["cache-control"]
+            etag = response.headers["etag"]
+
+            assert (await client.get("/camera_1/index0.ts", headers={"If-None-Match": etag})).status_code == 304
+
+            partial = await client.get("/camera_1/index0.ts", headers={"Range": "bytes=10-19"})
+            assert partial.status_code == 206
+            assert partial.content == SEGMENT[10:20]
+            assert partial.headers["content-range"] == f"bytes 10-19/{len(SEGMENT)}"
+
+            suffix = await client.get("/camera_1/index0.ts", headers={"Range": "bytes=-5"})
+            assert suffix.content == SEGMENT[-5:]
+
+            invalid = await client.get("/camera_1/index0.ts", headers={"Range": f"bytes={len(SEGMENT)}-"})
+            assert invalid.status_code == 416
+
+    run(scenario())
+
+
+def test_server_control_only_in_low_latency_playlists(tmp_path):
+    async def scenario():
+        cache, client = make_files(tmp_path)
+        low_latency_dir = tmp_path / "camera_2"
+        low_latency_dir.mkdir()
+        (low_latency_dir / "index.m3u8").write_bytes(PLAYLIST)
+        cache.add_low_latency_directory(str(low_latency_dir))
+        async with client:
+            response = await client.get("/camera_1/index.m3u8")
+            assert SERVER_CONTROL_TAG not in response.content
+
+            response = await client.get("/camera_2/index.m3u8")
+            assert response.content.startswith(b"#EXTM3U\n" + SERVER_CONTROL_TAG + b"\n")
+
+    run(scenario())
@@ -0,0 +1,46 @@
+import shutil, pytest
+
+from app.models import HLSMode
+from tests.helpers import run
+from tests.stream.latency import PlaylistWatcher, measure
+
+
+FFMPEG = shutil.which("ffmpeg")
+
+
+def playlist(sequence: int, *durations: float) -> str:
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:2", f"#EXT-X-MEDIA-SEQUENCE:{sequence}"]
+    for number, duration in enumerate(durations, start=sequence):
+        lines += [f"#EXTINF:{duration},", f"index{number}.ts"]
+    return "\n".join(lines) + "\n"
+
+
+def test_watcher_measures_segment_latency_across_playlist_window():
+    watcher = PlaylistWatcher("index.m3u8", started=100.0)
+    watcher.observe(playlist(0, 2.0), now=102.5)
+    watcher.observe(playlist(0, 2.0, 2.0), now=104.75)
+    # Недописанный плейлист не учитывается
+    watcher.observe(playlist(0, 2.0, 2.0, 2.0)[:-5], now=105.0)
+    # Первый сегмент уже удалён из окна, нумерация продолжается по EXT-X-MEDIA-SEQUENCE
+    watcher.observe(playlist(1, 2.0, 1.5), now=106.0)
+
+    timings = watcher.timings()
+
+    assert [timing.sequence for timing in timings] == [0, 1, 2]
+    assert [timing.latency for timing in timings] == pytest.approx([0.5, 0.75, 0.5])
+    assert watcher.target_duration == 2
+
+
+@pytest.mark.skipif(FFMPEG is None, reason="ffmpeg не установлен")
+def test_low_latency_mode_publishes_segments_sooner():
+    async def scenario():
+        return [await measure(hls_mode, 12.0, FFMPEG) for hls_mode in (HLSMode.STANDARD, HLSMode.LOW_LATENCY)]
+
+    standard, low_latency = run(scenario())
+
+    print()
+    for result in (standard, low_latency):
+        print(result)
+    assert standard["segments"] and low_latency["segments"]
+    assert low_latency["median"] < standard["median"]
+    assert low_latency["player"] < standard["player"]
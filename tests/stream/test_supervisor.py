@@ -0,0 +1,223 @@
+import os, sys, asyncio, pytest
+
+from app.config import settings
+from app.stream.supervisor import StreamSupervisor, PLAYLIST_NAME
+from app.exceptions import StreamLimitExceededException, StreamStartException
+from tests.helpers import run
+
+
+FAKE_FFMPEG = os.path.join(os.path.dirname(__file__), "fake_ffmpeg.py")
+
+STREAM_URL = "rtsp://camera.local/stream"
+
+
+class FakeFFmpeg:
+    """
+    Исполняемый файл заглушки ffmpeg и журнал её запусков
+    """
+
+    def __init__(self, directory):
+        self.log_path = directory / "launches.log"
+        self.log_path.touch()
+        self.path = directory / "ffmpeg"
+        self.path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_FFMPEG}" "$@"\n')
+        self.path.chmod(0o755)
+
+    def launches(self) -> list[float]:
+        return [float(line) for line in self.log_path.read_text().splitlines()]
+
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    fake = FakeFFmpeg(tmp_path)
+
+    monkeypatch.setenv("FAKE_FFMPEG_LOG", str(fake.log_path))
+    monkeypatch.setattr(settings, "STREAM_READY_TIMEOUT", 5.0)
+    monkeypatch.setattr(settings, "STREAM_STOP_TIMEOUT", 2.0)
+    monkeypatch.setattr(settings, "STREAM_RESTART_BACKOFF_INITIAL", 0.2)
+    monkeypatch.setattr(settings, "STREAM_RESTART_BACKOFF_MAX", 1.0)
+    monkeypatch.setattr(settings, "STREAM_IDLE_GRACE_SECONDS", 0)
+    return fake
+
+
+def make_supervisor(tmp_path, ffmpeg: FakeFFmpeg, max_processes: int = 4, max_per_user: int = 4) -> StreamSupervisor:
+    return StreamSupervisor(str(tmp_path / "streams"), str(ffmpeg.path), max_processes, max_per_user)
+
+
+def test_start_is_ready_after_playlist_written(tmp_path, ffmpeg):
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg)
+        try:
+            stream = await supervisor.start(1, "viewer", STREAM_URL)
+            assert stream.ready.is_set()
+            assert os.path.exists(os.path.join(stream.directory, PLAYLIST_NAME))
+            assert stream.process.returncode is None
+            assert supervisor.stats()["processes"] == 1
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+
+
+def test_viewers_share_one_process_and_last_viewer_stops_it(tmp_path, ffmpeg):
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg)
+        try:
+            first = await supervisor.start(1, "first", STREAM_URL)
+            second = await supervisor.start(1, "second", STREAM_URL)
+            assert first is second
+            assert len(ffmpeg.launches()) == 1
+
+            await supervisor.stop(1, "first")
+            assert first.process.returncode is None
+
+            await supervisor.stop(1, "second")
+            assert 1 not in supervisor.streams
+            assert first.process.returncode is not None
+            assert not os.path.exists(first.directory)
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+
+
+def test_crashed_process_restarts_with_backoff(tmp_path, ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_CRASHES", "3")
+
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg)
+        try:
+            stream = await supervisor.start(1, "viewer", STREAM_URL)
+            assert stream.ready.is_set()
+            assert stream.restarts == 3
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+
+    launches = ffmpeg.launches()
+    assert len(launches) == 4
+    delays = [later - earlier for earlier, later in zip(launches, launches[1:])]
+    # Задержка удваивается: 0.2, 0.4, 0.8 с (плюс время запуска процесса)
+    assert delays[0] >= 0.2
+    assert delays[1] >= 0.4
+    assert delays[2] >= 0.8
+    assert delays[2] > delays[0]
+
+
+def test_start_fails_when_playlist_never_appears(tmp_path, ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_SILENT", "1")
+    monkeypatch.setattr(settings, "STREAM_READY_TIMEOUT", 0.5)
+
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg)
+        try:
+            with pytest.raises(StreamStartException):
+                await supervisor.start(1, "viewer", STREAM_URL)
+            assert 1 not in supervisor.streams
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+
+
+def test_idle_stream_is_reaped_after_grace_period(tmp_path, ffmpeg, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_IDLE_GRACE_SECONDS", 0.3)
+
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg)
+        try:
+            stream = await supervisor.start(1, "viewer", STREAM_URL)
+            await supervisor.stop(1, "viewer")
+            assert supervisor.streams.get(1) is stream
+            assert stream.idle_since is not None
+
+            # Возвращение зрителя во время простоя отменяет остановку
+            assert await supervisor.start(1, "viewer", STREAM_URL) is stream
+            await asyncio.sleep(0.5)
+            assert supervisor.streams.get(1) is stream
+            assert stream.process.returncode is None
+
+            await supervisor.stop(1, "viewer")
+            await asyncio.sleep(0.6)
+            assert 1 not in supervisor.streams
+            assert stream.process.returncode is not None
+            assert len(ffmpeg.launches()) == 1
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+
+
+def test_process_limit_rejects_new_camera_unless_one_is_idle(tmp_path, ffmpeg, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_IDLE_GRACE_SECONDS", 60)
+
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg, max_processes=1)
+        try:
+            first = await supervisor.start(1, "first", STREAM_URL)
+            with pytest.raises(StreamLimitExceededException):
+                await supervisor.start(2, "second", STREAM_URL)
+            assert list(supervisor.streams) == [1]
+
+            # Простаивающий процесс освобождает место для новой камеры
+            await supervisor.stop(1, "first")
+            second = await supervisor.start(2, "second", STREAM_URL)
+            assert list(supervisor.streams) == [2]
+            assert second.ready.is_set()
+            assert first.process.returncode is not None
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+
+
+def test_user_over_stream_limit_loses_oldest_stream(tmp_path, ffmpeg):
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg, max_per_user=2)
+        try:
+            await supervisor.start(1, "viewer", STREAM_URL)
+            await supervisor.start(2, "viewer", STREAM_URL)
+            await supervisor.start(3, "viewer", STREAM_URL)
+            assert sorted(supervisor.streams) == [2, 3]
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+
+
+def test_failure_outside_ffmpeg_unregisters_stream(tmp_path, ffmpeg, monkeypatch):
+    async def failing_probe(mode, stream_url):
+        raise RuntimeError("ffprobe failed")
+
+    monkeypatch.setattr("app.stream.supervisor.resolve_transcode_mode", failing_probe)
+
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg, max_processes=1)
+        try:
+            started = asyncio.get_running_loop().time()
+            with pytest.raises(StreamStartException):
+                await supervisor.start(1, "viewer", STREAM_URL)
+            # Ошибка приходит сразу, а не по STREAM_READY_TIMEOUT
+            assert asyncio.get_running_loop().time() - started < settings.STREAM_READY_TIMEOUT
+            assert supervisor.streams == {}
+            assert supervisor.user_history == {}
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())
+    assert ffmpeg.launches() == []
+
+
+def test_rejected_start_leaves_no_viewer_history(tmp_path, ffmpeg):
+    async def scenario():
+        supervisor = make_supervisor(tmp_path, ffmpeg, max_processes=1)
+        try:
+            await supervisor.start(1, "first", STREAM_URL)
+            with pytest.raises(StreamLimitExceededException):
+                await supervisor.start(2, "second", STREAM_URL)
+            assert "second" not in supervisor.user_history
+        finally:
+            await supervisor.shutdown()
+
+    run(scenario())